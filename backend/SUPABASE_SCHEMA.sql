@@ -19,9 +19,14 @@ CREATE TABLE violation_reports (
     severity_level TEXT DEFAULT 'none',  -- Critical, High, Medium, Low, None
     severity_score NUMERIC DEFAULT 0,  -- 1-10 scale
     text_regions JSONB,  -- Bounding boxes of detected text
+    ocr_tokens JSONB,  -- All OCR words with confidences and boxes (compact, see ocr_tokens.py); enables re-scoring
     latitude NUMERIC,  -- Optional geolocation
     longitude NUMERIC,
+    city TEXT,  -- Optional, supplied with the upload; used by trend rollups
+    zone TEXT,  -- Optional zoning zone name/code
     zoning_compliance JSONB,  -- Zoning law compliance check results
+    billboard_entity_id UUID,  -- Physical billboard this report was clustered into (see billboards)
+    citizen_validation_count INTEGER DEFAULT 0,
     detection_timestamp TIMESTAMP DEFAULT now(),
     created_at TIMESTAMP DEFAULT now(),
     updated_at TIMESTAMP DEFAULT now()
@@ -32,6 +37,7 @@ CREATE INDEX idx_violation_reports_status ON violation_reports(status);
 CREATE INDEX idx_violation_reports_created_at ON violation_reports(created_at DESC);
 CREATE INDEX idx_violation_reports_severity ON violation_reports(severity_level);
 CREATE INDEX idx_violation_reports_location ON violation_reports(latitude, longitude);
+CREATE INDEX idx_violation_reports_billboard ON violation_reports(billboard_entity_id, created_at DESC);
 
 -- ============ 2. COMPLIANCE CHECKS TABLE ============
 -- Logs of compliance checks against zoning laws
@@ -55,7 +61,7 @@ CREATE INDEX idx_compliance_checks_created_at ON compliance_checks(created_at DE
 -- Community-submitted violation reports
 CREATE TABLE citizen_reports (
     id UUID PRIMARY KEY DEFAULT gen_random_uuid(),
-    billboard_id UUID REFERENCES violation_reports(id) ON DELETE CASCADE,
+    billboard_id UUID,  -- A violation report id or a billboard entity id (billboards.id)
     reporter_name TEXT NOT NULL,
     reporter_email TEXT NOT NULL,
     reporter_reputation INTEGER DEFAULT 0,
@@ -98,6 +104,278 @@ CREATE INDEX idx_billboard_locations_lat_lon ON billboard_locations(latitude, lo
 CREATE INDEX idx_billboard_locations_created_at ON billboard_locations(created_at DESC);
 CREATE INDEX idx_billboard_locations_report_id ON billboard_locations(report_id);
 
+-- ============ 4a. UPGRADING AN EXISTING DATABASE ============
+-- A fresh install can run this file top to bottom (the statements below are then no-ops).
+-- A database created from an earlier version of this file: run this section through
+-- section 4e, then the update_billboards_updated_at trigger and the
+-- check_and_flag_violation function further down. Every statement is safe to re-run.
+-- Sections 4b-4e add the violation_reports columns their feature writes the same way.
+ALTER TABLE violation_reports ADD COLUMN IF NOT EXISTS billboard_entity_id UUID;
+ALTER TABLE violation_reports ADD COLUMN IF NOT EXISTS citizen_validation_count INTEGER DEFAULT 0;
+CREATE INDEX IF NOT EXISTS idx_violation_reports_billboard ON violation_reports(billboard_entity_id, created_at DESC);
+
+-- citizen_reports.billboard_id may now name a billboard entity as well as a violation
+-- report, so it can no longer reference violation_reports
+ALTER TABLE citizen_reports DROP CONSTRAINT IF EXISTS citizen_reports_billboard_id_fkey;
+
+-- ============ 4b. BILLBOARD ENTITIES TABLE ============
+-- Canonical physical billboards; violation reports are clustered into them
+-- by grid cell (spatial proximity) and MinHash similarity of OCR tokens
+CREATE TABLE IF NOT EXISTS billboards (
+    id UUID PRIMARY KEY DEFAULT gen_random_uuid(),
+    cell_key TEXT NOT NULL,  -- Grid cell "row:col" used for spatial bucketing
+    latitude NUMERIC NOT NULL,  -- Running mean of sightings
+    longitude NUMERIC NOT NULL,
+    signature BIGINT[],  -- MinHash signature of the latest OCR tokens
+    report_count INTEGER DEFAULT 0,
+    last_severity_level TEXT,
+    first_seen TIMESTAMP DEFAULT now(),
+    last_seen TIMESTAMP DEFAULT now(),
+    created_at TIMESTAMP DEFAULT now(),
+    updated_at TIMESTAMP DEFAULT now()
+);
+
+CREATE INDEX IF NOT EXISTS idx_billboards_cell_key ON billboards(cell_key);
+CREATE INDEX IF NOT EXISTS idx_billboards_last_seen ON billboards(last_seen DESC);
+
+ALTER TABLE violation_reports DROP CONSTRAINT IF EXISTS fk_violation_reports_billboard;
+ALTER TABLE violation_reports
+    ADD CONSTRAINT fk_violation_reports_billboard
+    FOREIGN KEY (billboard_entity_id) REFERENCES billboards(id) ON DELETE SET NULL;
+
+-- Add (p_delta = 1) or retract (p_delta = -1) one sighting in a single statement, so concurrent
+-- workers never overwrite each other's counts; the running-mean position is computed from the row
+-- being updated. A billboard left without sightings is deleted and no row is returned.
+CREATE OR REPLACE FUNCTION record_billboard_sighting(
+    p_id UUID, p_latitude NUMERIC, p_longitude NUMERIC, p_signature BIGINT[],
+    p_severity_level TEXT, p_delta INTEGER DEFAULT 1
+)
+RETURNS SETOF billboards AS $$
+BEGIN
+    RETURN QUERY
+    WITH updated AS (
+        UPDATE billboards b SET
+            report_count = COALESCE(b.report_count, 0) + p_delta,
+            latitude = CASE WHEN COALESCE(b.report_count, 0) + p_delta > 0
+                THEN b.latitude + p_delta * (p_latitude - b.latitude) / (COALESCE(b.report_count, 0) + p_delta)
+                ELSE b.latitude END,
+            longitude = CASE WHEN COALESCE(b.report_count, 0) + p_delta > 0
+                THEN b.longitude + p_delta * (p_longitude - b.longitude) / (COALESCE(b.report_count, 0) + p_delta)
+                ELSE b.longitude END,
+            signature = CASE WHEN p_delta > 0 THEN COALESCE(p_signature, b.signature) ELSE b.signature END,
+            last_severity_level = CASE WHEN p_delta > 0 THEN p_severity_level ELSE b.last_severity_level END,
+            last_seen = CASE WHEN p_delta > 0 THEN now() ELSE b.last_seen END
+        WHERE b.id = p_id
+        RETURNING b.*
+    )
+    SELECT * FROM updated WHERE updated.report_count > 0;
+    DELETE FROM billboards WHERE id = p_id AND report_count <= 0;
+END;
+$$ LANGUAGE plpgsql;
+
+-- ============ 4c. MAP TILE AGGREGATES ============
+-- Hierarchical per-tile counts for heatmaps (Web Mercator tile coordinates).
+-- Each located report increments one cell per level; see geo_tiles.py
+CREATE TABLE IF NOT EXISTS tile_aggregates (
+    level SMALLINT NOT NULL,
+    x INTEGER NOT NULL,
+    y INTEGER NOT NULL,
+    report_count INTEGER DEFAULT 0,
+    violation_count INTEGER DEFAULT 0,
+    severity_sum NUMERIC DEFAULT 0,
+    max_severity NUMERIC DEFAULT 0,
+    critical INTEGER DEFAULT 0,
+    high INTEGER DEFAULT 0,
+    medium INTEGER DEFAULT 0,
+    low INTEGER DEFAULT 0,
+    version BIGINT DEFAULT 0,  -- Bumped on every change; drives tile ETags
+    PRIMARY KEY (level, x, y)
+);
+
+-- Apply one report's contribution to all levels in a single call
+-- p_cells: [[level, x, y], ...]; p_delta: {report_count, violation_count, severity_sum, max_severity, critical, high, medium, low}
+CREATE OR REPLACE FUNCTION increment_tile_aggregates(p_cells JSONB, p_delta JSONB)
+RETURNS void AS $$
+BEGIN
+    INSERT INTO tile_aggregates AS t
+        (level, x, y, report_count, violation_count, severity_sum, max_severity, critical, high, medium, low, version)
+    SELECT (c->>0)::SMALLINT, (c->>1)::INTEGER, (c->>2)::INTEGER,
+           COALESCE((p_delta->>'report_count')::INTEGER, 0),
+           COALESCE((p_delta->>'violation_count')::INTEGER, 0),
+           COALESCE((p_delta->>'severity_sum')::NUMERIC, 0),
+           COALESCE((p_delta->>'max_severity')::NUMERIC, 0),
+           COALESCE((p_delta->>'critical')::INTEGER, 0),
+           COALESCE((p_delta->>'high')::INTEGER, 0),
+           COALESCE((p_delta->>'medium')::INTEGER, 0),
+           COALESCE((p_delta->>'low')::INTEGER, 0),
+           1
+    FROM jsonb_array_elements(p_cells) AS c
+    ON CONFLICT (level, x, y) DO UPDATE SET
+        report_count = t.report_count + EXCLUDED.report_count,
+        violation_count = t.violation_count + EXCLUDED.violation_count,
+        severity_sum = t.severity_sum + EXCLUDED.severity_sum,
+        max_severity = GREATEST(t.max_severity, EXCLUDED.max_severity),
+        critical = t.critical + EXCLUDED.critical,
+        high = t.high + EXCLUDED.high,
+        medium = t.medium + EXCLUDED.medium,
+        low = t.low + EXCLUDED.low,
+        version = t.version + 1;
+END;
+$$ LANGUAGE plpgsql;
+
+-- ============ 4d. TREND ROLLUPS ============
+-- Hourly/daily additive counts per dimension value (all, city, zone, severity, keyword, status).
+-- Maintained incrementally by the API on insert, status change and re-score; see rollups.py
+-- The city and zone dimensions come from these upload fields (upgrade: add the columns)
+ALTER TABLE violation_reports ADD COLUMN IF NOT EXISTS city TEXT;
+ALTER TABLE violation_reports ADD COLUMN IF NOT EXISTS zone TEXT;
+
+CREATE TABLE IF NOT EXISTS report_rollups (
+    granularity TEXT NOT NULL,  -- hour, day
+    bucket TIMESTAMP NOT NULL,  -- Bucket start (UTC)
+    dimension TEXT NOT NULL,
+    value TEXT NOT NULL,  -- '' for dimension 'all'
+    report_count INTEGER DEFAULT 0,
+    violation_count INTEGER DEFAULT 0,
+    severity_sum NUMERIC DEFAULT 0,
+    PRIMARY KEY (granularity, dimension, bucket, value)
+);
+
+-- Apply netted increments (one row per key, counts may be negative) in a single call
+-- p_rows: [[granularity, bucket, dimension, value, report_count, violation_count, severity_sum], ...]
+CREATE OR REPLACE FUNCTION increment_report_rollups(p_rows JSONB)
+RETURNS void AS $$
+BEGIN
+    INSERT INTO report_rollups AS r
+        (granularity, bucket, dimension, value, report_count, violation_count, severity_sum)
+    SELECT e->>0, (e->>1)::TIMESTAMP, e->>2, e->>3,
+           (e->>4)::INTEGER, (e->>5)::INTEGER, (e->>6)::NUMERIC
+    FROM jsonb_array_elements(p_rows) AS e
+    ON CONFLICT (granularity, dimension, bucket, value) DO UPDATE SET
+        report_count = r.report_count + EXCLUDED.report_count,
+        violation_count = r.violation_count + EXCLUDED.violation_count,
+        severity_sum = r.severity_sum + EXCLUDED.severity_sum;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Status changes (PATCH /api/reports/{id}/status): the previous status is read under the
+-- row lock taken by the update, so concurrent changes each move the rollups from the status
+-- they actually replaced. Returns {previous_status, report}, or NULL for an unknown id.
+CREATE OR REPLACE FUNCTION update_report_status(p_id UUID, p_status TEXT)
+RETURNS JSONB AS $$
+DECLARE
+    previous TEXT;
+    updated violation_reports;
+BEGIN
+    SELECT status INTO previous FROM violation_reports WHERE id = p_id FOR UPDATE;
+    IF NOT FOUND THEN
+        RETURN NULL;
+    END IF;
+    UPDATE violation_reports SET status = p_status, updated_at = NOW() WHERE id = p_id
+    RETURNING * INTO updated;
+    RETURN jsonb_build_object('previous_status', previous, 'report', to_jsonb(updated));
+END;
+$$ LANGUAGE plpgsql;
+
+-- Re-scoring reads the OCR tokens stored with each report (upgrade: add the column)
+ALTER TABLE violation_reports ADD COLUMN IF NOT EXISTS ocr_tokens JSONB;
+
+-- Re-scoring (rescore.py): one page's new outcomes with the rollup and tile increments that
+-- move those reports, in one transaction. A crash can then never leave reports updated without
+-- their increments, which a resumed run (seeing the reports as unchanged) would not re-apply.
+-- p_updates: [{id, outcome: {is_compliant, violations_found, ...}}, ...]
+-- p_rollups: as increment_report_rollups; p_tiles: [[cells, delta], ...] as increment_tile_aggregates
+CREATE OR REPLACE FUNCTION apply_report_rescore(p_updates JSONB, p_rollups JSONB, p_tiles JSONB)
+RETURNS void AS $$
+DECLARE
+    t JSONB;
+BEGIN
+    UPDATE violation_reports v SET
+        is_compliant = r.is_compliant,
+        violations_found = r.violations_found,
+        violation_count = r.violation_count,
+        violation_context = r.violation_context,
+        severity_level = r.severity_level,
+        severity_score = r.severity_score,
+        extracted_text = CASE WHEN u.value->'outcome' ? 'extracted_text' THEN r.extracted_text ELSE v.extracted_text END
+    FROM jsonb_array_elements(p_updates) AS u,
+         LATERAL jsonb_populate_record(NULL::violation_reports, u.value->'outcome') AS r
+    WHERE v.id = (u.value->>'id')::UUID;
+
+    PERFORM increment_report_rollups(p_rollups);
+    FOR t IN SELECT value FROM jsonb_array_elements(p_tiles) LOOP
+        PERFORM increment_tile_aggregates(t->0, t->1);
+    END LOOP;
+END;
+$$ LANGUAGE plpgsql;
+
+-- ============ 4e. FULL-TEXT SEARCH ============
+-- Word search (tsvector) and OCR-noisy substring search (trigrams) over extracted_text; see search.py
+CREATE EXTENSION IF NOT EXISTS pg_trgm;
+
+CREATE INDEX IF NOT EXISTS idx_violation_reports_text_search ON violation_reports
+    USING GIN (to_tsvector('simple', COALESCE(extracted_text, '')));
+CREATE INDEX IF NOT EXISTS idx_violation_reports_text_trgm ON violation_reports
+    USING GIN (extracted_text gin_trgm_ops);
+CREATE INDEX IF NOT EXISTS idx_violation_reports_created_id ON violation_reports(created_at DESC, id DESC);
+
+-- p_mode 'words': every term must occur (a term with punctuation as a word sequence)
+-- p_mode 'substring': p_terms[1] must occur anywhere, case-insensitively
+-- Newest first; pass the last hit's (created_at, id) to get the next page
+CREATE OR REPLACE FUNCTION search_reports(
+    p_terms TEXT[],
+    p_mode TEXT DEFAULT 'words',
+    p_status TEXT DEFAULT NULL,
+    p_severity TEXT DEFAULT NULL,
+    p_min_lat NUMERIC DEFAULT NULL,
+    p_min_lon NUMERIC DEFAULT NULL,
+    p_max_lat NUMERIC DEFAULT NULL,
+    p_max_lon NUMERIC DEFAULT NULL,
+    p_after_created_at TIMESTAMP DEFAULT NULL,
+    p_after_id UUID DEFAULT NULL,
+    p_limit INTEGER DEFAULT 20
+)
+RETURNS TABLE (
+    id UUID, image_url TEXT, extracted_text TEXT, status TEXT, severity_level TEXT, severity_score NUMERIC,
+    violations_found TEXT[], latitude NUMERIC, longitude NUMERIC, city TEXT, zone TEXT,
+    billboard_entity_id UUID, created_at TIMESTAMP
+) AS $$
+DECLARE
+    query tsquery;
+    pattern TEXT;
+    term TEXT;
+    sql TEXT;
+BEGIN
+    -- Only the filters in use are part of the statement, so the planner can pick the text index
+    IF p_mode = 'substring' THEN
+        pattern := '%' || replace(replace(replace(p_terms[1], '\', '\\'), '%', '\%'), '_', '\_') || '%';
+        sql := 'v.extracted_text ILIKE $1';
+    ELSE
+        FOREACH term IN ARRAY p_terms LOOP
+            query := CASE WHEN query IS NULL THEN phraseto_tsquery('simple', term)
+                          ELSE query && phraseto_tsquery('simple', term) END;
+        END LOOP;
+        sql := 'to_tsvector(''simple'', COALESCE(v.extracted_text, '''')) @@ $2';
+    END IF;
+    IF p_status IS NOT NULL THEN sql := sql || ' AND v.status = $3'; END IF;
+    IF p_severity IS NOT NULL THEN sql := sql || ' AND v.severity_level = $4'; END IF;
+    IF p_min_lat IS NOT NULL THEN
+        sql := sql || ' AND v.latitude BETWEEN $5 AND $7 AND v.longitude BETWEEN $6 AND $8';
+    END IF;
+    IF p_after_created_at IS NOT NULL THEN
+        sql := sql || ' AND (v.created_at, v.id) < ($9, $10)';
+    END IF;
+
+    RETURN QUERY EXECUTE
+        'SELECT v.id, v.image_url, v.extracted_text, v.status, v.severity_level, v.severity_score,
+                v.violations_found, v.latitude, v.longitude, v.city, v.zone, v.billboard_entity_id, v.created_at
+         FROM violation_reports v WHERE ' || sql ||
+        ' ORDER BY v.created_at DESC, v.id DESC LIMIT $11'
+    USING pattern, query, p_status, p_severity, p_min_lat, p_min_lon, p_max_lat, p_max_lon,
+          p_after_created_at, p_after_id, p_limit;
+END;
+$$ LANGUAGE plpgsql STABLE;
+
 -- ============ 5. IMAGE STORAGE METADATA TABLE ============
 -- Metadata for stored billboard images
 CREATE TABLE image_storage (
@@ -136,6 +414,11 @@ BEFORE UPDATE ON citizen_reports
 FOR EACH ROW
 EXECUTE FUNCTION update_updated_at();
 
+CREATE OR REPLACE TRIGGER update_billboards_updated_at
+BEFORE UPDATE ON billboards
+FOR EACH ROW
+EXECUTE FUNCTION update_updated_at();
+
 -- Auto-flag violation when citizen reports reach threshold
 CREATE OR REPLACE FUNCTION check_and_flag_violation()
 RETURNS TRIGGER AS $$
@@ -153,7 +436,7 @@ BEGIN
     IF total_validations >= MIN_REPORTS_THRESHOLD THEN
         UPDATE violation_reports
         SET status = 'flagged_by_citizens'
-        WHERE id = NEW.billboard_id;
+        WHERE id = NEW.billboard_id OR billboard_entity_id = NEW.billboard_id;
     END IF;
     
     RETURN NEW;
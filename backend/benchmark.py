@@ -0,0 +1,665 @@
+"""
+Reproducible benchmark suite for the billboard analysis pipeline.
+
+Usage:
+    python benchmark.py detector --count 60 --out results.json
+    python benchmark.py api --count 30 --out api.json
+    python benchmark.py coldstart --runs 5
+    python benchmark.py storage --reports 100000 --db-path /tmp/bench.db
+    python benchmark.py all --baseline previous.json --tolerance 0.15
+    python benchmark.py corpus --count 100 --dir ./corpus
+    python benchmark.py keywords --count 2000
+    python benchmark.py regions --count 30
+    python benchmark.py serialization
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import random
+import resource
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import uuid
+from datetime import datetime
+from multiprocessing import Pool
+from typing import Dict, List, Optional
+import metrics
+from synthetic_corpus import FILLER_WORDS, SyntheticBillboardCorpus, load_corpus
+
+
+# ============= HELPERS =============
+def percentiles(values: List[float]) -> Dict:
+    """Summary statistics (milliseconds in, milliseconds out)"""
+    if not values:
+        return {"count": 0, "mean": 0.0, "p50": 0.0, "p95": 0.0, "p99": 0.0, "max": 0.0}
+    ordered = sorted(values)
+
+    def pct(p):
+        return ordered[min(len(ordered) - 1, int(round(p * (len(ordered) - 1))))]
+
+    return {
+        "count": len(ordered),
+        "mean": round(statistics.fmean(ordered), 3),
+        "p50": round(pct(0.50), 3),
+        "p95": round(pct(0.95), 3),
+        "p99": round(pct(0.99), 3),
+        "max": round(ordered[-1], 3),
+    }
+
+
+def peak_rss_mb() -> Dict:
+    """Peak resident set size of this process and its (reaped) children"""
+    divisor = 1024 * 1024 if sys.platform == "darwin" else 1024  # ru_maxrss is bytes on macOS, KiB on Linux
+    return {
+        "self": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / divisor, 1),
+        "children": round(resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss / divisor, 1),
+    }
+
+
+def keyword_scores(samples: List[Dict], predictions: List[List[str]]) -> Dict:
+    """Micro-averaged keyword recall/precision against the corpus ground truth"""
+    tp = fp = fn = 0
+    for sample, predicted in zip(samples, predictions):
+        truth, found = set(sample["keywords"]), set(predicted)
+        tp += len(truth & found)
+        fp += len(found - truth)
+        fn += len(truth - found)
+    precision = tp / (tp + fp) if tp + fp else 1.0
+    recall = tp / (tp + fn) if tp + fn else 1.0
+    f1 = 2 * precision * recall / (precision + recall) if precision + recall else 0.0
+    return {"true_positives": tp, "false_positives": fp, "false_negatives": fn,
+            "precision": round(precision, 4), "recall": round(recall, 4), "f1": round(f1, 4)}
+
+
+def run_metadata(args) -> Dict:
+    try:
+        commit = subprocess.run(["git", "rev-parse", "HEAD"], capture_output=True, text=True, timeout=5).stdout.strip()
+    except Exception:
+        commit = None
+    return {
+        "timestamp": datetime.utcnow().isoformat(),
+        "git_commit": commit or None,
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "args": {k: v for k, v in vars(args).items() if k != "func"},
+    }
+
+
+def build_corpus(args) -> List[Dict]:
+    if args.corpus_dir:
+        return load_corpus(args.corpus_dir)
+    return SyntheticBillboardCorpus(seed=args.seed).generate(args.count)
+
+
+# ============= DETECTOR BENCHMARK =============
+_worker_detector = None
+
+
+def _init_worker():
+    global _worker_detector
+    from detector import ViolationDetector
+    _worker_detector = ViolationDetector()
+
+
+def _analyze_sample(image_data: bytes) -> Dict:
+    start = time.perf_counter()
+    with metrics.trace("benchmark", force=True) as trace:
+        result = _worker_detector.analyze_image(image_data)
+    return {
+        "latency_ms": (time.perf_counter() - start) * 1000,
+        "stages_ms": {k: v * 1000 for k, v in trace.stage_timings().items()},
+        "violations": result.get("violations_found", []),
+        "ok": bool(result.get("analysis_complete")),
+    }
+
+
+def bench_detector(samples: List[Dict], workers: int = 1, warmup: int = 2) -> Dict:
+    """Latency, per-stage timings, throughput and accuracy of ViolationDetector.analyze_image"""
+    payloads = [s["image_data"] for s in samples]
+    if workers <= 1:
+        _init_worker()
+        for data in payloads[:warmup]:
+            _analyze_sample(data)
+        started = time.perf_counter()
+        cpu_started = time.process_time()
+        results = [_analyze_sample(data) for data in payloads]
+        cpu_seconds = time.process_time() - cpu_started
+    else:
+        with Pool(workers, initializer=_init_worker) as pool:
+            pool.map(_analyze_sample, payloads[:warmup * workers])
+            started = time.perf_counter()
+            results = pool.map(_analyze_sample, payloads, chunksize=1)
+        cpu_seconds = None
+    wall_seconds = time.perf_counter() - started
+
+    stages: Dict[str, List[float]] = {}
+    for result in results:
+        for stage, ms in result["stages_ms"].items():
+            stages.setdefault(stage, []).append(ms)
+
+    images_per_sec = len(results) / wall_seconds if wall_seconds else 0.0
+    return {
+        "images": len(results),
+        "failed": sum(1 for r in results if not r["ok"]),
+        "workers": workers,
+        "wall_seconds": round(wall_seconds, 3),
+        "cpu_seconds": round(cpu_seconds, 3) if cpu_seconds is not None else None,
+        "images_per_sec": round(images_per_sec, 3),
+        "images_per_sec_per_core": round(images_per_sec / max(1, workers), 3),
+        "latency_ms": percentiles([r["latency_ms"] for r in results]),
+        "stages_ms": {stage: percentiles(values) for stage, values in sorted(stages.items())},
+        "accuracy": keyword_scores(samples, [r["violations"] for r in results]),
+        "peak_rss_mb": peak_rss_mb(),
+    }
+
+
+# ============= END-TO-END API BENCHMARK =============
+def _load_app_with_local_db(blob_dir: str):
+    """Import main backed by an in-memory SQLite database (no network needed) and no result cache"""
+    import db as db_module
+    from local_db import LocalDB
+
+    local = LocalDB(":memory:", blob_dir=blob_dir)
+    db_module.db = local
+    import main
+    main.db = local
+    # The corpus seed is fixed, so a persistent result cache would turn every later run into cache hits
+    main.result_cache = None
+    return main.app, local
+
+
+def bench_api(samples: List[Dict], warmup: int = 2) -> Dict:
+    """End-to-end /api/analyze throughput through FastAPI's test client"""
+    from fastapi.testclient import TestClient
+
+    blob_dir = tempfile.mkdtemp(prefix="billboard-bench-")
+    app, local = _load_app_with_local_db(blob_dir)
+    latencies, statuses = [], {}
+    with TestClient(app) as client:
+        def post(sample):
+            files = {"file": (f"{sample['id']}.jpg", sample["image_data"], "image/jpeg")}
+            return client.post("/api/analyze", files=files)
+
+        for sample in samples[:warmup]:
+            post(sample)
+        started = time.perf_counter()
+        for sample in samples:
+            t0 = time.perf_counter()
+            response = post(sample)
+            latencies.append((time.perf_counter() - t0) * 1000)
+            statuses[response.status_code] = statuses.get(response.status_code, 0) + 1
+        wall_seconds = time.perf_counter() - started
+
+    return {
+        "requests": len(samples),
+        "status_codes": {str(k): v for k, v in sorted(statuses.items())},
+        "wall_seconds": round(wall_seconds, 3),
+        "requests_per_sec": round(len(samples) / wall_seconds, 3) if wall_seconds else 0.0,
+        "latency_ms": percentiles(latencies),
+        "reports_stored": local.conn.execute("SELECT COUNT(*) FROM violation_reports").fetchone()[0],
+        "peak_rss_mb": peak_rss_mb(),
+    }
+
+
+# ============= STORAGE BENCHMARK =============
+def _synthetic_report(rng: random.Random) -> Dict:
+    severity = rng.choice(["None", "Low", "Medium", "High", "Critical"])
+    return {
+        "image_url": "file:///dev/null",
+        "image_filename": f"billboards/{uuid.uuid4()}.jpg",
+        "extracted_text": " ".join(rng.choice(FILLER_WORDS) for _ in range(12)),
+        "is_compliant": severity == "None",
+        "status": rng.choice(["pending", "approved", "resolved"]),
+        "violations_found": [],
+        "violation_count": 0,
+        "ocr_confidence": round(rng.random(), 2),
+        "severity_level": severity,
+        "severity_score": rng.randint(0, 10),
+        "text_regions": [{"x": 1, "y": 2, "width": 30, "height": 12, "area": 360}],
+        "latitude": 40.70 + rng.uniform(-0.2, 0.2),
+        "longitude": -74.00 + rng.uniform(-0.2, 0.2),
+    }
+
+
+def bench_storage(reports: int, queries: int = 200, seed: int = 42, path: str = ":memory:") -> Dict:
+    """Ingest and query throughput of the local SQLite backend"""
+    from local_db import LocalDB
+
+    rng = random.Random(seed)
+    local = LocalDB(path, blob_dir=tempfile.mkdtemp(prefix="billboard-bench-"))
+
+    async def run():
+        timings = {}
+        started = time.perf_counter()
+        for _ in range(reports):
+            await local.create_violation_report(_synthetic_report(rng))
+            location = {"latitude": 40.70 + rng.uniform(-0.2, 0.2), "longitude": -74.00 + rng.uniform(-0.2, 0.2)}
+            await local.save_billboard_location(location)
+        ingest_seconds = time.perf_counter() - started
+
+        query_plan = {
+            "get_violation_reports": lambda: local.get_violation_reports(50, rng.randint(0, max(0, reports - 50))),
+            "get_nearby_billboards": lambda: local.get_nearby_billboards(40.70 + rng.uniform(-0.2, 0.2), -74.00 + rng.uniform(-0.2, 0.2), 1.0),
+            "get_statistics": lambda: local.get_statistics(),
+            # Common word (in about a third of reports), two-word AND, and a substring of a word
+            "search_words": lambda: local.search_reports([rng.choice(FILLER_WORDS)], "words", limit=21),
+            "search_two_words": lambda: local.search_reports(rng.sample(FILLER_WORDS, 2), "words", limit=21),
+            "search_substring": lambda: local.search_reports([rng.choice(FILLER_WORDS)[1:4]], "substring", limit=21),
+        }
+        for name, query in query_plan.items():
+            latencies = []
+            for _ in range(queries):
+                t0 = time.perf_counter()
+                await query()
+                latencies.append((time.perf_counter() - t0) * 1000)
+            timings[name] = percentiles(latencies)
+        await local.close()
+        return ingest_seconds, timings
+
+    ingest_seconds, timings = asyncio.run(run())
+    return {
+        "reports": reports,
+        "ingest_seconds": round(ingest_seconds, 3),
+        "inserts_per_sec": round(2 * reports / ingest_seconds, 1) if ingest_seconds else 0.0,
+        "query_latency_ms": timings,
+        "peak_rss_mb": peak_rss_mb(),
+    }
+
+
+# ============= KEYWORD MATCHING BENCHMARK =============
+OCR_SUBSTITUTIONS = {"o": "0", "l": "1", "s": "5", "e": "3", "a": "4", "i": "1", "b": "8"}
+
+
+def _ocr_noise(rng: random.Random, keyword: str) -> List[str]:
+    """One simulated OCR misreading of a keyword (may split it into two tokens)"""
+    kind = rng.choice(["confusion", "substitute", "delete", "insert", "transpose", "split"])
+    chars = list(keyword)
+    pos = rng.randrange(len(chars))
+    if kind == "confusion":
+        candidates = [i for i, c in enumerate(chars) if c in OCR_SUBSTITUTIONS] or [pos]
+        pos = rng.choice(candidates)
+        chars[pos] = OCR_SUBSTITUTIONS.get(chars[pos], chars[pos])
+    elif kind == "substitute":
+        chars[pos] = rng.choice("abcdefghijklmnopqrstuvwxyz")
+    elif kind == "delete" and len(chars) > 3:
+        del chars[pos]
+    elif kind == "insert":
+        chars.insert(pos, rng.choice("abcdefghijklmnopqrstuvwxyz"))
+    elif kind == "transpose" and pos + 1 < len(chars):
+        chars[pos], chars[pos + 1] = chars[pos + 1], chars[pos]
+    elif kind == "split" and len(chars) > 3:
+        cut = rng.randint(2, len(chars) - 2)
+        return ["".join(chars[:cut]), "".join(chars[cut:])]
+    return ["".join(chars)]
+
+
+# Real words one or two edits from a default keyword; clean samples include one each
+NEAR_MISS_FILLER = ["drums", "drags", "dregs", "dry rugs", "prohibits", "rambling", "adapt", "dude", "nudge"]
+
+
+def _legacy_find(words: List[str], keywords: List[str]) -> List[str]:
+    """The exact-substring matcher detect_violations used before fuzzy matching"""
+    return [kw for kw in keywords if any(kw in word for word in words)]
+
+
+def bench_keywords(count: int, seed: int = 42) -> Dict:
+    """Recall on OCR-noised keywords, false positives on clean filler text with near-miss words, and cost per token"""
+    from config import VIOLATION_KEYWORDS
+    from keyword_matcher import KeywordMatcher
+
+    keywords = [kw.strip().lower() for kw in VIOLATION_KEYWORDS]
+    matcher = KeywordMatcher(keywords)
+    rng = random.Random(seed)
+    noisy, clean = [], []
+    for _ in range(count):
+        keyword = rng.choice(keywords)
+        words = [rng.choice(FILLER_WORDS) for _ in range(rng.randint(2, 5))]
+        position = rng.randint(0, len(words))
+        noisy.append((keyword, words[:position] + _ocr_noise(rng, keyword) + words[position:]))
+        clean.append([rng.choice(FILLER_WORDS) for _ in range(rng.randint(3, 8))] + rng.choice(NEAR_MISS_FILLER).split())
+
+    def score(find) -> Dict:
+        hits = sum(1 for keyword, words in noisy if keyword in find(words))
+        false_positives = sum(1 for words in clean if find(words))
+        return {"recall": round(hits / len(noisy), 4), "false_positive_rate": round(false_positives / len(clean), 4)}
+
+    def fuzzy_find(words):
+        return {kw for _, kw in matcher.find(words)}
+
+    tokens = [word for _, words in noisy for word in words] + [word for words in clean for word in words]
+
+    def per_token_us(lookup, uncached: bool = False) -> float:
+        started = time.perf_counter()
+        for token in tokens:
+            if uncached:
+                matcher._cache.clear()
+            lookup(token)
+        return round((time.perf_counter() - started) * 1e6 / len(tokens), 3)
+
+    for token in tokens:
+        matcher.match_token(token)  # Warm the token cache for the cached measurement
+    return {
+        "samples": count,
+        "keywords": len(keywords),
+        "index_entries": len(matcher.index),
+        "exact": {**score(lambda words: _legacy_find(words, keywords)),
+                  "us_per_token": per_token_us(lambda token: _legacy_find([token], keywords))},
+        "fuzzy": {**score(fuzzy_find),
+                  "us_per_token": per_token_us(matcher.match_token, uncached=True),
+                  "cached_us_per_token": per_token_us(matcher.match_token)},
+    }
+
+
+# ============= TEXT REGION BENCHMARK =============
+def bench_regions(samples: List[Dict]) -> Dict:
+    """Region count and payload bytes: raw contour boxes vs merged lines (JSON and compact)"""
+    import cv2
+    from config import IMAGE_RESIZE_SCALE
+    from detector import detector
+    from text_regions import build_regions, pack_regions
+
+    counts = {"raw": [], "merged": []}
+    sizes = {"raw_json": 0, "merged_json": 0, "merged_compact": 0}
+    merge_ms = []
+    for sample in samples:
+        processed = detector.preprocess_image(detector.load_image(sample["image_data"]))
+        contours, _ = cv2.findContours(processed, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+        raw = []
+        for contour in contours:
+            x, y, w, h = cv2.boundingRect(contour)
+            if w > 10 and h > 10:
+                raw.append({"x": int(x), "y": int(y), "width": int(w), "height": int(h), "area": int(w * h)})
+        started = time.perf_counter()
+        merged = build_regions(
+            [(r["x"], r["y"], r["x"] + r["width"], r["y"] + r["height"]) for r in raw],
+            IMAGE_RESIZE_SCALE, (processed.shape[1], processed.shape[0]),
+        )
+        merge_ms.append((time.perf_counter() - started) * 1000)
+        counts["raw"].append(len(raw))
+        counts["merged"].append(len(merged))
+        sizes["raw_json"] += len(json.dumps(raw))
+        sizes["merged_json"] += len(json.dumps(merged))
+        sizes["merged_compact"] += len(json.dumps(pack_regions(merged)))
+
+    images = max(1, len(samples))
+    return {
+        "images": len(samples),
+        "regions_per_image": {name: round(sum(values) / images, 1) for name, values in counts.items()},
+        "max_raw_regions": max(counts["raw"], default=0),
+        "bytes_per_image": {name: round(total / images, 1) for name, total in sizes.items()},
+        "reduction_vs_raw": {
+            name: round(1 - sizes[name] / sizes["raw_json"], 4) if sizes["raw_json"] else 0.0
+            for name in ("merged_json", "merged_compact")
+        },
+        "merge_latency_ms": percentiles(merge_ms),
+    }
+
+
+# ============= SERIALIZATION BENCHMARK =============
+def _endpoint_payloads(rng: random.Random, items: int = 100) -> Dict[str, Dict]:
+    """Representative response bodies for the heavy endpoints"""
+    def regions(n):
+        return [{"x": rng.randint(0, 1900), "y": rng.randint(0, 1000), "width": rng.randint(20, 400),
+                 "height": rng.randint(12, 60), "area": rng.randint(240, 24000)} for _ in range(n)]
+
+    def report():
+        data = _synthetic_report(rng)
+        data.update({
+            "id": str(uuid.uuid4()),
+            "created_at": datetime.utcnow().isoformat(),
+            "extracted_text": " ".join(rng.choice(FILLER_WORDS) for _ in range(120)),
+            "text_regions": regions(60),
+        })
+        return data
+
+    reports = [report() for _ in range(items)]
+    citizen = [{
+        "id": str(uuid.uuid4()), "billboard_id": str(uuid.uuid4()), "reporter_name": "Jane Citizen",
+        "reporter_email": "jane@example.com", "reporter_reputation": rng.randint(0, 100),
+        "latitude": 40.7 + rng.uniform(-0.1, 0.1), "longitude": -74.0 + rng.uniform(-0.1, 0.1),
+        "description": " ".join(rng.choice(FILLER_WORDS) for _ in range(40)), "status": "submitted",
+        "validated_by_count": rng.randint(0, 5), "validator_ids": [], "submitted_at": datetime.utcnow().isoformat(),
+    } for _ in range(items)]
+    nearby = [{
+        "id": str(uuid.uuid4()), "latitude": 40.7 + rng.uniform(-0.01, 0.01), "longitude": -74.0 + rng.uniform(-0.01, 0.01),
+        "address": f"{rng.randint(1, 999)} Broadway", "city": "New York", "state": "NY", "country": "US",
+        "distance_km": round(rng.uniform(0, 1), 3),
+    } for _ in range(items)]
+    analysis = report()
+    return {
+        "/api/reports": {"success": True, "count": items, "message": f"Retrieved {items} reports", "data": reports},
+        "/api/citizen-reports": {"success": True, "count": items, "message": f"Retrieved {items} citizen reports", "reports": citizen},
+        "/api/geolocation/nearby": {"success": True, "query_location": {"latitude": 40.7, "longitude": -74.0}, "radius_km": 1.0,
+                                    "count": items, "message": f"Found {items} billboards", "billboards": nearby},
+        "/api/analyze": {"success": True, "report_id": analysis["id"], "billboard_id": None, "image_url": analysis["image_url"],
+                         "analysis": {key: analysis.get(key) for key in ("is_compliant", "status", "violations_found", "violation_count",
+                                                                        "ocr_confidence", "severity_level", "severity_score",
+                                                                        "text_regions", "extracted_text")},
+                         "message": "No violations found."},
+    }
+
+
+def bench_serialization(items: int = 100, repeats: int = 50, seed: int = 42) -> Dict:
+    """Encode time and bytes per endpoint: FastAPI default vs the fast path, plus compressed sizes"""
+    import gzip
+    from fastapi.encoders import jsonable_encoder
+    from config import GZIP_LEVEL, BROTLI_QUALITY
+    import serialization
+
+    encoders = {
+        "fastapi_default": lambda payload: json.dumps(jsonable_encoder(payload), ensure_ascii=False,
+                                                     allow_nan=False, indent=None, separators=(",", ":")).encode("utf-8"),
+        serialization.ENCODER: serialization.dumps,
+    }
+    if serialization.ENCODER != "json":
+        encoder = json.JSONEncoder(default=serialization._default, ensure_ascii=False, separators=(",", ":"))
+        encoders["json_fallback"] = lambda payload: encoder.encode(payload).encode("utf-8")
+    try:
+        import brotli
+    except ImportError:
+        brotli = None
+
+    results = {"encoder": serialization.ENCODER, "items_per_list": items, "endpoints": {}}
+    for endpoint, payload in _endpoint_payloads(random.Random(seed), items).items():
+        timings = {}
+        for name, encode in encoders.items():
+            encode(payload)
+            started = time.perf_counter()
+            for _ in range(repeats):
+                body = encode(payload)
+            timings[name] = round((time.perf_counter() - started) * 1000 / repeats, 3)
+        sizes = {"raw": len(body), "gzip": len(gzip.compress(body, GZIP_LEVEL))}
+        if brotli is not None:
+            sizes["br"] = len(brotli.compress(body, quality=BROTLI_QUALITY))
+        fast = timings[serialization.ENCODER]
+        results["endpoints"][endpoint] = {
+            "encode_ms": timings,
+            "speedup": round(timings["fastapi_default"] / fast, 2) if fast else 0.0,
+            "bytes": sizes,
+        }
+    return results
+
+
+# ============= COLD START BENCHMARK =============
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def _cold_start_once(sample: Dict, warmup: bool, timeout: float = 60.0) -> Dict:
+    """Launch a fresh uvicorn process; time first healthy response and first analysis"""
+    import httpx
+
+    port = _free_port()
+    env = {**os.environ, "STORAGE_BACKEND": "memory", "STARTUP_WARMUP": "true" if warmup else "false", "STARTUP_PROFILE": "true",
+           "RESULT_CACHE_ENABLED": "false"}  # Earlier runs must not turn the first analysis into a cache hit
+    started = time.perf_counter()
+    process = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--host", "127.0.0.1", "--port", str(port), "--log-level", "warning"],
+        cwd=os.path.dirname(os.path.abspath(__file__)), env=env,
+        stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    base = f"http://127.0.0.1:{port}"
+    try:
+        with httpx.Client(timeout=timeout) as client:
+            healthy_ms, startup_profile = None, None
+            while time.perf_counter() - started < timeout:
+                try:
+                    response = client.get(f"{base}/api/health")
+                    if response.status_code == 200:
+                        healthy_ms = (time.perf_counter() - started) * 1000
+                        startup_profile = response.json().get("startup")
+                        break
+                except httpx.TransportError:
+                    pass
+                time.sleep(0.005)
+            if healthy_ms is None:
+                return {"error": "server did not become healthy"}
+
+            t0 = time.perf_counter()
+            files = {"file": (f"{sample['id']}.jpg", sample["image_data"], "image/jpeg")}
+            response = client.post(f"{base}/api/analyze", files=files)
+            first_analysis_ms = (time.perf_counter() - t0) * 1000
+            t0 = time.perf_counter()
+            client.post(f"{base}/api/analyze", files=files)
+            second_analysis_ms = (time.perf_counter() - t0) * 1000
+        return {
+            "time_to_healthy_ms": round(healthy_ms, 3),
+            "first_analysis_ms": round(first_analysis_ms, 3),
+            "first_analysis_status": response.status_code,
+            "second_analysis_ms": round(second_analysis_ms, 3),
+            "startup_profile": startup_profile,
+        }
+    finally:
+        process.terminate()
+        process.wait(timeout=30)
+
+
+def bench_cold_start(samples: List[Dict], runs: int = 3) -> Dict:
+    """Cold-start time to first healthy response, with and without the OCR warm-up"""
+    results = {}
+    for warmup in (False, True):
+        attempts = [_cold_start_once(samples[0], warmup) for _ in range(runs)]
+        ok = [a for a in attempts if "error" not in a]
+        results["warmup" if warmup else "no_warmup"] = {
+            "runs": runs,
+            "failed": runs - len(ok),
+            "time_to_healthy_ms": percentiles([a["time_to_healthy_ms"] for a in ok]),
+            "first_analysis_ms": percentiles([a["first_analysis_ms"] for a in ok]),
+            "second_analysis_ms": percentiles([a["second_analysis_ms"] for a in ok]),
+            "startup_profile": ok[-1]["startup_profile"] if ok else None,
+        }
+    return results
+
+
+# ============= REGRESSION COMPARISON =============
+# (json path, direction): "higher" means bigger is better
+TRACKED_METRICS = [
+    (("detector", "images_per_sec_per_core"), "higher"),
+    (("detector", "latency_ms", "p95"), "lower"),
+    (("detector", "accuracy", "recall"), "higher"),
+    (("detector", "accuracy", "precision"), "higher"),
+    (("api", "requests_per_sec"), "higher"),
+    (("api", "latency_ms", "p95"), "lower"),
+    (("storage", "inserts_per_sec"), "higher"),
+    (("coldstart", "no_warmup", "time_to_healthy_ms", "p50"), "lower"),
+    (("storage", "query_latency_ms", "get_nearby_billboards", "p95"), "lower"),
+    (("storage", "query_latency_ms", "search_words", "p95"), "lower"),
+    (("keywords", "fuzzy", "recall"), "higher"),
+    (("keywords", "fuzzy", "us_per_token"), "lower"),
+    (("regions", "bytes_per_image", "merged_json"), "lower"),
+    (("serialization", "endpoints", "/api/reports", "speedup"), "higher"),
+]
+
+
+def _lookup(data: Dict, path) -> Optional[float]:
+    for key in path:
+        if not isinstance(data, dict) or key not in data:
+            return None
+        data = data[key]
+    return data if isinstance(data, (int, float)) else None
+
+
+def compare_results(current: Dict, baseline: Dict, tolerance: float) -> List[Dict]:
+    """Return tracked metrics that regressed by more than `tolerance` (fraction)"""
+    regressions = []
+    for path, direction in TRACKED_METRICS:
+        new, old = _lookup(current, path), _lookup(baseline, path)
+        if new is None or old is None or old == 0:
+            continue
+        change = (new - old) / abs(old)
+        worse = change < -tolerance if direction == "higher" else change > tolerance
+        if worse:
+            regressions.append({"metric": ".".join(path), "baseline": old, "current": new, "change": round(change, 4)})
+    return regressions
+
+
+# ============= CLI =============
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Billboard analysis benchmarks")
+    parser.add_argument("suite", choices=["detector", "api", "storage", "coldstart", "keywords", "regions", "serialization", "all", "corpus"])
+    parser.add_argument("--count", type=int, default=30, help="Synthetic images to generate")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--corpus-dir", help="Use (or with 'corpus', write) an on-disk corpus")
+    parser.add_argument("--dir", help="Output directory for the 'corpus' suite")
+    parser.add_argument("--reports", type=int, default=10000, help="Rows to ingest for the 'storage' suite")
+    parser.add_argument("--db-path", default=":memory:", help="SQLite file for the 'storage' suite")
+    parser.add_argument("--runs", type=int, default=3, help="Server launches per mode for the 'coldstart' suite")
+    parser.add_argument("--workers", type=int, default=1, help="Detector worker processes")
+    parser.add_argument("--out", help="Write JSON results to this file (default: stdout)")
+    parser.add_argument("--baseline", help="Previous results JSON to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.15, help="Allowed relative regression")
+    args = parser.parse_args(argv)
+
+    if args.suite == "corpus":
+        corpus = SyntheticBillboardCorpus(seed=args.seed)
+        path = corpus.write(corpus.generate(args.count), args.dir or "benchmark_corpus")
+        print(f"Wrote corpus manifest to {path}")
+        return 0
+
+    samples = build_corpus(args) if args.suite not in ("storage", "keywords", "serialization") else []
+    results = {"meta": run_metadata(args), "corpus": {"images": len(samples), "seed": args.seed}}
+    if args.suite in ("detector", "all"):
+        results["detector"] = bench_detector(samples, workers=args.workers)
+    if args.suite in ("api", "all"):
+        results["api"] = bench_api(samples)
+    if args.suite in ("coldstart", "all"):
+        results["coldstart"] = bench_cold_start(samples, runs=args.runs)
+    if args.suite in ("storage", "all"):
+        results["storage"] = bench_storage(args.reports, seed=args.seed, path=args.db_path)
+    if args.suite in ("keywords", "all"):
+        results["keywords"] = bench_keywords(max(args.count, 1000), seed=args.seed)
+    if args.suite in ("regions", "all"):
+        results["regions"] = bench_regions(samples)
+    if args.suite in ("serialization", "all"):
+        results["serialization"] = bench_serialization(seed=args.seed)
+
+    exit_code = 0
+    if args.baseline:
+        with open(args.baseline) as f:
+            regressions = compare_results(results, json.load(f), args.tolerance)
+        results["regressions"] = regressions
+        exit_code = 1 if regressions else 0
+
+    output = json.dumps(results, indent=2)
+    if args.out:
+        with open(args.out, "w") as f:
+            f.write(output)
+        print(f"Results written to {args.out}")
+    else:
+        print(output)
+    for regression in results.get("regressions", []):
+        print(f"REGRESSION {regression['metric']}: {regression['baseline']} -> {regression['current']}", file=sys.stderr)
+    return exit_code
+
+
+if __name__ == "__main__":
+    sys.exit(main())
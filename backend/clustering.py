@@ -0,0 +1,209 @@
+import asyncio
+import math
+import random
+import re
+import zlib
+from collections import OrderedDict
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+from config import (
+    BILLBOARD_CELL_METERS, BILLBOARD_MATCH_RADIUS_METERS,
+    BILLBOARD_TEXT_SIMILARITY, MINHASH_PERMUTATIONS, BILLBOARD_CELL_CACHE_SIZE
+)
+from db import db
+
+_MERSENNE_PRIME = (1 << 61) - 1
+_TOKEN_PATTERN = re.compile(r"[a-z0-9]{3,}")
+METERS_PER_DEGREE = 111320.0
+
+
+# ============= MINHASH =============
+class MinHasher:
+    """MinHash signatures over OCR word tokens (stable across processes and restarts)"""
+
+    def __init__(self, num_perm: int = MINHASH_PERMUTATIONS, seed: int = 1):
+        rng = random.Random(seed)
+        self.params = [(rng.randrange(1, _MERSENNE_PRIME), rng.randrange(0, _MERSENNE_PRIME)) for _ in range(num_perm)]
+
+    @staticmethod
+    def tokens(text: str) -> Set[str]:
+        return set(_TOKEN_PATTERN.findall((text or "").lower()))
+
+    def signature(self, tokens: Iterable[str]) -> Optional[List[int]]:
+        hashes = [zlib.crc32(token.encode()) for token in tokens]
+        if not hashes:
+            return None
+        return [min((a * h + b) % _MERSENNE_PRIME for h in hashes) for a, b in self.params]
+
+    @staticmethod
+    def similarity(sig_a: List[int], sig_b: List[int]) -> float:
+        """Estimated Jaccard similarity of the token sets"""
+        return sum(1 for a, b in zip(sig_a, sig_b) if a == b) / len(sig_a)
+
+
+# ============= SPATIAL GRID =============
+def grid_cell(latitude: float, longitude: float, cell_meters: float = BILLBOARD_CELL_METERS) -> Tuple[int, int]:
+    """Equal-area-ish grid: fixed latitude bands, longitude width scaled by cos(latitude) per band"""
+    dlat = cell_meters / METERS_PER_DEGREE
+    row = math.floor(latitude / dlat)
+    dlon = dlat / max(math.cos(math.radians((row + 0.5) * dlat)), 0.01)
+    return row, math.floor(longitude / dlon)
+
+
+def cell_key(cell: Tuple[int, int]) -> str:
+    return f"{cell[0]}:{cell[1]}"
+
+
+def neighbor_keys(latitude: float, longitude: float, cell_meters: float = BILLBOARD_CELL_METERS) -> List[str]:
+    """Keys of the 3x3 block of cells around a point (each row uses its own longitude width)"""
+    dlat = cell_meters / METERS_PER_DEGREE
+    row, _ = grid_cell(latitude, longitude, cell_meters)
+    keys = []
+    for r in (row - 1, row, row + 1):
+        dlon = dlat / max(math.cos(math.radians((r + 0.5) * dlat)), 0.01)
+        col = math.floor(longitude / dlon)
+        keys.extend(cell_key((r, c)) for c in (col - 1, col, col + 1))
+    return keys
+
+
+def distance_meters(lat1: float, lon1: float, lat2: float, lon2: float) -> float:
+    return db._calculate_distance(lat1, lon1, lat2, lon2) * 1000
+
+
+# ============= CLUSTERING ENGINE =============
+class BillboardClusterer:
+    """Incrementally assigns violation reports to canonical physical billboards.
+
+    Billboards are bucketed by grid cell; a report is compared only with billboards in
+    the 3x3 cells around it (by distance, then MinHash text similarity), so each insert
+    costs O(1) amortized. The storage backend is the source of truth: cells are loaded
+    on first touch (and kept in an LRU) and re-read before creating a billboard, which
+    catches billboards created by other workers. Sightings are counted by the database
+    atomically and the cached billboard is refreshed from the row it returns, so workers
+    never overwrite each other's counts or positions."""
+
+    def __init__(self, storage=None, hasher: Optional[MinHasher] = None, max_cells: int = BILLBOARD_CELL_CACHE_SIZE):
+        self._storage = storage
+        self.hasher = hasher or MinHasher()
+        self.max_cells = max_cells
+        self.cells: "OrderedDict[str, Dict[str, Dict]]" = OrderedDict()  # cell_key -> {billboard_id: billboard}
+        self._lock = asyncio.Lock()
+
+    @property
+    def storage(self):
+        return self._storage or db
+
+    async def _load_cells(self, keys: List[str], refresh: bool = False):
+        missing = keys if refresh else [key for key in keys if key not in self.cells]
+        for key in keys:
+            if key in self.cells:
+                self.cells.move_to_end(key)
+        if missing:
+            for key in missing:
+                self.cells[key] = {}
+            for billboard in await self.storage.get_billboards_in_cells(missing):
+                self.cells.setdefault(billboard["cell_key"], {})[billboard["id"]] = billboard
+        while len(self.cells) > self.max_cells:
+            self.cells.popitem(last=False)
+
+    def _cache(self, billboard: Dict, previous_key: Optional[str] = None):
+        """Replace the cached copy of a billboard with its stored row"""
+        if previous_key and previous_key != billboard["cell_key"]:
+            self.cells.get(previous_key, {}).pop(billboard["id"], None)
+        if billboard["cell_key"] in self.cells:  # Uncached cells are loaded with their billboards on first touch
+            self.cells[billboard["cell_key"]][billboard["id"]] = billboard
+
+    def _forget(self, billboard_id: str, key: Optional[str]):
+        self.cells.get(key, {}).pop(billboard_id, None)
+
+    def _best_match(self, keys: List[str], latitude: float, longitude: float, signature: Optional[List[int]]) -> Optional[Dict]:
+        best, best_score = None, None
+        for key in keys:
+            for billboard in self.cells.get(key, {}).values():
+                distance = distance_meters(latitude, longitude, billboard["latitude"], billboard["longitude"])
+                if distance > BILLBOARD_MATCH_RADIUS_METERS:
+                    continue
+                if signature and billboard.get("signature"):
+                    similarity = self.hasher.similarity(signature, billboard["signature"])
+                    if similarity < BILLBOARD_TEXT_SIMILARITY:
+                        continue  # Different board at (nearly) the same spot
+                else:
+                    similarity = BILLBOARD_TEXT_SIMILARITY  # No text on one side: location decides
+                score = (similarity, -distance)
+                if best_score is None or score > best_score:
+                    best, best_score = billboard, score
+        return best
+
+    async def assign(self, report_data: Dict) -> Optional[str]:
+        """Return the billboard id for a report about to be stored (creating the billboard if new)"""
+        latitude, longitude = report_data.get("latitude"), report_data.get("longitude")
+        if latitude is None or longitude is None:
+            return None  # Without a location there is nothing reliable to cluster on
+        signature = self.hasher.signature(self.hasher.tokens(report_data.get("extracted_text", "")))
+        keys = neighbor_keys(latitude, longitude)
+
+        async with self._lock:
+            await self._load_cells(keys)
+            match = self._best_match(keys, latitude, longitude, signature)
+            if match is None:
+                await self._load_cells(keys, refresh=True)
+                match = self._best_match(keys, latitude, longitude, signature)
+            if match is None:
+                return await self._create(latitude, longitude, signature, report_data)
+            billboard_id = await self._update(match, latitude, longitude, signature, report_data)
+            if billboard_id is None:  # Deleted meanwhile (by another worker's rollback)
+                self._forget(match["id"], match["cell_key"])
+                return await self._create(latitude, longitude, signature, report_data)
+            return billboard_id
+
+    async def release(self, billboard_id: str, report_data: Dict):
+        """Take back the sighting `assign` recorded for a report that could not be stored"""
+        sighting = {"latitude": report_data["latitude"], "longitude": report_data["longitude"]}
+        async with self._lock:
+            stored = await self.storage.record_billboard_sighting(billboard_id, sighting, delta=-1)
+            cached = next((cell[billboard_id] for cell in self.cells.values() if billboard_id in cell), None)
+            previous_key = cached["cell_key"] if cached else None
+            if stored is None:
+                self._forget(billboard_id, previous_key)
+            else:
+                await self._store_cell_key(stored, previous_key)
+
+    async def _create(self, latitude: float, longitude: float, signature: Optional[List[int]], report_data: Dict) -> Optional[str]:
+        now = datetime.utcnow().isoformat()
+        billboard = await self.storage.create_billboard({
+            "cell_key": cell_key(grid_cell(latitude, longitude)),
+            "latitude": latitude,
+            "longitude": longitude,
+            "signature": signature,
+            "report_count": 1,
+            "last_severity_level": report_data.get("severity_level"),
+            "first_seen": now,
+            "last_seen": now,
+        })
+        if not billboard:
+            return None
+        self.cells.setdefault(billboard["cell_key"], {})[billboard["id"]] = billboard
+        return billboard["id"]
+
+    async def _update(self, billboard: Dict, latitude: float, longitude: float, signature: Optional[List[int]], report_data: Dict) -> Optional[str]:
+        # Running mean of sightings (computed by the database); the latest text is the best predictor of the next photo
+        stored = await self.storage.record_billboard_sighting(billboard["id"], {
+            "latitude": latitude,
+            "longitude": longitude,
+            "signature": signature,
+            "severity_level": report_data.get("severity_level"),
+        })
+        if stored is None:
+            return None
+        await self._store_cell_key(stored, billboard["cell_key"])
+        return stored["id"]
+
+    async def _store_cell_key(self, stored: Dict, previous_key: Optional[str]):
+        """Re-bucket a billboard whose mean position moved into another grid cell, then cache it"""
+        new_key = cell_key(grid_cell(float(stored["latitude"]), float(stored["longitude"])))
+        if new_key != stored["cell_key"]:
+            stored = await self.storage.update_billboard(stored["id"], {"cell_key": new_key}) or {**stored, "cell_key": new_key}
+        self._cache(stored, previous_key)
+
+
+clusterer = BillboardClusterer()
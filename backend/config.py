@@ -8,6 +8,11 @@ SUPABASE_URL = os.getenv("SUPABASE_URL", "")
 SUPABASE_KEY = os.getenv("SUPABASE_KEY", "")
 SUPABASE_SERVICE_KEY = os.getenv("SUPABASE_SERVICE_KEY", "")
 
+# Storage Backend: "supabase", "sqlite" (local file + blob directory) or "memory" (SQLite in-memory)
+STORAGE_BACKEND = os.getenv("STORAGE_BACKEND", "supabase").lower()
+LOCAL_DB_PATH = os.getenv("LOCAL_DB_PATH", "billboard_local.db")
+LOCAL_BLOB_DIR = os.getenv("LOCAL_BLOB_DIR", "local_blobs")
+
 # Violation Keywords
 VIOLATION_KEYWORDS = os.getenv("VIOLATION_KEYWORDS", "nude,adult,gambling,alcohol,tobacco,drugs,weapons,unauthorized,prohibited").split(",")
 
@@ -37,3 +42,78 @@ TIMEZONE_DEFAULT = "UTC"
 # Citizen Engagement Settings
 MIN_REPORTS_FOR_VALIDATION = 3  # Minimum citizen reports to auto-flag
 CITIZEN_REPUTATION_THRESHOLD = 50  # Reputation points for credibility
+
+# Observability Settings
+METRICS_ENABLED = os.getenv("METRICS_ENABLED", "true").lower() == "true"
+METRICS_SAMPLE_RATE = float(os.getenv("METRICS_SAMPLE_RATE", "0.0"))  # Fraction of requests with per-stage timings (0 = off)
+METRICS_LOG_TRACES = os.getenv("METRICS_LOG_TRACES", "false").lower() == "true"  # Log sampled traces as JSON lines
+
+# Profiling (admin only; everything below is inert while ADMIN_TOKEN is empty)
+ADMIN_TOKEN = os.getenv("ADMIN_TOKEN", "")  # Sent as X-Admin-Token for /api/admin/* and X-Profile
+PROFILE_SAMPLE_RATE = float(os.getenv("PROFILE_SAMPLE_RATE", "0.0"))  # Fraction of /api/analyze requests profiled
+PROFILE_DIR = os.getenv("PROFILE_DIR", "profiles")  # Captured profiles (shared by the workers of a host)
+PROFILE_MAX_STORED = int(os.getenv("PROFILE_MAX_STORED", "200"))  # Oldest profiles are deleted beyond this
+PROFILE_SAMPLE_INTERVAL_MS = float(os.getenv("PROFILE_SAMPLE_INTERVAL_MS", "2"))  # Stack sampler period
+
+# Startup Settings
+STARTUP_PROFILE = os.getenv("STARTUP_PROFILE", "false").lower() == "true"  # Log/expose startup phase timings
+STARTUP_WARMUP = os.getenv("STARTUP_WARMUP", "false").lower() == "true"  # Run one OCR before serving traffic
+
+# Worker & Cache Settings
+DETECTOR_THREADS = int(os.getenv("DETECTOR_THREADS", str(os.cpu_count() or 1)))  # Analysis threads per process
+RESULT_CACHE_ENABLED = os.getenv("RESULT_CACHE_ENABLED", "true").lower() == "true"
+RESULT_CACHE_PATH = os.getenv("RESULT_CACHE_PATH", "")  # Empty = /dev/shm (shared by all workers on the host)
+RESULT_CACHE_MAX_ENTRIES = int(os.getenv("RESULT_CACHE_MAX_ENTRIES", "10000"))
+RESULT_CACHE_TTL_SECONDS = int(os.getenv("RESULT_CACHE_TTL_SECONDS", "86400"))
+RESULT_CACHE_LOCAL_ENTRIES = 256  # Per-process LRU in front of the shared cache
+
+# Billboard Identity Resolution
+BILLBOARD_CELL_METERS = float(os.getenv("BILLBOARD_CELL_METERS", "50"))  # Grid cell size for spatial bucketing
+BILLBOARD_MATCH_RADIUS_METERS = float(os.getenv("BILLBOARD_MATCH_RADIUS_METERS", "40"))
+BILLBOARD_TEXT_SIMILARITY = float(os.getenv("BILLBOARD_TEXT_SIMILARITY", "0.5"))  # Min MinHash Jaccard estimate
+MINHASH_PERMUTATIONS = 32
+BILLBOARD_CELL_CACHE_SIZE = int(os.getenv("BILLBOARD_CELL_CACHE_SIZE", "20000"))  # Grid cells cached per process (LRU)
+BILLBOARDS_TABLE = "billboards"
+
+# Map Tile Aggregates
+TILE_MAX_ZOOM = int(os.getenv("TILE_MAX_ZOOM", "16"))  # Deepest zoom served by /api/tiles
+TILE_BIN_BITS = 4  # Each tile is returned as a (2^bits x 2^bits) grid of aggregated bins
+TILE_CACHE_ENTRIES = int(os.getenv("TILE_CACHE_ENTRIES", "4096"))  # Rendered tile payloads kept per process
+TILE_CACHE_SECONDS = int(os.getenv("TILE_CACHE_SECONDS", "30"))  # Cache-Control max-age for tile responses
+TILE_AGGREGATES_TABLE = "tile_aggregates"
+
+# Trend Rollups
+ROLLUPS_TABLE = "report_rollups"
+ROLLUP_MAX_BUCKETS = int(os.getenv("ROLLUP_MAX_BUCKETS", "9000"))  # Largest /api/statistics/timeseries range (a year of hours)
+
+# Keyword Matching
+FUZZY_MATCH_ENABLED = os.getenv("FUZZY_MATCH_ENABLED", "true").lower() == "true"  # Tolerate OCR typos in keywords
+FUZZY_MAX_EDIT_DISTANCE = int(os.getenv("FUZZY_MAX_EDIT_DISTANCE", "2"))  # Edits allowed for keywords of 9+ letters (1 below that)
+FUZZY_MIN_KEYWORD_LENGTH = 7  # Shorter keywords are matched exactly (after OCR normalization)
+FUZZY_WORDLIST = os.getenv("FUZZY_WORDLIST", "")  # Optional dictionary file (one word per line); real words never match fuzzily
+
+# Analysis Scheduling
+# Priority classes, highest first. Values are "class=value" lists.
+SCHEDULER_CLASSES = ["interactive", "citizen", "bulk"]
+SCHEDULER_DEFAULT_CLASS = os.getenv("SCHEDULER_DEFAULT_CLASS", "citizen")  # Class of unpinned sources (anonymous uploads)
+SCHEDULER_CONCURRENCY = os.getenv("SCHEDULER_CONCURRENCY", "interactive=1.0,citizen=0.75,bulk=0.5")  # Fraction of detection threads
+SCHEDULER_DEADLINES = os.getenv("SCHEDULER_DEADLINES", "interactive=30,citizen=120,bulk=3600")  # Max seconds queued before a job is dropped
+SCHEDULER_MAX_QUEUED = int(os.getenv("SCHEDULER_MAX_QUEUED", "5000"))  # Per class; beyond this submissions are rejected
+SCHEDULER_API_KEYS = os.getenv("SCHEDULER_API_KEYS", "")  # Source name per X-API-Key, e.g. "survey-crew=<key>"; other callers are their address
+SCHEDULER_SOURCE_CLASSES = os.getenv("SCHEDULER_SOURCE_CLASSES", "")  # Pin sources to a class, e.g. "survey-crew=bulk,ops-console=interactive"; addresses can only be pinned below the default
+SCHEDULER_SOURCE_WEIGHTS = os.getenv("SCHEDULER_SOURCE_WEIGHTS", "")  # Fair-share weights, e.g. "partner-a=2" (default 1)
+
+# Text Regions
+TEXT_REGION_ENCODING = os.getenv("TEXT_REGION_ENCODING", "json")  # "json" (list of boxes) or "compact" (base64 uint16 array)
+TEXT_REGION_LINE_GAP = 1.0  # Max horizontal gap between boxes of one line, in line heights
+TEXT_REGION_NMS_IOU = 0.5
+TEXT_REGION_CONTAINMENT = 0.8  # Drop a box when this fraction of it lies inside a larger one
+TEXT_REGION_MAX = int(os.getenv("TEXT_REGION_MAX", "200"))  # Largest lines kept per image
+
+# Response Encoding
+JSON_STREAM_MIN_ITEMS = int(os.getenv("JSON_STREAM_MIN_ITEMS", "100"))  # Lists this long are streamed in chunks
+JSON_STREAM_CHUNK_ITEMS = 25
+COMPRESSION_ENABLED = os.getenv("COMPRESSION_ENABLED", "true").lower() == "true"  # gzip / brotli by Accept-Encoding
+COMPRESSION_MIN_BYTES = int(os.getenv("COMPRESSION_MIN_BYTES", "1024"))
+GZIP_LEVEL = 5  # Level 9 costs ~3x the CPU for a few percent smaller JSON
+BROTLI_QUALITY = 4
@@ -1,22 +1,40 @@
-from supabase import create_client, Client
 from config import (
     SUPABASE_URL, SUPABASE_KEY, SUPABASE_SERVICE_KEY,
     COMPLIANCE_TABLE, CITIZEN_REPORTS_TABLE, GEOLOCATION_TABLE,
-    MIN_REPORTS_FOR_VALIDATION
+    MIN_REPORTS_FOR_VALIDATION, STORAGE_BACKEND, BILLBOARDS_TABLE, TILE_AGGREGATES_TABLE,
+    ROLLUPS_TABLE
 )
 from datetime import datetime, timedelta
-from typing import Dict, List, Optional
+from typing import Dict, List, Optional, Tuple
 import json
 import uuid
+import metrics
+from storage import StorageBackend, REPORT_COLUMNS
 
-class SupabaseDB:
+class SupabaseDB(StorageBackend):
     """Enhanced database layer with compliance monitoring, geolocation tracking, and citizen engagement"""
     
     def __init__(self):
-        self.client: Client = create_client(SUPABASE_URL, SUPABASE_KEY)
-        self.service_client: Client = create_client(SUPABASE_URL, SUPABASE_SERVICE_KEY)
+        # Clients are created on first use so importing the app never needs network credentials
+        self._client = None
+        self._service_client = None
+    
+    @property
+    def client(self):
+        if self._client is None:
+            from supabase import create_client
+            self._client = create_client(SUPABASE_URL, SUPABASE_KEY)
+        return self._client
+    
+    @property
+    def service_client(self):
+        if self._service_client is None:
+            from supabase import create_client
+            self._service_client = create_client(SUPABASE_URL, SUPABASE_SERVICE_KEY)
+        return self._service_client
     
     # ============= IMAGE STORAGE =============
+    @metrics.timed("db")
     async def upload_image(self, file_data: bytes, filename: str, bucket: str = "billboard-images"):
         """Upload image to Supabase Storage"""
         try:
@@ -25,8 +43,10 @@ class SupabaseDB:
             return response
         except Exception as e:
             print(f"Error uploading image: {e}")
+            metrics.DB_ERRORS.inc(operation="upload_image")
             return None
     
+    @metrics.timed("db")
     async def get_image_url(self, filename: str, bucket: str = "billboard-images"):
         """Get public URL of uploaded image"""
         try:
@@ -34,9 +54,11 @@ class SupabaseDB:
             return url
         except Exception as e:
             print(f"Error getting image URL: {e}")
+            metrics.DB_ERRORS.inc(operation="get_image_url")
             return None
     
     # ============= VIOLATION REPORTS =============
+    @metrics.timed("db")
     async def create_violation_report(self, report_data: dict):
         """Create a new violation report with full analysis data"""
         try:
@@ -45,15 +67,7 @@ class SupabaseDB:
             report_data['created_at'] = datetime.utcnow().isoformat()
             report_data['updated_at'] = datetime.utcnow().isoformat()
             # Ensure we only insert columns that exist in the schema to avoid cache/schema errors
-            allowed_keys = {
-                'id', 'image_url', 'image_filename', 'extracted_text', 'is_compliant',
-                'status', 'violations_found', 'violation_count', 'violation_context',
-                'ocr_confidence', 'severity_level', 'severity_score', 'text_regions',
-                'latitude', 'longitude', 'zoning_compliance', 'detection_timestamp',
-                'created_at', 'updated_at'
-            }
-
-            sanitized = {k: v for k, v in report_data.items() if k in allowed_keys}
+            sanitized = {k: v for k, v in report_data.items() if k in REPORT_COLUMNS}
             # Ensure status present
             sanitized.setdefault('status', 'pending')
 
@@ -62,8 +76,10 @@ class SupabaseDB:
             return response.data[0] if getattr(response, 'data', None) else None
         except Exception as e:
             print(f"Error creating report: {e}")
+            metrics.DB_ERRORS.inc(operation="create_violation_report")
             return None
     
+    @metrics.timed("db")
     async def get_violation_reports(self, limit: int = 50, offset: int = 0):
         """Get all violation reports with pagination"""
         try:
@@ -77,8 +93,10 @@ class SupabaseDB:
             return response.data if response.data else []
         except Exception as e:
             print(f"Error fetching reports: {e}")
+            metrics.DB_ERRORS.inc(operation="get_violation_reports")
             return []
     
+    @metrics.timed("db")
     async def get_report_by_id(self, report_id: str):
         """Get specific violation report by ID"""
         try:
@@ -86,22 +104,37 @@ class SupabaseDB:
             return response.data
         except Exception as e:
             print(f"Error fetching report: {e}")
+            metrics.DB_ERRORS.inc(operation="get_report_by_id")
             return None
     
-    async def update_report_status(self, report_id: str, status: str):
-        """Update report status (pending, approved, resolved, rejected)"""
+    @metrics.timed("db")
+    async def update_report_status(self, report_id: str, status: str) -> Optional[Tuple[Optional[str], Dict]]:
+        """Update report status (pending, approved, resolved, rejected); returns (previous status, stored row)
+        from one locked read-and-write (see SUPABASE_SCHEMA.sql)"""
         try:
-            update_data = {
-                "status": status,
-                "updated_at": datetime.utcnow().isoformat()
-            }
-            response = self.client.table("violation_reports").update(update_data).eq("id", report_id).execute()
+            response = self.client.rpc("update_report_status", {"p_id": report_id, "p_status": status}).execute()
+            if not response.data:
+                return None
+            return response.data["previous_status"], response.data["report"]
+        except Exception as e:
+            print(f"Error updating report: {e}")
+            metrics.DB_ERRORS.inc(operation="update_report_status")
+            return None
+    
+    @metrics.timed("db")
+    async def update_violation_report(self, report_id: str, updates: Dict) -> Optional[Dict]:
+        """Update arbitrary report columns (used by re-scoring backfills)"""
+        try:
+            update_data = {**updates, "updated_at": datetime.utcnow().isoformat()}
+            response = self.service_client.table("violation_reports").update(update_data).eq("id", report_id).execute()
             return response.data[0] if response.data else None
         except Exception as e:
             print(f"Error updating report: {e}")
+            metrics.DB_ERRORS.inc(operation="update_violation_report")
             return None
     
     # ============= COMPLIANCE MONITORING =============
+    @metrics.timed("db")
     async def check_zoning_compliance(self, location: Dict, violation_keywords: List[str]) -> Dict:
         """Check if location complies with zoning laws"""
         try:
@@ -131,13 +164,10 @@ class SupabaseDB:
             return {"compliant": True, "violations": [], "zone_info": None}
         except Exception as e:
             print(f"Error checking zoning compliance: {e}")
+            metrics.DB_ERRORS.inc(operation="check_zoning_compliance")
             return {"compliant": True, "violations": [], "zone_info": None}
     
-    def _check_location_in_zone(self, lat: float, lon: float, zone: Dict) -> bool:
-        """Simple location check (expand with actual geo-bounds logic)"""
-        # Placeholder: check if location is within zone bounds
-        return True
-    
+    @metrics.timed("db")
     async def log_compliance_check(self, report_id: str, check_data: Dict):
         """Log a compliance check result"""
         try:
@@ -147,9 +177,11 @@ class SupabaseDB:
             return response.data[0] if getattr(response, 'data', None) else None
         except Exception as e:
             print(f"Error logging compliance check: {e}")
+            metrics.DB_ERRORS.inc(operation="log_compliance_check")
             return None
     
     # ============= GEOLOCATION TRACKING =============
+    @metrics.timed("db")
     async def save_billboard_location(self, location_data: Dict):
         """Save billboard location with geolocation data and timestamp"""
         try:
@@ -160,8 +192,10 @@ class SupabaseDB:
             return response.data[0] if getattr(response, 'data', None) else None
         except Exception as e:
             print(f"Error saving location: {e}")
+            metrics.DB_ERRORS.inc(operation="save_billboard_location")
             return None
     
+    @metrics.timed("db")
     async def get_nearby_billboards(self, latitude: float, longitude: float, radius_km: float = 1.0) -> List[Dict]:
         """Get billboards within a specified radius (in kilometers)"""
         try:
@@ -180,21 +214,11 @@ class SupabaseDB:
             return nearby
         except Exception as e:
             print(f"Error fetching nearby billboards: {e}")
+            metrics.DB_ERRORS.inc(operation="get_nearby_billboards")
             return []
     
-    def _calculate_distance(self, lat1: float, lon1: float, lat2: float, lon2: float) -> float:
-        """Calculate distance between two coordinates in kilometers (Haversine formula)"""
-        from math import radians, cos, sin, asin, sqrt
-        
-        lon1, lat1, lon2, lat2 = map(radians, [lon1, lat1, lon2, lat2])
-        dlon = lon2 - lon1
-        dlat = lat2 - lat1
-        a = sin(dlat/2)**2 + cos(lat1) * cos(lat2) * sin(dlon/2)**2
-        c = 2 * asin(sqrt(a))
-        r = 6371  # Radius of earth in kilometers
-        return c * r
-    
     # ============= CITIZEN ENGAGEMENT =============
+    @metrics.timed("db")
     async def submit_citizen_report(self, citizen_report: Dict):
         """Submit a citizen violation report"""
         try:
@@ -213,8 +237,10 @@ class SupabaseDB:
             return response.data[0] if response.data else None
         except Exception as e:
             print(f"Error submitting citizen report: {e}")
+            metrics.DB_ERRORS.inc(operation="submit_citizen_report")
             return None
     
+    @metrics.timed("db")
     async def validate_citizen_report(self, citizen_report_id: str, validator_id: str) -> Dict:
         """Citizen validation of another's report (increases credibility)"""
         try:
@@ -239,8 +265,10 @@ class SupabaseDB:
             return update_response.data[0] if update_response.data else None
         except Exception as e:
             print(f"Error validating citizen report: {e}")
+            metrics.DB_ERRORS.inc(operation="validate_citizen_report")
             return None
     
+    @metrics.timed("db")
     async def get_citizen_reports(self, billboard_id: Optional[str] = None, limit: int = 50) -> List[Dict]:
         """Get citizen reports, optionally filtered by billboard"""
         try:
@@ -253,6 +281,7 @@ class SupabaseDB:
             return response.data if response.data else []
         except Exception as e:
             print(f"Error fetching citizen reports: {e}")
+            metrics.DB_ERRORS.inc(operation="get_citizen_reports")
             return []
     
     async def _check_and_flag_violation(self, billboard_id: str):
@@ -261,15 +290,264 @@ class SupabaseDB:
             citizen_reports = await self.get_citizen_reports(billboard_id)
             
             if len(citizen_reports) >= MIN_REPORTS_FOR_VALIDATION:
-                # Update original violation report status to "auto-flagged"
-                await self.service_client.table("violation_reports").update({
+                # Update original violation report status to "auto-flagged";
+                # billboard_id may name a single report or a clustered billboard entity
+                update = {
                     "status": "flagged_by_citizens",
                     "citizen_validation_count": len(citizen_reports)
-                }).eq("id", billboard_id).execute()
+                }
+                self.service_client.table("violation_reports").update(update).eq("id", billboard_id).execute()
+                self.service_client.table("violation_reports").update(update).eq("billboard_entity_id", billboard_id).execute()
         except Exception as e:
             print(f"Error flagging violation: {e}")
+            metrics.DB_ERRORS.inc(operation="_check_and_flag_violation")
+    
+    # ============= BILLBOARD ENTITIES =============
+    @metrics.timed("db")
+    async def get_billboards_in_cells(self, cell_keys: List[str]) -> List[Dict]:
+        """Get billboard entities bucketed in any of the given grid cells"""
+        try:
+            response = self.client.table(BILLBOARDS_TABLE).select("*").in_("cell_key", cell_keys).execute()
+            return response.data or []
+        except Exception as e:
+            print(f"Error fetching billboards by cell: {e}")
+            metrics.DB_ERRORS.inc(operation="get_billboards_in_cells")
+            return []
+    
+    @metrics.timed("db")
+    async def create_billboard(self, billboard_data: Dict) -> Optional[Dict]:
+        """Create a canonical billboard entity"""
+        try:
+            billboard_data['id'] = str(uuid.uuid4())
+            billboard_data['created_at'] = datetime.utcnow().isoformat()
+            billboard_data['updated_at'] = datetime.utcnow().isoformat()
+            response = self.service_client.table(BILLBOARDS_TABLE).insert(billboard_data).execute()
+            return response.data[0] if getattr(response, 'data', None) else None
+        except Exception as e:
+            print(f"Error creating billboard: {e}")
+            metrics.DB_ERRORS.inc(operation="create_billboard")
+            return None
+    
+    @metrics.timed("db")
+    async def update_billboard(self, billboard_id: str, updates: Dict) -> Optional[Dict]:
+        """Update a billboard entity (position, signature, counters)"""
+        try:
+            updates = {**updates, "updated_at": datetime.utcnow().isoformat()}
+            response = self.service_client.table(BILLBOARDS_TABLE).update(updates).eq("id", billboard_id).execute()
+            return response.data[0] if response.data else None
+        except Exception as e:
+            print(f"Error updating billboard: {e}")
+            metrics.DB_ERRORS.inc(operation="update_billboard")
+            return None
+    
+    @metrics.timed("db")
+    async def record_billboard_sighting(self, billboard_id: str, sighting: Dict, delta: int = 1) -> Optional[Dict]:
+        """Atomically add (delta=1) or retract (delta=-1) one sighting (see SUPABASE_SCHEMA.sql)"""
+        try:
+            response = self.service_client.rpc("record_billboard_sighting", {
+                "p_id": billboard_id,
+                "p_latitude": sighting["latitude"],
+                "p_longitude": sighting["longitude"],
+                "p_signature": sighting.get("signature"),
+                "p_severity_level": sighting.get("severity_level"),
+                "p_delta": delta
+            }).execute()
+            return response.data[0] if response.data else None
+        except Exception as e:
+            print(f"Error recording billboard sighting: {e}")
+            metrics.DB_ERRORS.inc(operation="record_billboard_sighting")
+            return None
+    
+    @metrics.timed("db")
+    async def get_billboards(self, limit: int = 50, offset: int = 0) -> List[Dict]:
+        """Get billboard entities, most recently sighted first"""
+        try:
+            response = (
+                self.client.table(BILLBOARDS_TABLE)
+                .select("*")
+                .order("last_seen", desc=True)
+                .range(offset, offset + limit - 1)
+                .execute()
+            )
+            return response.data or []
+        except Exception as e:
+            print(f"Error fetching billboards: {e}")
+            metrics.DB_ERRORS.inc(operation="get_billboards")
+            return []
+    
+    @metrics.timed("db")
+    async def get_billboard(self, billboard_id: str) -> Optional[Dict]:
+        """Get a billboard entity by ID"""
+        try:
+            response = self.client.table(BILLBOARDS_TABLE).select("*").eq("id", billboard_id).limit(1).execute()
+            return response.data[0] if response.data else None
+        except Exception as e:
+            print(f"Error fetching billboard: {e}")
+            metrics.DB_ERRORS.inc(operation="get_billboard")
+            return None
+    
+    @metrics.timed("db")
+    async def get_billboard_reports(self, billboard_id: str, limit: int = 50, offset: int = 0) -> List[Dict]:
+        """Get the violation report history of a billboard entity"""
+        try:
+            response = (
+                self.client.table("violation_reports")
+                .select("*")
+                .eq("billboard_entity_id", billboard_id)
+                .order("created_at", desc=True)
+                .range(offset, offset + limit - 1)
+                .execute()
+            )
+            return response.data or []
+        except Exception as e:
+            print(f"Error fetching billboard history: {e}")
+            metrics.DB_ERRORS.inc(operation="get_billboard_reports")
+            return []
+    
+    # ============= BULK ACCESS =============
+    @metrics.timed("db")
+    async def get_reports_after(self, after_id: Optional[str] = None, limit: int = 1000, columns: str = "*") -> List[Dict]:
+        """Keyset pagination over violation reports ordered by id (for backfills)"""
+        try:
+            query = self.service_client.table("violation_reports").select(columns).order("id")
+            if after_id:
+                query = query.gt("id", after_id)
+            response = query.limit(limit).execute()
+            return response.data or []
+        except Exception as e:
+            print(f"Error streaming reports: {e}")
+            metrics.DB_ERRORS.inc(operation="get_reports_after")
+            return []
+    
+    # ============= SEARCH =============
+    @metrics.timed("db")
+    async def search_reports(self, terms: List[str], mode: str = "words", status: Optional[str] = None,
+                             severity: Optional[str] = None, bbox: Optional[Tuple[float, float, float, float]] = None,
+                             after: Optional[Tuple[str, str]] = None, limit: int = 20) -> List[Dict]:
+        """Reports whose extracted text matches, newest first (see search_reports in SUPABASE_SCHEMA.sql)"""
+        try:
+            if not terms:
+                return []
+            min_lat, min_lon, max_lat, max_lon = bbox or (None, None, None, None)
+            response = self.client.rpc("search_reports", {
+                "p_terms": terms,
+                "p_mode": mode,
+                "p_status": status,
+                "p_severity": severity,
+                "p_min_lat": min_lat, "p_min_lon": min_lon, "p_max_lat": max_lat, "p_max_lon": max_lon,
+                "p_after_created_at": after[0] if after else None,
+                "p_after_id": after[1] if after else None,
+                "p_limit": limit
+            }).execute()
+            return response.data or []
+        except Exception as e:
+            print(f"Error searching reports: {e}")
+            metrics.DB_ERRORS.inc(operation="search_reports")
+            return []
+    
+    # ============= TILE AGGREGATES =============
+    @metrics.timed("db")
+    async def apply_report_rescore(self, updates: List[Tuple[str, Dict]], rollup_rows: List[Tuple],
+                                   tile_increments: List[Tuple[List[Tuple[int, int, int]], Dict]]) -> bool:
+        """Write re-scored outcomes and their rollup/tile increments in one transaction (see SUPABASE_SCHEMA.sql)"""
+        try:
+            self.service_client.rpc("apply_report_rescore", {
+                "p_updates": [{"id": report_id, "outcome": outcome} for report_id, outcome in updates],
+                "p_rollups": [list(row) for row in rollup_rows],
+                "p_tiles": [[[list(cell) for cell in cells], delta] for cells, delta in tile_increments]
+            }).execute()
+            return True
+        except Exception as e:
+            print(f"Error applying re-scored reports: {e}")
+            metrics.DB_ERRORS.inc(operation="apply_report_rescore")
+            return False
+    
+    @metrics.timed("db")
+    async def increment_tile_aggregates(self, cells: List[Tuple[int, int, int]], delta: Dict):
+        """Add a report's contribution to every level's cell in one round trip (see SUPABASE_SCHEMA.sql)"""
+        try:
+            self.service_client.rpc("increment_tile_aggregates", {
+                "p_cells": [list(cell) for cell in cells],
+                "p_delta": delta
+            }).execute()
+        except Exception as e:
+            print(f"Error updating tile aggregates: {e}")
+            metrics.DB_ERRORS.inc(operation="increment_tile_aggregates")
+    
+    @metrics.timed("db")
+    async def get_tile_aggregates(self, level: int, x_min: int, x_max: int, y_min: int, y_max: int) -> List[Dict]:
+        """Get aggregate cells of one level inside an x/y range"""
+        try:
+            response = (
+                self.client.table(TILE_AGGREGATES_TABLE)
+                .select("*")
+                .eq("level", level)
+                .gte("x", x_min).lte("x", x_max)
+                .gte("y", y_min).lte("y", y_max)
+                .execute()
+            )
+            return response.data or []
+        except Exception as e:
+            print(f"Error fetching tile aggregates: {e}")
+            metrics.DB_ERRORS.inc(operation="get_tile_aggregates")
+            return []
+    
+    @metrics.timed("db")
+    async def clear_tile_aggregates(self):
+        """Delete all tile aggregates (before a full backfill)"""
+        try:
+            self.service_client.table(TILE_AGGREGATES_TABLE).delete().gte("level", 0).execute()
+        except Exception as e:
+            print(f"Error clearing tile aggregates: {e}")
+            metrics.DB_ERRORS.inc(operation="clear_tile_aggregates")
+    
+    # ============= TREND ROLLUPS =============
+    @metrics.timed("db")
+    async def increment_report_rollups(self, rows: List[Tuple]):
+        """Add rollup increments in one round trip (see increment_report_rollups in SUPABASE_SCHEMA.sql)"""
+        try:
+            self.service_client.rpc("increment_report_rollups", {"p_rows": [list(row) for row in rows]}).execute()
+        except Exception as e:
+            print(f"Error updating rollups: {e}")
+            metrics.DB_ERRORS.inc(operation="increment_report_rollups")
+    
+    @metrics.timed("db")
+    async def get_report_rollups(self, granularity: str, dimension: str, first_bucket: str, last_bucket: str,
+                                 value: Optional[str] = None) -> List[Dict]:
+        """Rollup rows of one dimension with buckets in [first_bucket, last_bucket]"""
+        try:
+            query = (
+                self.client.table(ROLLUPS_TABLE)
+                .select("bucket, value, report_count, violation_count, severity_sum")
+                .eq("granularity", granularity)
+                .eq("dimension", dimension)
+                .gte("bucket", first_bucket).lte("bucket", last_bucket)
+            )
+            if value is not None:
+                query = query.eq("value", value)
+            # PostgREST caps rows per response; page through long ranges
+            rows, page = [], 1000
+            while True:
+                response = query.order("bucket").order("value").range(len(rows), len(rows) + page - 1).execute()
+                rows.extend(response.data or [])
+                if len(response.data or []) < page:
+                    return rows
+        except Exception as e:
+            print(f"Error fetching rollups: {e}")
+            metrics.DB_ERRORS.inc(operation="get_report_rollups")
+            return []
+    
+    @metrics.timed("db")
+    async def clear_report_rollups(self):
+        """Delete all rollups (before a full backfill)"""
+        try:
+            self.service_client.table(ROLLUPS_TABLE).delete().neq("granularity", "").execute()
+        except Exception as e:
+            print(f"Error clearing rollups: {e}")
+            metrics.DB_ERRORS.inc(operation="clear_report_rollups")
     
     # ============= STATISTICS & DASHBOARD =============
+    @metrics.timed("db")
     async def get_statistics(self) -> Dict:
         """Get comprehensive dashboard statistics"""
         try:
@@ -299,25 +577,21 @@ class SupabaseDB:
             }
         except Exception as e:
             print(f"Error fetching statistics: {e}")
+            metrics.DB_ERRORS.inc(operation="get_statistics")
             return {
                 "total_reports": 0, "pending": 0, "flagged_by_citizens": 0,
                 "resolved": 0, "this_week": 0, "citizen_reports_count": 0,
                 "tracked_locations": 0, "avg_severity": 0
             }
-    
-    def _calculate_avg_severity(self, reports: List[Dict]) -> float:
-        """Calculate average severity across reports"""
-        if not reports:
-            return 0.0
-        
-        severities = []
-        severity_map = {"Critical": 9, "High": 6, "Medium": 4, "Low": 2, "None": 0}
-        
-        for report in reports:
-            level = report.get("severity_level", "None")
-            severities.append(severity_map.get(level, 0))
-        
-        return round(sum(severities) / len(severities), 2) if severities else 0.0
+
+def create_db(backend: str = STORAGE_BACKEND) -> StorageBackend:
+    """Build the configured storage backend (connections are opened lazily)"""
+    if backend == "supabase":
+        return SupabaseDB()
+    if backend in ("sqlite", "memory"):
+        from local_db import LocalDB
+        return LocalDB(":memory:" if backend == "memory" else None)
+    raise ValueError(f"Unknown STORAGE_BACKEND '{backend}' (expected supabase, sqlite or memory)")
 
 # Initialize database connection
-db = SupabaseDB()
+db = create_db()
@@ -1,12 +1,24 @@
 import pytesseract
 import cv2
 import numpy as np
-import io
 import re
+import hashlib
 from typing import Dict, List, Tuple
-from PIL import Image
-from config import VIOLATION_KEYWORDS, OCR_CONFIDENCE_THRESHOLD, IMAGE_RESIZE_SCALE
+from config import (
+    VIOLATION_KEYWORDS, OCR_CONFIDENCE_THRESHOLD, IMAGE_RESIZE_SCALE,
+    FUZZY_MATCH_ENABLED, FUZZY_MAX_EDIT_DISTANCE, FUZZY_MIN_KEYWORD_LENGTH
+)
+from keyword_matcher import KeywordMatcher
+from text_regions import build_regions
+from ocr_tokens import Token, pack_tokens, unpack_tokens
 from datetime import datetime
+import metrics
+
+# Stored report fields derived from OCR output by the keyword rules
+OUTCOME_FIELDS = (
+    "is_compliant", "violations_found", "violation_count", "violation_context",
+    "severity_level", "severity_score"
+)
 
 class ViolationDetector:
     """Advanced computer vision-based violation detection system"""
@@ -14,12 +26,21 @@ class ViolationDetector:
     def __init__(self):
         self.violation_keywords = [kw.strip().lower() for kw in VIOLATION_KEYWORDS]
         self.confidence_threshold = OCR_CONFIDENCE_THRESHOLD
+        self.matcher = KeywordMatcher(self.violation_keywords)
+        # Identifies the rule set; cached results from other rule sets are never reused
+        self.rules_version = hashlib.sha1(
+            "|".join(sorted(self.violation_keywords) + [
+                str(self.confidence_threshold), str(IMAGE_RESIZE_SCALE),
+                str(FUZZY_MATCH_ENABLED), str(FUZZY_MAX_EDIT_DISTANCE), str(FUZZY_MIN_KEYWORD_LENGTH),
+            ]).encode()
+        ).hexdigest()[:12]
     
     def load_image(self, image_data: bytes) -> np.ndarray:
         """Load image from bytes using OpenCV"""
         try:
-            nparr = np.frombuffer(image_data, np.uint8)
-            img = cv2.imdecode(nparr, cv2.IMREAD_COLOR)
+            with metrics.span("detector", "decode"):
+                nparr = np.frombuffer(image_data, np.uint8)
+                img = cv2.imdecode(nparr, cv2.IMREAD_COLOR)
             return img
         except Exception as e:
             print(f"Error loading image: {e}")
@@ -31,64 +52,80 @@ class ViolationDetector:
             h, w = img.shape[:2]
             new_w = w * IMAGE_RESIZE_SCALE
             new_h = h * IMAGE_RESIZE_SCALE
-            img = cv2.resize(img, (new_w, new_h), interpolation=cv2.INTER_CUBIC)
+            with metrics.span("detector", "resize"):
+                img = cv2.resize(img, (new_w, new_h), interpolation=cv2.INTER_CUBIC)
+                gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
             
-            gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
-            clahe = cv2.createCLAHE(clipLimit=2.0, tileGridSize=(8, 8))
-            enhanced = clahe.apply(gray)
-            filtered = cv2.bilateralFilter(enhanced, 9, 75, 75)
-            _, thresh = cv2.threshold(filtered, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)
+            with metrics.span("detector", "clahe"):
+                clahe = cv2.createCLAHE(clipLimit=2.0, tileGridSize=(8, 8))
+                enhanced = clahe.apply(gray)
+            with metrics.span("detector", "bilateral_filter"):
+                filtered = cv2.bilateralFilter(enhanced, 9, 75, 75)
+            with metrics.span("detector", "threshold"):
+                _, thresh = cv2.threshold(filtered, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)
             
             return thresh
         except Exception as e:
             print(f"Error preprocessing image: {e}")
             return img
     
-    def extract_text_from_image(self, image_data: bytes) -> Tuple[str, float]:
-        """Extract text from image using advanced OCR with confidence scoring"""
+    def extract_tokens(self, image_data: bytes) -> List[Token]:
+        """All OCR words with confidence (0-100) and box in original-image pixels"""
         try:
             img = self.load_image(image_data)
             if img is None:
-                return "", 0.0
+                return []
             
             processed = self.preprocess_image(img)
-            data = pytesseract.image_to_data(processed, output_type=pytesseract.Output.DICT)
-            
-            extracted_text = ""
-            confidence_scores = []
+            with metrics.span("detector", "tesseract"):
+                data = pytesseract.image_to_data(processed, output_type=pytesseract.Output.DICT)
             
+            tokens = []
             for i in range(len(data['text'])):
-                if int(data['conf'][i]) > (self.confidence_threshold * 100):
-                    extracted_text += " " + data['text'][i]
-                    confidence_scores.append(float(data['conf'][i]) / 100)
-            
-            avg_confidence = np.mean(confidence_scores) if confidence_scores else 0.0
-            return extracted_text.lower().strip(), avg_confidence
+                word = data['text'][i].strip()
+                confidence = int(float(data['conf'][i]))
+                if word and confidence >= 0:
+                    tokens.append((
+                        word, confidence,
+                        int(data['left'][i] / IMAGE_RESIZE_SCALE), int(data['top'][i] / IMAGE_RESIZE_SCALE),
+                        int(round(data['width'][i] / IMAGE_RESIZE_SCALE)), int(round(data['height'][i] / IMAGE_RESIZE_SCALE)),
+                    ))
+            return tokens
         except Exception as e:
             print(f"Error extracting text: {e}")
-            return "", 0.0
+            return []
+    
+    def text_from_tokens(self, tokens: List[Token]) -> Tuple[str, float]:
+        """Text and average confidence of the tokens above the confidence threshold"""
+        kept = [(word, confidence) for word, confidence, *_ in tokens if confidence > self.confidence_threshold * 100]
+        extracted_text = " ".join(word for word, _ in kept)
+        avg_confidence = sum(confidence for _, confidence in kept) / len(kept) / 100 if kept else 0.0
+        return extracted_text.lower().strip(), avg_confidence
+    
+    def extract_text_from_image(self, image_data: bytes) -> Tuple[str, float]:
+        """Extract text from image using advanced OCR with confidence scoring"""
+        return self.text_from_tokens(self.extract_tokens(image_data))
     
     def detect_text_regions(self, image_data: bytes) -> List[Dict]:
-        """Detect and localize text regions in the image (bounding boxes)"""
+        """Detect and localize text lines in the image (bounding boxes in original-image pixels)"""
         try:
             img = self.load_image(image_data)
             if img is None:
                 return []
             
             processed = self.preprocess_image(img)
-            contours, _ = cv2.findContours(processed, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+            with metrics.span("detector", "find_contours"):
+                contours, _ = cv2.findContours(processed, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
             
-            text_regions = []
+            boxes = []
             for contour in contours:
                 x, y, w, h = cv2.boundingRect(contour)
                 if w > 10 and h > 10:
-                    text_regions.append({
-                        "x": int(x),
-                        "y": int(y),
-                        "width": int(w),
-                        "height": int(h),
-                        "area": int(w * h)
-                    })
+                    boxes.append((int(x), int(y), int(x + w), int(y + h)))
+            
+            # Merge into lines, drop duplicates, map back to original-image coordinates
+            with metrics.span("detector", "merge_regions"):
+                text_regions = build_regions(boxes, IMAGE_RESIZE_SCALE, (processed.shape[1], processed.shape[0]))
             
             return text_regions
         except Exception as e:
@@ -114,22 +151,25 @@ class ViolationDetector:
                 "severity_level": "none"
             }
         
-        sentences = re.split(r'[.!?]', extracted_text)
-        
-        for sentence in sentences:
-            words = re.findall(r'\b\w+\b', sentence.lower())
+        with metrics.span("detector", "keyword_match"):
+            sentences = re.split(r'[.!?]', extracted_text)
             
-            for keyword in self.violation_keywords:
-                for i, word in enumerate(words):
-                    if keyword in word.lower():
-                        if keyword not in found_violations:
-                            found_violations.append(keyword)
-                            start = max(0, i - 5)
-                            end = min(len(words), i + 6)
-                            context = ' '.join(words[start:end])
-                            violation_contexts.append(context)
-                            severity = self._calculate_severity(keyword, context)
-                            severity_scores.append(severity)
+            for sentence in sentences:
+                words = re.findall(r'\b\w+\b', sentence.lower())
+                first_match = {}
+                for i, keyword in self.matcher.find(words):
+                    first_match.setdefault(keyword, i)
+                
+                for keyword in self.violation_keywords:
+                    i = first_match.get(keyword)
+                    if i is not None and keyword not in found_violations:
+                        found_violations.append(keyword)
+                        start = max(0, i - 5)
+                        end = min(len(words), i + 6)
+                        context = ' '.join(words[start:end])
+                        violation_contexts.append(context)
+                        severity = self._calculate_severity(keyword, context)
+                        severity_scores.append(severity)
         
         is_compliant = len(found_violations) == 0
         overall_severity = max(severity_scores) if severity_scores else 0
@@ -140,7 +180,7 @@ class ViolationDetector:
             "violations_found": found_violations,
             "violation_count": len(found_violations),
             "violation_context": violation_contexts,
-            "extracted_text": extracted_text[:500],
+            "extracted_text": extracted_text,
             "ocr_confidence": round(ocr_confidence, 2),
             "detection_timestamp": datetime.utcnow().isoformat(),
             "severity_level": self._severity_level(overall_severity),
@@ -155,7 +195,7 @@ class ViolationDetector:
         }
         
         base = base_severity_map.get(keyword.lower(), 5)
-        violation_count = sum(1 for kw in self.violation_keywords if kw in context.lower())
+        violation_count = len({kw for _, kw in self.matcher.find(context.lower().split())})
         multiplier = min(1 + (violation_count * 0.2), 1.5)
         
         return min(base * multiplier, 10.0)
@@ -173,20 +213,41 @@ class ViolationDetector:
         else:
             return "None"
     
+    def rescore(self, report: Dict) -> Dict:
+        """Outcome of the current rules for a stored report, from its OCR tokens (no OCR is run).
+        Reports stored before tokens were kept fall back to their stored text."""
+        tokens = unpack_tokens(report.get("ocr_tokens"))
+        if tokens:
+            extracted_text, ocr_confidence = self.text_from_tokens(tokens)
+        else:
+            extracted_text, ocr_confidence = report.get("extracted_text") or "", float(report.get("ocr_confidence") or 0.0)
+        result = self.detect_violations(extracted_text, ocr_confidence)
+        outcome = {field: result.get(field) for field in OUTCOME_FIELDS}
+        outcome["severity_score"] = outcome["severity_score"] or 0
+        if tokens:
+            outcome["extracted_text"] = extracted_text
+        return outcome
+    
     def analyze_image(self, image_data: bytes) -> Dict:
         """Complete billboard analysis: text extraction + violation detection + text localization"""
         try:
-            extracted_text, ocr_confidence = self.extract_text_from_image(image_data)
-            violations = self.detect_violations(extracted_text, ocr_confidence)
-            text_regions = self.detect_text_regions(image_data)
+            with metrics.trace("analyze_image"), metrics.span("detector", "analyze_image"):
+                tokens = self.extract_tokens(image_data)
+                extracted_text, ocr_confidence = self.text_from_tokens(tokens)
+                violations = self.detect_violations(extracted_text, ocr_confidence)
+                text_regions = self.detect_text_regions(image_data)
             
+            metrics.IMAGES_PROCESSED.inc(result="compliant" if violations.get("is_compliant") else "violation")
+            metrics.OCR_CONFIDENCE.observe(ocr_confidence)
             return {
                 **violations,
                 "text_regions": text_regions,
+                "ocr_tokens": pack_tokens(tokens),
                 "analysis_complete": True
             }
         except Exception as e:
             print(f"Error analyzing billboard: {e}")
+            metrics.IMAGES_PROCESSED.inc(result="error")
             return {
                 "is_compliant": True,
                 "status": "Compliant",
@@ -203,5 +264,12 @@ class ViolationDetector:
                 "error": str(e)
             }
 
+    def warm_up(self) -> Dict:
+        """Run one analysis on a tiny built-in image so Tesseract/OpenCV cold-start is paid up front"""
+        img = np.full((40, 160, 3), 255, dtype=np.uint8)
+        cv2.putText(img, "WARM UP", (8, 28), cv2.FONT_HERSHEY_SIMPLEX, 0.8, (0, 0, 0), 2)
+        _, encoded = cv2.imencode(".png", img)
+        return self.analyze_image(encoded.tobytes())
+
 # Initialize detector
 detector = ViolationDetector()
@@ -0,0 +1,217 @@
+"""
+Hierarchical tile aggregates for violation heatmaps.
+
+Every located report increments one aggregate cell per zoom level (Web Mercator
+tile coordinates, levels 0..TILE_MAX_ZOOM + TILE_BIN_BITS), so a tile at zoom z is
+served from at most 2^b x 2^b pre-aggregated bins at level z + b, whatever the
+number of reports underneath.
+
+Rebuild from stored reports (after deploying this feature or changing TILE_* settings):
+    python geo_tiles.py backfill              # clears the aggregates first
+    python geo_tiles.py backfill --no-reset   # only into empty aggregates
+
+The API increments the aggregates on every insert, so pause report writes (stop the
+API or its upload traffic) while a rebuild runs: increments landing during the run
+would be lost or counted twice.
+"""
+import argparse
+import asyncio
+import hashlib
+import json
+import math
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+from config import TILE_MAX_ZOOM, TILE_BIN_BITS, TILE_CACHE_ENTRIES
+from db import db
+
+MAX_LATITUDE = 85.05112878  # Web Mercator limit
+SEVERITY_COLUMNS = {"Critical": "critical", "High": "high", "Medium": "medium", "Low": "low"}
+
+
+# ============= TILE MATH =============
+def lat_lon_to_tile(latitude: float, longitude: float, zoom: int) -> Tuple[int, int]:
+    latitude = max(-MAX_LATITUDE, min(MAX_LATITUDE, latitude))
+    n = 1 << zoom
+    x = int((longitude + 180.0) / 360.0 * n)
+    lat_rad = math.radians(latitude)
+    y = int((1.0 - math.log(math.tan(lat_rad) + 1.0 / math.cos(lat_rad)) / math.pi) / 2.0 * n)
+    return min(max(x, 0), n - 1), min(max(y, 0), n - 1)
+
+
+def tile_bounds(zoom: int, x: int, y: int) -> Dict:
+    """Geographic bounding box of a tile"""
+    n = 1 << zoom
+
+    def lat(row):
+        return math.degrees(math.atan(math.sinh(math.pi * (1 - 2 * row / n))))
+
+    return {"west": x / n * 360.0 - 180.0, "east": (x + 1) / n * 360.0 - 180.0, "north": lat(y), "south": lat(y + 1)}
+
+
+def report_cells(latitude: float, longitude: float) -> List[Tuple[int, int, int]]:
+    """(level, x, y) of the aggregate cell containing a point at every stored level"""
+    finest = TILE_MAX_ZOOM + TILE_BIN_BITS
+    x, y = lat_lon_to_tile(latitude, longitude, finest)
+    return [(level, x >> (finest - level), y >> (finest - level)) for level in range(finest + 1)]
+
+
+def report_delta(report: Dict) -> Dict:
+    """Aggregate increments contributed by one report"""
+    score = float(report.get("severity_score") or 0)
+    delta = {
+        "report_count": 1,
+        "violation_count": 0 if report.get("is_compliant", True) else 1,
+        "severity_sum": score,
+        "max_severity": score,
+    }
+    column = SEVERITY_COLUMNS.get(report.get("severity_level"))
+    if column:
+        delta[column] = 1
+    return delta
+
+
+def update_deltas(before: List[Dict], after: List[Dict]) -> List[Tuple[List[Tuple[int, int, int]], Dict]]:
+    """(cells, delta) increments that move re-scored reports from their old to their new outcome (matched by id).
+
+    Counts and sums move exactly. max_severity can only be raised incrementally, so after a
+    re-score lowers a cell's worst report it is an upper bound until the next full backfill."""
+    previous = {report["id"]: report for report in before}
+    increments = []
+    for report in after:
+        old = previous.get(report.get("id"))
+        if not old or old.get("latitude") is None or old.get("longitude") is None:
+            continue
+        old_delta, new_delta = report_delta(old), report_delta({**old, **report})
+        delta = {
+            key: round(new_delta.get(key, 0) - old_delta.get(key, 0), 4)
+            for key in set(old_delta) | set(new_delta) if key not in ("report_count", "max_severity")
+        }
+        delta = {key: value for key, value in delta.items() if value}
+        if delta:
+            delta["max_severity"] = new_delta["max_severity"]
+            increments.append((report_cells(float(old["latitude"]), float(old["longitude"])), delta))
+    return increments
+
+
+def _summarize(row: Dict) -> Dict:
+    count = row.get("report_count") or 0
+    return {
+        "count": count,
+        "violations": row.get("violation_count") or 0,
+        "avg_severity": round(float(row.get("severity_sum") or 0) / count, 2) if count else 0.0,
+        "max_severity": float(row.get("max_severity") or 0),
+        "by_level": {level: row.get(column) or 0 for level, column in SEVERITY_COLUMNS.items()},
+    }
+
+
+# ============= TILE SERVICE =============
+class TileService:
+    """Maintains tile aggregates on insert and serves tiles with ETag-keyed payload caching"""
+
+    def __init__(self, storage=None, cache_entries: int = TILE_CACHE_ENTRIES):
+        self._storage = storage
+        self.cache_entries = cache_entries
+        self._cache: "OrderedDict[Tuple, Tuple[str, Dict]]" = OrderedDict()
+
+    @property
+    def storage(self):
+        return self._storage or db
+
+    async def add_report(self, report: Dict):
+        """Fold one newly stored report into the aggregates of every level"""
+        if report.get("latitude") is None or report.get("longitude") is None:
+            return
+        cells = report_cells(float(report["latitude"]), float(report["longitude"]))
+        await self.storage.increment_tile_aggregates(cells, report_delta(report))
+
+    @staticmethod
+    def etag(z: int, x: int, y: int, tile_row: Optional[Dict]) -> str:
+        # A tile's own aggregate row changes (version bump) whenever a report lands in it
+        version = tile_row.get("version", 0) if tile_row else 0
+        return '"' + hashlib.sha1(f"{z}/{x}/{y}/{version}/{TILE_BIN_BITS}".encode()).hexdigest()[:16] + '"'
+
+    async def current_etag(self, z: int, x: int, y: int) -> str:
+        rows = await self.storage.get_tile_aggregates(z, x, x, y, y)
+        return self.etag(z, x, y, rows[0] if rows else None)
+
+    async def get_tile(self, z: int, x: int, y: int) -> Tuple[str, Dict]:
+        """Return (etag, payload) for a tile; payloads are cached per tile version"""
+        tile_rows = await self.storage.get_tile_aggregates(z, x, x, y, y)
+        tile_row = tile_rows[0] if tile_rows else None
+        etag = self.etag(z, x, y, tile_row)
+        key = (z, x, y)
+        cached = self._cache.get(key)
+        if cached and cached[0] == etag:
+            self._cache.move_to_end(key)
+            return cached
+
+        bin_zoom = z + TILE_BIN_BITS
+        side = 1 << TILE_BIN_BITS
+        bins = []
+        if tile_row:
+            x0, y0 = x << TILE_BIN_BITS, y << TILE_BIN_BITS
+            for row in await self.storage.get_tile_aggregates(bin_zoom, x0, x0 + side - 1, y0, y0 + side - 1):
+                bins.append({"bx": row["x"] - x0, "by": row["y"] - y0, **_summarize(row)})
+        payload = {
+            "z": z, "x": x, "y": y,
+            "bounds": tile_bounds(z, x, y),
+            "bin_zoom": bin_zoom,
+            "bins_per_side": side,
+            "total": _summarize(tile_row or {}),
+            "bins": sorted(bins, key=lambda b: (b["by"], b["bx"])),
+        }
+        self._cache[key] = (etag, payload)
+        self._cache.move_to_end(key)
+        while len(self._cache) > self.cache_entries:
+            self._cache.popitem(last=False)
+        return etag, payload
+
+    async def backfill(self, batch_size: int = 1000, reset: bool = True) -> int:
+        """Rebuild aggregates from all stored reports (keyset pagination by id); report writes must be paused.
+
+        Without reset, refuses to add to existing aggregates, which would count those reports twice."""
+        if reset:
+            await self.storage.clear_tile_aggregates()
+        elif await self.storage.get_tile_aggregates(0, 0, 0, 0, 0):  # Level 0 has one cell, holding every report
+            raise ValueError("Tile aggregates are not empty; backfilling into them would count reports twice (use reset)")
+        processed, after_id = 0, None
+        while True:
+            batch = await self.storage.get_reports_after(after_id, batch_size)
+            if not batch:
+                break
+            for report in batch:
+                await self.add_report(report)
+            processed += len(batch)
+            after_id = batch[-1]["id"]
+            print(f"Backfilled {processed} reports into tile aggregates")
+        self._cache.clear()
+        return processed
+
+
+tile_service = TileService()
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Tile aggregate maintenance")
+    parser.add_argument("command", choices=["backfill"])
+    parser.add_argument("--reset", action=argparse.BooleanOptionalAction, default=True,
+                        help="Clear existing aggregates first (default); --no-reset requires them to be empty")
+    parser.add_argument("--batch-size", type=int, default=1000)
+    args = parser.parse_args(argv)
+
+    async def run():
+        try:
+            return await tile_service.backfill(args.batch_size, reset=args.reset)
+        finally:
+            await db.close()
+
+    try:
+        print(json.dumps({"reports": asyncio.run(run())}))
+    except ValueError as e:
+        print(f"Error: {e}")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,158 @@
+"""
+Typo-tolerant keyword matching for noisy OCR output.
+
+The matcher is built once per rule set. Each token is normalized for common OCR
+character confusions (0/o, 1/l, 5/s, ...), checked for an exact keyword substring,
+and otherwise looked up in a SymSpell-style deletion index: every keyword is indexed
+under all strings obtained by deleting up to k characters, so a token only needs its
+own (bounded) set of deletes looked up, independent of the number of keywords.
+Adjacent tokens are also tried joined, for words OCR split in two ("gamb ling"); a
+join must spell the keyword exactly.
+
+Fuzzy matching is limited to keywords of FUZZY_MIN_KEYWORD_LENGTH+ letters, and a token
+that is itself a real word (NEAR_MISS_WORDS, plus FUZZY_WORDLIST if configured) is never
+matched fuzzily: "drums" is not a misread "drugs", "prohibits" not "prohibited".
+"""
+import os
+import string
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+from config import FUZZY_MATCH_ENABLED, FUZZY_MAX_EDIT_DISTANCE, FUZZY_MIN_KEYWORD_LENGTH, FUZZY_WORDLIST
+
+# Characters Tesseract commonly substitutes for letters on billboard fonts
+OCR_CONFUSIONS = str.maketrans({"0": "o", "1": "l", "5": "s", "3": "e", "4": "a", "7": "t", "8": "b", "|": "l", "$": "s", "@": "a"})
+TOKEN_CACHE_SIZE = 8192
+# English words within the allowed edit distance of the default keywords
+NEAR_MISS_WORDS = frozenset({
+    "ambling", "rambling", "gamboling", "gabbling",
+    "prohibit", "prohibits", "prohibiter", "prohibitor",
+})
+_PUNCTUATION = string.punctuation + "“”‘’"
+
+
+def load_wordlist(path: str) -> Set[str]:
+    """Lowercased words of a dictionary file (one per line); empty if the file is missing"""
+    if not path or not os.path.exists(path):
+        return set()
+    with open(path, encoding="utf-8", errors="ignore") as f:
+        return {line.strip().lower() for line in f if line.strip()}
+
+
+def normalize_token(token: str) -> str:
+    return token.lower().translate(OCR_CONFUSIONS)
+
+
+def edit_distance(a: str, b: str, limit: int) -> int:
+    """Optimal string alignment distance (adjacent transpositions count once); returns limit + 1 past the limit"""
+    if abs(len(a) - len(b)) > limit:
+        return limit + 1
+    previous2, previous = None, list(range(len(b) + 1))
+    for i in range(1, len(a) + 1):
+        current = [i] + [0] * len(b)
+        for j in range(1, len(b) + 1):
+            cost = 0 if a[i - 1] == b[j - 1] else 1
+            current[j] = min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + cost)
+            if previous2 is not None and i > 1 and j > 1 and a[i - 1] == b[j - 2] and a[i - 2] == b[j - 1]:
+                current[j] = min(current[j], previous2[j - 2] + 1)
+        if min(current) > limit:
+            return limit + 1
+        previous2, previous = previous, current
+    return previous[-1]
+
+
+def _deletes(word: str, distance: int) -> Set[str]:
+    """All strings reachable from `word` by deleting up to `distance` characters"""
+    variants, frontier = {word}, {word}
+    for _ in range(distance):
+        frontier = {w[:i] + w[i + 1:] for w in frontier for i in range(len(w))} - variants
+        variants |= frontier
+    return variants
+
+
+class KeywordMatcher:
+    """Finds violation keywords in OCR tokens within a per-keyword edit distance"""
+
+    def __init__(self, keywords: List[str], max_distance: int = FUZZY_MAX_EDIT_DISTANCE,
+                 min_fuzzy_length: int = FUZZY_MIN_KEYWORD_LENGTH, fuzzy: bool = FUZZY_MATCH_ENABLED,
+                 dictionary: Optional[Iterable[str]] = None):
+        self.keywords = [kw for kw in dict.fromkeys(kw.strip().lower() for kw in keywords) if kw]
+        words = load_wordlist(FUZZY_WORDLIST) if dictionary is None else {word.lower() for word in dictionary}
+        self.dictionary = (NEAR_MISS_WORDS | words) - set(self.keywords)
+        self.fuzzy = fuzzy and max_distance > 0
+        self.max_distance = max_distance if self.fuzzy else 0
+        self.min_fuzzy_length = min_fuzzy_length
+        self.distances = {kw: self._allowed_distance(kw) for kw in self.keywords}
+        self.index: Dict[str, Set[str]] = {}
+        for keyword, distance in self.distances.items():
+            if distance:
+                for variant in _deletes(keyword, distance):
+                    self.index.setdefault(variant, set()).add(keyword)
+        # Largest edit distance any keyword allows for a token of a given length
+        self._length_distance: Dict[int, int] = {}
+        for keyword, distance in self.distances.items():
+            for length in range(len(keyword) - distance, len(keyword) + distance + 1):
+                self._length_distance[length] = max(self._length_distance.get(length, 0), distance)
+        self._cache: Dict[str, Tuple[str, ...]] = {}
+        self._joined_cache: Dict[Tuple[str, str], Optional[str]] = {}
+
+    def _allowed_distance(self, keyword: str) -> int:
+        # Short keywords ("nude", "drugs") stay exact: one edit away are too many ordinary words
+        if not self.fuzzy or len(keyword) < self.min_fuzzy_length:
+            return 0
+        return 1 if len(keyword) < 9 else self.max_distance
+
+    def match_token(self, token: str) -> Tuple[str, ...]:
+        """Keywords matched by a single token (empty if none)"""
+        if token in self._cache:
+            return self._cache[token]
+        normalized = normalize_token(token)
+        match = self._exact(normalized)
+        if not match:
+            fuzzy = self._fuzzy(normalized.strip(_PUNCTUATION))
+            match = (fuzzy,) if fuzzy else ()
+        if len(self._cache) >= TOKEN_CACHE_SIZE:
+            self._cache.clear()
+        self._cache[token] = match
+        return match
+
+    def _exact(self, normalized: str) -> Tuple[str, ...]:
+        return tuple(keyword for keyword in self.keywords if keyword in normalized)
+
+    def _fuzzy(self, normalized: str) -> Optional[str]:
+        distance_limit = self._length_distance.get(len(normalized), 0)
+        if not distance_limit or normalized in self.dictionary:
+            return None
+        best, best_distance = None, None
+        for variant in _deletes(normalized, distance_limit):
+            for keyword in self.index.get(variant, ()):
+                limit = self.distances[keyword]
+                distance = edit_distance(normalized, keyword, limit)
+                if distance <= limit and (best_distance is None or distance < best_distance):
+                    best, best_distance = keyword, distance
+        return best
+
+    def find(self, words: List[str]) -> List[Tuple[int, str]]:
+        """(word index, keyword) for every match in a tokenized sentence, in order of appearance"""
+        matches = []
+        matched = [self.match_token(word) for word in words]
+        for i, keywords in enumerate(matched):
+            if keywords:
+                matches.extend((i, keyword) for keyword in keywords)
+            elif self.fuzzy and i + 1 < len(words) and not matched[i + 1]:
+                joined = self.match_joined(words[i], words[i + 1])
+                if joined:
+                    matches.append((i, joined))
+        return matches
+
+    def match_joined(self, first: str, second: str) -> Optional[str]:
+        """Keyword spelled exactly by two adjacent tokens together (the whole join, not a substring).
+
+        No edits are allowed on top of the split: "dry rugs" is not "drugs"."""
+        key = (first, second)
+        if key in self._joined_cache:
+            return self._joined_cache[key]
+        normalized = normalize_token(first + second).strip(_PUNCTUATION)
+        match = normalized if normalized in self.distances else None
+        if len(self._joined_cache) >= TOKEN_CACHE_SIZE:
+            self._joined_cache.clear()
+        self._joined_cache[key] = match
+        return match
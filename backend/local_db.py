@@ -0,0 +1,1042 @@
+import asyncio
+import functools
+import json
+import math
+import os
+import sqlite3
+import threading
+import uuid
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Tuple
+from config import (
+    COMPLIANCE_TABLE, CITIZEN_REPORTS_TABLE, GEOLOCATION_TABLE,
+    MIN_REPORTS_FOR_VALIDATION, LOCAL_DB_PATH, LOCAL_BLOB_DIR, BILLBOARDS_TABLE,
+    TILE_AGGREGATES_TABLE, ROLLUPS_TABLE
+)
+from storage import StorageBackend, REPORT_COLUMNS
+from search import SEARCH_COLUMNS, fts5_query, like_pattern
+import metrics
+
+# Columns stored as JSON text in SQLite (arrays / JSONB in Postgres)
+JSON_COLUMNS = {
+    'violations_found', 'violation_context', 'text_regions', 'zoning_compliance',
+    'location', 'violations', 'zone_info', 'validator_ids', 'billboard_metadata', 'signature',
+    'ocr_tokens'
+}
+BOOLEAN_COLUMNS = {'is_compliant'}
+
+SCHEMA = f"""
+CREATE TABLE IF NOT EXISTS violation_reports (
+    id TEXT PRIMARY KEY,
+    image_url TEXT,
+    image_filename TEXT,
+    extracted_text TEXT,
+    is_compliant INTEGER DEFAULT 1,
+    status TEXT DEFAULT 'pending',
+    violations_found TEXT,
+    violation_count INTEGER DEFAULT 0,
+    violation_context TEXT,
+    ocr_confidence REAL DEFAULT 0.0,
+    severity_level TEXT DEFAULT 'none',
+    severity_score REAL DEFAULT 0,
+    text_regions TEXT,
+    ocr_tokens TEXT,
+    city TEXT,
+    zone TEXT,
+    latitude REAL,
+    longitude REAL,
+    zoning_compliance TEXT,
+    citizen_validation_count INTEGER DEFAULT 0,
+    billboard_entity_id TEXT,
+    detection_timestamp TEXT,
+    created_at TEXT,
+    updated_at TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_violation_reports_status ON violation_reports(status);
+CREATE INDEX IF NOT EXISTS idx_violation_reports_created_at ON violation_reports(created_at DESC);
+CREATE INDEX IF NOT EXISTS idx_violation_reports_severity ON violation_reports(severity_level);
+
+CREATE TABLE IF NOT EXISTS {BILLBOARDS_TABLE} (
+    id TEXT PRIMARY KEY,
+    cell_key TEXT NOT NULL,
+    latitude REAL NOT NULL,
+    longitude REAL NOT NULL,
+    signature TEXT,
+    report_count INTEGER DEFAULT 0,
+    last_severity_level TEXT,
+    first_seen TEXT,
+    last_seen TEXT,
+    created_at TEXT,
+    updated_at TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_billboards_cell_key ON {BILLBOARDS_TABLE}(cell_key);
+CREATE INDEX IF NOT EXISTS idx_billboards_last_seen ON {BILLBOARDS_TABLE}(last_seen DESC);
+
+CREATE TABLE IF NOT EXISTS {TILE_AGGREGATES_TABLE} (
+    level INTEGER NOT NULL,
+    x INTEGER NOT NULL,
+    y INTEGER NOT NULL,
+    report_count INTEGER DEFAULT 0,
+    violation_count INTEGER DEFAULT 0,
+    severity_sum REAL DEFAULT 0,
+    max_severity REAL DEFAULT 0,
+    critical INTEGER DEFAULT 0,
+    high INTEGER DEFAULT 0,
+    medium INTEGER DEFAULT 0,
+    low INTEGER DEFAULT 0,
+    version INTEGER DEFAULT 0,
+    PRIMARY KEY (level, x, y)
+) WITHOUT ROWID;
+
+CREATE TABLE IF NOT EXISTS {ROLLUPS_TABLE} (
+    granularity TEXT NOT NULL,
+    bucket TEXT NOT NULL,
+    dimension TEXT NOT NULL,
+    value TEXT NOT NULL,
+    report_count INTEGER DEFAULT 0,
+    violation_count INTEGER DEFAULT 0,
+    severity_sum REAL DEFAULT 0,
+    PRIMARY KEY (granularity, dimension, bucket, value)
+) WITHOUT ROWID;
+
+CREATE TABLE IF NOT EXISTS {COMPLIANCE_TABLE} (
+    id TEXT PRIMARY KEY,
+    report_id TEXT,
+    location TEXT,
+    check_timestamp TEXT,
+    is_compliant INTEGER,
+    violations TEXT,
+    zone_info TEXT,
+    restricted_keywords TEXT DEFAULT '',
+    notes TEXT,
+    created_at TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_compliance_checks_report_id ON {COMPLIANCE_TABLE}(report_id);
+
+CREATE TABLE IF NOT EXISTS {CITIZEN_REPORTS_TABLE} (
+    id TEXT PRIMARY KEY,
+    billboard_id TEXT,
+    reporter_name TEXT,
+    reporter_email TEXT,
+    reporter_reputation INTEGER DEFAULT 0,
+    latitude REAL,
+    longitude REAL,
+    description TEXT,
+    status TEXT DEFAULT 'submitted',
+    validated_by_count INTEGER DEFAULT 0,
+    validator_ids TEXT,
+    submitted_at TEXT,
+    created_at TEXT,
+    updated_at TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_citizen_reports_billboard_id ON {CITIZEN_REPORTS_TABLE}(billboard_id);
+CREATE INDEX IF NOT EXISTS idx_citizen_reports_submitted_at ON {CITIZEN_REPORTS_TABLE}(submitted_at DESC);
+
+CREATE TABLE IF NOT EXISTS {GEOLOCATION_TABLE} (
+    id TEXT PRIMARY KEY,
+    latitude REAL NOT NULL,
+    longitude REAL NOT NULL,
+    address TEXT,
+    city TEXT,
+    state TEXT,
+    country TEXT DEFAULT 'US',
+    report_id TEXT,
+    billboard_metadata TEXT,
+    timestamp TEXT,
+    created_at TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_billboard_locations_report_id ON {GEOLOCATION_TABLE}(report_id);
+"""
+
+# Columns added after the first release: (table, column, type), applied to existing databases
+ADDED_COLUMNS = [
+    ("violation_reports", "billboard_entity_id", "TEXT"),
+    ("violation_reports", "ocr_tokens", "TEXT"),
+    ("violation_reports", "city", "TEXT"),
+    ("violation_reports", "zone", "TEXT"),
+]
+# Indexes over added columns (created once the columns exist)
+MIGRATED_INDEXES = """
+CREATE INDEX IF NOT EXISTS idx_violation_reports_billboard ON violation_reports(billboard_entity_id, created_at DESC);
+CREATE INDEX IF NOT EXISTS idx_violation_reports_created_id ON violation_reports(created_at DESC, id DESC);
+"""
+# Text matches beyond which a search walks the recency index instead of sorting every hit
+SEARCH_WALK_THRESHOLD = 5000
+
+# R-tree indexes keyed by the rowid of the owning table
+RTREE_SCHEMA = f"""
+CREATE VIRTUAL TABLE IF NOT EXISTS violation_reports_geo USING rtree(id, min_lat, max_lat, min_lon, max_lon);
+CREATE VIRTUAL TABLE IF NOT EXISTS {GEOLOCATION_TABLE}_geo USING rtree(id, min_lat, max_lat, min_lon, max_lon);
+"""
+# Full-text indexes over extracted_text (FTS5 external content: the text itself stays in
+# violation_reports), kept in sync by triggers. Word index for term queries, trigram
+# index for substring queries.
+FTS_SCHEMA = """
+CREATE VIRTUAL TABLE IF NOT EXISTS violation_reports_fts USING fts5(
+    extracted_text, content='violation_reports', content_rowid='rowid'
+);
+CREATE VIRTUAL TABLE IF NOT EXISTS violation_reports_trgm USING fts5(
+    extracted_text, content='violation_reports', content_rowid='rowid', tokenize='trigram'
+);
+CREATE TRIGGER IF NOT EXISTS violation_reports_fts_insert AFTER INSERT ON violation_reports BEGIN
+    INSERT INTO violation_reports_fts(rowid, extracted_text) VALUES (new.rowid, new.extracted_text);
+    INSERT INTO violation_reports_trgm(rowid, extracted_text) VALUES (new.rowid, new.extracted_text);
+END;
+CREATE TRIGGER IF NOT EXISTS violation_reports_fts_delete AFTER DELETE ON violation_reports BEGIN
+    INSERT INTO violation_reports_fts(violation_reports_fts, rowid, extracted_text) VALUES ('delete', old.rowid, old.extracted_text);
+    INSERT INTO violation_reports_trgm(violation_reports_trgm, rowid, extracted_text) VALUES ('delete', old.rowid, old.extracted_text);
+END;
+CREATE TRIGGER IF NOT EXISTS violation_reports_fts_update AFTER UPDATE OF extracted_text ON violation_reports BEGIN
+    INSERT INTO violation_reports_fts(violation_reports_fts, rowid, extracted_text) VALUES ('delete', old.rowid, old.extracted_text);
+    INSERT INTO violation_reports_trgm(violation_reports_trgm, rowid, extracted_text) VALUES ('delete', old.rowid, old.extracted_text);
+    INSERT INTO violation_reports_fts(rowid, extracted_text) VALUES (new.rowid, new.extracted_text);
+    INSERT INTO violation_reports_trgm(rowid, extracted_text) VALUES (new.rowid, new.extracted_text);
+END;
+"""
+FALLBACK_GEO_SCHEMA = f"""
+CREATE INDEX IF NOT EXISTS idx_violation_reports_location ON violation_reports(latitude, longitude);
+CREATE INDEX IF NOT EXISTS idx_billboard_locations_lat_lon ON {GEOLOCATION_TABLE}(latitude, longitude);
+"""
+
+
+class LocalBlobStore:
+    """Filesystem replacement for Supabase Storage buckets"""
+
+    def __init__(self, root: str = LOCAL_BLOB_DIR):
+        self.root = os.path.abspath(root)
+
+    def _path(self, bucket: str, filename: str) -> str:
+        path = os.path.abspath(os.path.join(self.root, bucket, filename))
+        if not path.startswith(self.root + os.sep):
+            raise ValueError(f"Invalid blob path: {filename}")
+        return path
+
+    def upload(self, bucket: str, filename: str, data: bytes) -> Dict:
+        path = self._path(bucket, filename)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "xb") as f:  # Fail on duplicates like Supabase Storage does
+            f.write(data)
+        return {"path": f"{bucket}/{filename}"}
+
+    def public_url(self, bucket: str, filename: str) -> str:
+        return "file://" + self._path(bucket, filename)
+
+
+def _in_thread(method):
+    """Run a blocking backend method on a worker thread so the event loop keeps serving.
+
+    SQLite statements from different threads are serialized by the backend's lock."""
+    @functools.wraps(method)
+    async def wrapper(self, *args, **kwargs):
+        return await asyncio.to_thread(method, self, *args, **kwargs)
+    return wrapper
+
+
+class LocalDB(StorageBackend):
+    """SQLite (WAL) + filesystem storage backend for offline development and load testing"""
+
+    def __init__(self, path: Optional[str] = None, blob_dir: Optional[str] = None):
+        self.path = path or LOCAL_DB_PATH
+        self.blobs = LocalBlobStore(blob_dir or LOCAL_BLOB_DIR)
+        self._conn: Optional[sqlite3.Connection] = None
+        self._has_rtree = True
+        self._has_fts = True
+        self._lock = threading.RLock()
+        self._columns: Dict[str, set] = {}
+        self._geo_tables = {"violation_reports", GEOLOCATION_TABLE}
+
+    # ============= CONNECTION =============
+    @property
+    def conn(self) -> sqlite3.Connection:
+        if self._conn is None:
+            with self._lock:
+                if self._conn is None:
+                    self._conn = self._connect()
+        return self._conn
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None)
+        conn.row_factory = sqlite3.Row
+        if self.path != ":memory:":
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute("PRAGMA temp_store=MEMORY")
+        conn.executescript(SCHEMA)
+        for table, column, column_type in ADDED_COLUMNS:
+            existing = {row["name"] for row in conn.execute(f"PRAGMA table_info({table})")}
+            if column not in existing:
+                conn.execute(f"ALTER TABLE {table} ADD COLUMN {column} {column_type}")
+        conn.executescript(MIGRATED_INDEXES)
+        try:
+            conn.executescript(RTREE_SCHEMA)
+        except sqlite3.OperationalError:
+            # SQLite built without R*Tree support: fall back to composite B-tree indexes
+            self._has_rtree = False
+            conn.executescript(FALLBACK_GEO_SCHEMA)
+        try:
+            indexed = conn.execute("SELECT 1 FROM sqlite_master WHERE name = 'violation_reports_fts'").fetchone()
+            conn.executescript(FTS_SCHEMA)
+            if not indexed:
+                # Index reports stored before the search indexes existed
+                conn.execute("INSERT INTO violation_reports_fts(violation_reports_fts) VALUES ('rebuild')")
+                conn.execute("INSERT INTO violation_reports_trgm(violation_reports_trgm) VALUES ('rebuild')")
+        except sqlite3.OperationalError:
+            # SQLite built without FTS5 (or the trigram tokenizer): search falls back to LIKE scans
+            self._has_fts = False
+        return conn
+
+    def _table_columns(self, table: str) -> set:
+        if table not in self._columns:
+            with self._lock:
+                self._columns[table] = {row["name"] for row in self.conn.execute(f"PRAGMA table_info({table})")}
+        return self._columns[table]
+
+    def _encode(self, row: Dict) -> Dict:
+        return {k: json.dumps(v) if k in JSON_COLUMNS and v is not None else v for k, v in row.items()}
+
+    def _decode(self, row: Optional[sqlite3.Row]) -> Optional[Dict]:
+        if row is None:
+            return None
+        data = dict(row)
+        for key in JSON_COLUMNS & data.keys():
+            if data[key] is not None:
+                data[key] = json.loads(data[key])
+        for key in BOOLEAN_COLUMNS & data.keys():
+            if data[key] is not None:
+                data[key] = bool(data[key])
+        return data
+
+    def _insert(self, table: str, row: Dict) -> Dict:
+        """Insert known columns of `row` and index its location; returns the stored row"""
+        columns = self._table_columns(table)
+        values = self._encode({k: v for k, v in row.items() if k in columns})
+        names = ", ".join(values)
+        placeholders = ", ".join("?" for _ in values)
+        with self._lock:
+            self.conn.execute("BEGIN")
+            try:
+                cursor = self.conn.execute(f"INSERT INTO {table} ({names}) VALUES ({placeholders})", list(values.values()))
+                if (self._has_rtree and table in self._geo_tables
+                    and row.get("latitude") is not None and row.get("longitude") is not None):
+                    lat, lon = float(row["latitude"]), float(row["longitude"])
+                    self.conn.execute(
+                        f"INSERT INTO {table}_geo (id, min_lat, max_lat, min_lon, max_lon) VALUES (?, ?, ?, ?, ?)",
+                        (cursor.lastrowid, lat, lat, lon, lon),
+                    )
+                self.conn.execute("COMMIT")
+            except Exception:
+                self.conn.execute("ROLLBACK")
+                raise
+            stored = self.conn.execute(f"SELECT * FROM {table} WHERE rowid = ?", (cursor.lastrowid,)).fetchone()
+        return self._decode(stored)
+
+    def _update(self, table: str, row_id: str, updates: Dict) -> Optional[Dict]:
+        """Update known columns of one row (and its location index); returns the stored row"""
+        columns = self._table_columns(table)
+        values = self._encode({k: v for k, v in updates.items() if k in columns})
+        assignments = ", ".join(f"{name} = ?" for name in values)
+        with self._lock:
+            self.conn.execute("BEGIN")
+            try:
+                self.conn.execute(f"UPDATE {table} SET {assignments} WHERE id = ?", [*values.values(), row_id])
+                stored = self.conn.execute(f"SELECT rowid, * FROM {table} WHERE id = ?", (row_id,)).fetchone()
+                if stored is not None and self._has_rtree and table in self._geo_tables and "latitude" in values:
+                    lat, lon = float(stored["latitude"]), float(stored["longitude"])
+                    self.conn.execute(
+                        f"INSERT OR REPLACE INTO {table}_geo (id, min_lat, max_lat, min_lon, max_lon) VALUES (?, ?, ?, ?, ?)",
+                        (stored["rowid"], lat, lat, lon, lon),
+                    )
+                self.conn.execute("COMMIT")
+            except Exception:
+                self.conn.execute("ROLLBACK")
+                raise
+        if stored is None:
+            return None
+        data = self._decode(stored)
+        data.pop("rowid", None)
+        return data
+
+    def _query(self, sql: str, params=()) -> List[Dict]:
+        with self._lock:
+            rows = self.conn.execute(sql, params).fetchall()
+        return [self._decode(row) for row in rows]
+
+    def _within_bbox(self, table: str, latitude: float, longitude: float, radius_km: float) -> List[Dict]:
+        """Candidate rows inside the bounding box of a radius search"""
+        dlat = radius_km / 111.32
+        dlon = radius_km / max(111.32 * math.cos(math.radians(latitude)), 1e-6)
+        bounds = (latitude - dlat, latitude + dlat, longitude - dlon, longitude + dlon)
+        if self._has_rtree:
+            return self._query(
+                f"SELECT t.* FROM {table} t JOIN {table}_geo g ON g.id = t.rowid "
+                f"WHERE g.min_lat >= ? AND g.max_lat <= ? AND g.min_lon >= ? AND g.max_lon <= ?",
+                bounds,
+            )
+        return self._query(
+            f"SELECT * FROM {table} WHERE latitude BETWEEN ? AND ? AND longitude BETWEEN ? AND ?",
+            bounds,
+        )
+
+    @metrics.timed("db")
+    @_in_thread
+    def close(self):
+        with self._lock:
+            if self._conn is not None:
+                if self.path != ":memory:":
+                    self._conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+                self._conn.close()
+                self._conn = None
+
+    # ============= IMAGE STORAGE =============
+    @metrics.timed("db")
+    @_in_thread
+    def upload_image(self, file_data: bytes, filename: str, bucket: str = "billboard-images"):
+        """Write image to the local blob directory"""
+        try:
+            return self.blobs.upload(bucket, filename, file_data)
+        except Exception as e:
+            print(f"Error uploading image: {e}")
+            metrics.DB_ERRORS.inc(operation="upload_image")
+            return None
+
+    @metrics.timed("db")
+    @_in_thread
+    def get_image_url(self, filename: str, bucket: str = "billboard-images"):
+        """Get file:// URL of a stored image"""
+        try:
+            return self.blobs.public_url(bucket, filename)
+        except Exception as e:
+            print(f"Error getting image URL: {e}")
+            metrics.DB_ERRORS.inc(operation="get_image_url")
+            return None
+
+    # ============= VIOLATION REPORTS =============
+    @metrics.timed("db")
+    @_in_thread
+    def create_violation_report(self, report_data: dict):
+        """Create a new violation report with full analysis data"""
+        try:
+            report_data['id'] = str(uuid.uuid4())
+            report_data['created_at'] = datetime.utcnow().isoformat()
+            report_data['updated_at'] = datetime.utcnow().isoformat()
+            sanitized = {k: v for k, v in report_data.items() if k in REPORT_COLUMNS}
+            sanitized.setdefault('status', 'pending')
+            return self._insert("violation_reports", sanitized)
+        except Exception as e:
+            print(f"Error creating report: {e}")
+            metrics.DB_ERRORS.inc(operation="create_violation_report")
+            return None
+
+    @metrics.timed("db")
+    @_in_thread
+    def get_violation_reports(self, limit: int = 50, offset: int = 0):
+        """Get all violation reports with pagination"""
+        try:
+            return self._query(
+                "SELECT * FROM violation_reports ORDER BY created_at DESC LIMIT ? OFFSET ?",
+                (limit, offset),
+            )
+        except Exception as e:
+            print(f"Error fetching reports: {e}")
+            metrics.DB_ERRORS.inc(operation="get_violation_reports")
+            return []
+
+    @metrics.timed("db")
+    @_in_thread
+    def get_report_by_id(self, report_id: str):
+        """Get specific violation report by ID"""
+        try:
+            rows = self._query("SELECT * FROM violation_reports WHERE id = ?", (report_id,))
+            return rows[0] if rows else None
+        except Exception as e:
+            print(f"Error fetching report: {e}")
+            metrics.DB_ERRORS.inc(operation="get_report_by_id")
+            return None
+
+    @metrics.timed("db")
+    @_in_thread
+    def update_report_status(self, report_id: str, status: str) -> Optional[Tuple[Optional[str], Dict]]:
+        """Update report status (pending, approved, resolved, rejected); returns (previous status, stored row)"""
+        try:
+            with self._lock:
+                self.conn.execute("BEGIN")
+                try:
+                    previous = self.conn.execute("SELECT status FROM violation_reports WHERE id = ?", (report_id,)).fetchone()
+                    stored = None
+                    if previous is not None:
+                        self.conn.execute(
+                            "UPDATE violation_reports SET status = ?, updated_at = ? WHERE id = ?",
+                            (status, datetime.utcnow().isoformat(), report_id),
+                        )
+                        stored = self.conn.execute("SELECT * FROM violation_reports WHERE id = ?", (report_id,)).fetchone()
+                    self.conn.execute("COMMIT")
+                except Exception:
+                    self.conn.execute("ROLLBACK")
+                    raise
+            return (previous["status"], self._decode(stored)) if previous is not None else None
+        except Exception as e:
+            print(f"Error updating report: {e}")
+            metrics.DB_ERRORS.inc(operation="update_report_status")
+            return None
+
+    @metrics.timed("db")
+    @_in_thread
+    def update_violation_report(self, report_id: str, updates: Dict) -> Optional[Dict]:
+        """Update arbitrary report columns (used by re-scoring backfills)"""
+        try:
+            return self._update("violation_reports", report_id, {**updates, "updated_at": datetime.utcnow().isoformat()})
+        except Exception as e:
+            print(f"Error updating report: {e}")
+            metrics.DB_ERRORS.inc(operation="update_violation_report")
+            return None
+
+    # ============= COMPLIANCE MONITORING =============
+    @metrics.timed("db")
+    @_in_thread
+    def check_zoning_compliance(self, location: Dict, violation_keywords: List[str]) -> Dict:
+        """Check if location complies with zoning laws"""
+        try:
+            if 'latitude' in location and 'longitude' in location:
+                lat, lon = location['latitude'], location['longitude']
+                rules = self._query(f"SELECT * FROM {COMPLIANCE_TABLE}")
+
+                zoning_violations = []
+                for rule in rules:
+                    if self._check_location_in_zone(lat, lon, rule):
+                        if any(kw in (rule.get('restricted_keywords') or '') for kw in violation_keywords):
+                            zoning_violations.append(rule)
+
+                return {
+                    "compliant": len(zoning_violations) == 0,
+                    "violations": zoning_violations,
+                    "zone_info": rules[0] if rules else None
+                }
+
+            return {"compliant": True, "violations": [], "zone_info": None}
+        except Exception as e:
+            print(f"Error checking zoning compliance: {e}")
+            metrics.DB_ERRORS.inc(operation="check_zoning_compliance")
+            return {"compliant": True, "violations": [], "zone_info": None}
+
+    @metrics.timed("db")
+    @_in_thread
+    def log_compliance_check(self, report_id: str, check_data: Dict):
+        """Log a compliance check result"""
+        try:
+            check_data['id'] = str(uuid.uuid4())
+            check_data['report_id'] = report_id
+            check_data['check_timestamp'] = datetime.utcnow().isoformat()
+            check_data['created_at'] = datetime.utcnow().isoformat()
+            return self._insert(COMPLIANCE_TABLE, check_data)
+        except Exception as e:
+            print(f"Error logging compliance check: {e}")
+            metrics.DB_ERRORS.inc(operation="log_compliance_check")
+            return None
+
+    # ============= GEOLOCATION TRACKING =============
+    @metrics.timed("db")
+    @_in_thread
+    def save_billboard_location(self, location_data: Dict):
+        """Save billboard location with geolocation data and timestamp"""
+        try:
+            location_data['id'] = str(uuid.uuid4())
+            location_data['timestamp'] = datetime.utcnow().isoformat()
+            location_data['created_at'] = datetime.utcnow().isoformat()
+            return self._insert(GEOLOCATION_TABLE, location_data)
+        except Exception as e:
+            print(f"Error saving location: {e}")
+            metrics.DB_ERRORS.inc(operation="save_billboard_location")
+            return None
+
+    @metrics.timed("db")
+    @_in_thread
+    def get_nearby_billboards(self, latitude: float, longitude: float, radius_km: float = 1.0) -> List[Dict]:
+        """Get billboards within a specified radius (R-tree bounding box, then Haversine)"""
+        try:
+            return [
+                location for location in self._within_bbox(GEOLOCATION_TABLE, latitude, longitude, radius_km)
+                if self._calculate_distance(latitude, longitude, location['latitude'], location['longitude']) <= radius_km
+            ]
+        except Exception as e:
+            print(f"Error fetching nearby billboards: {e}")
+            metrics.DB_ERRORS.inc(operation="get_nearby_billboards")
+            return []
+
+    # ============= CITIZEN ENGAGEMENT =============
+    @metrics.timed("db")
+    @_in_thread
+    def submit_citizen_report(self, citizen_report: Dict):
+        """Submit a citizen violation report"""
+        try:
+            citizen_report['id'] = str(uuid.uuid4())
+            citizen_report['submitted_at'] = datetime.utcnow().isoformat()
+            citizen_report['status'] = 'pending'
+            citizen_report['validated_by_count'] = 0
+            citizen_report['reporter_reputation'] = citizen_report.get('reporter_reputation', 0)
+            stored = self._insert(CITIZEN_REPORTS_TABLE, citizen_report)
+
+            # Auto-flag if multiple citizens report same location
+            if stored:
+                self._check_and_flag_violation(citizen_report.get('billboard_id'))
+
+            return stored
+        except Exception as e:
+            print(f"Error submitting citizen report: {e}")
+            metrics.DB_ERRORS.inc(operation="submit_citizen_report")
+            return None
+
+    @metrics.timed("db")
+    @_in_thread
+    def validate_citizen_report(self, citizen_report_id: str, validator_id: str) -> Dict:
+        """Citizen validation of another's report (increases credibility)"""
+        try:
+            with self._lock:
+                self.conn.execute(
+                    f"UPDATE {CITIZEN_REPORTS_TABLE} SET validated_by_count = validated_by_count + 1 WHERE id = ?",
+                    (citizen_report_id,),
+                )
+            rows = self._query(f"SELECT * FROM {CITIZEN_REPORTS_TABLE} WHERE id = ?", (citizen_report_id,))
+            return rows[0] if rows else None
+        except Exception as e:
+            print(f"Error validating citizen report: {e}")
+            metrics.DB_ERRORS.inc(operation="validate_citizen_report")
+            return None
+
+    @metrics.timed("db")
+    @_in_thread
+    def get_citizen_reports(self, billboard_id: Optional[str] = None, limit: int = 50) -> List[Dict]:
+        """Get citizen reports, optionally filtered by billboard"""
+        try:
+            if billboard_id:
+                return self._query(
+                    f"SELECT * FROM {CITIZEN_REPORTS_TABLE} WHERE billboard_id = ? ORDER BY submitted_at DESC LIMIT ?",
+                    (billboard_id, limit),
+                )
+            return self._query(f"SELECT * FROM {CITIZEN_REPORTS_TABLE} ORDER BY submitted_at DESC LIMIT ?", (limit,))
+        except Exception as e:
+            print(f"Error fetching citizen reports: {e}")
+            metrics.DB_ERRORS.inc(operation="get_citizen_reports")
+            return []
+
+    def _check_and_flag_violation(self, billboard_id: str):
+        """Auto-flag violation if multiple citizen reports exist"""
+        try:
+            with self._lock:
+                count = self.conn.execute(
+                    f"SELECT COUNT(*) FROM {CITIZEN_REPORTS_TABLE} WHERE billboard_id = ?", (billboard_id,)
+                ).fetchone()[0]
+                if count >= MIN_REPORTS_FOR_VALIDATION:
+                    # billboard_id may name a single report or a clustered billboard entity
+                    self.conn.execute(
+                        "UPDATE violation_reports SET status = 'flagged_by_citizens', citizen_validation_count = ? "
+                        "WHERE id = ? OR billboard_entity_id = ?",
+                        (count, billboard_id, billboard_id),
+                    )
+        except Exception as e:
+            print(f"Error flagging violation: {e}")
+            metrics.DB_ERRORS.inc(operation="_check_and_flag_violation")
+
+    # ============= BILLBOARD ENTITIES =============
+    @metrics.timed("db")
+    @_in_thread
+    def get_billboards_in_cells(self, cell_keys: List[str]) -> List[Dict]:
+        """Get billboard entities bucketed in any of the given grid cells"""
+        try:
+            placeholders = ", ".join("?" for _ in cell_keys)
+            return self._query(f"SELECT * FROM {BILLBOARDS_TABLE} WHERE cell_key IN ({placeholders})", cell_keys)
+        except Exception as e:
+            print(f"Error fetching billboards by cell: {e}")
+            metrics.DB_ERRORS.inc(operation="get_billboards_in_cells")
+            return []
+
+    @metrics.timed("db")
+    @_in_thread
+    def create_billboard(self, billboard_data: Dict) -> Optional[Dict]:
+        """Create a canonical billboard entity"""
+        try:
+            billboard_data['id'] = str(uuid.uuid4())
+            billboard_data['created_at'] = datetime.utcnow().isoformat()
+            billboard_data['updated_at'] = datetime.utcnow().isoformat()
+            return self._insert(BILLBOARDS_TABLE, billboard_data)
+        except Exception as e:
+            print(f"Error creating billboard: {e}")
+            metrics.DB_ERRORS.inc(operation="create_billboard")
+            return None
+
+    @metrics.timed("db")
+    @_in_thread
+    def update_billboard(self, billboard_id: str, updates: Dict) -> Optional[Dict]:
+        """Update a billboard entity (position, signature, counters)"""
+        try:
+            return self._update(BILLBOARDS_TABLE, billboard_id, {**updates, "updated_at": datetime.utcnow().isoformat()})
+        except Exception as e:
+            print(f"Error updating billboard: {e}")
+            metrics.DB_ERRORS.inc(operation="update_billboard")
+            return None
+
+    @metrics.timed("db")
+    @_in_thread
+    def record_billboard_sighting(self, billboard_id: str, sighting: Dict, delta: int = 1) -> Optional[Dict]:
+        """Atomically add (delta=1) or retract (delta=-1) one sighting; a billboard left without sightings is deleted"""
+        try:
+            now = datetime.utcnow().isoformat()
+            signature = json.dumps(sighting["signature"]) if sighting.get("signature") else None
+            with self._lock:
+                self.conn.execute("BEGIN")
+                try:
+                    # Right-hand sides see the old row, so the mean moves by delta * (x - mean) / new_count
+                    self.conn.execute(
+                        f"""
+                        UPDATE {BILLBOARDS_TABLE} SET
+                            report_count = COALESCE(report_count, 0) + :delta,
+                            latitude = CASE WHEN COALESCE(report_count, 0) + :delta > 0
+                                THEN latitude + :delta * (:latitude - latitude) / (COALESCE(report_count, 0) + :delta)
+                                ELSE latitude END,
+                            longitude = CASE WHEN COALESCE(report_count, 0) + :delta > 0
+                                THEN longitude + :delta * (:longitude - longitude) / (COALESCE(report_count, 0) + :delta)
+                                ELSE longitude END,
+                            signature = CASE WHEN :delta > 0 THEN COALESCE(:signature, signature) ELSE signature END,
+                            last_severity_level = CASE WHEN :delta > 0 THEN :severity_level ELSE last_severity_level END,
+                            last_seen = CASE WHEN :delta > 0 THEN :now ELSE last_seen END,
+                            updated_at = :now
+                        WHERE id = :id
+                        """,
+                        {
+                            "id": billboard_id, "delta": delta, "latitude": float(sighting["latitude"]),
+                            "longitude": float(sighting["longitude"]), "signature": signature,
+                            "severity_level": sighting.get("severity_level"), "now": now,
+                        },
+                    )
+                    stored = self.conn.execute(f"SELECT * FROM {BILLBOARDS_TABLE} WHERE id = ?", (billboard_id,)).fetchone()
+                    if stored is not None and stored["report_count"] <= 0:
+                        self.conn.execute(f"DELETE FROM {BILLBOARDS_TABLE} WHERE id = ?", (billboard_id,))
+                        stored = None
+                    self.conn.execute("COMMIT")
+                except Exception:
+                    self.conn.execute("ROLLBACK")
+                    raise
+            return self._decode(stored)
+        except Exception as e:
+            print(f"Error recording billboard sighting: {e}")
+            metrics.DB_ERRORS.inc(operation="record_billboard_sighting")
+            return None
+
+    @metrics.timed("db")
+    @_in_thread
+    def get_billboards(self, limit: int = 50, offset: int = 0) -> List[Dict]:
+        """Get billboard entities, most recently sighted first"""
+        try:
+            return self._query(
+                f"SELECT * FROM {BILLBOARDS_TABLE} ORDER BY last_seen DESC LIMIT ? OFFSET ?", (limit, offset)
+            )
+        except Exception as e:
+            print(f"Error fetching billboards: {e}")
+            metrics.DB_ERRORS.inc(operation="get_billboards")
+            return []
+
+    @metrics.timed("db")
+    @_in_thread
+    def get_billboard(self, billboard_id: str) -> Optional[Dict]:
+        """Get a billboard entity by ID"""
+        try:
+            rows = self._query(f"SELECT * FROM {BILLBOARDS_TABLE} WHERE id = ?", (billboard_id,))
+            return rows[0] if rows else None
+        except Exception as e:
+            print(f"Error fetching billboard: {e}")
+            metrics.DB_ERRORS.inc(operation="get_billboard")
+            return None
+
+    @metrics.timed("db")
+    @_in_thread
+    def get_billboard_reports(self, billboard_id: str, limit: int = 50, offset: int = 0) -> List[Dict]:
+        """Get the violation report history of a billboard entity"""
+        try:
+            return self._query(
+                "SELECT * FROM violation_reports WHERE billboard_entity_id = ? ORDER BY created_at DESC LIMIT ? OFFSET ?",
+                (billboard_id, limit, offset),
+            )
+        except Exception as e:
+            print(f"Error fetching billboard history: {e}")
+            metrics.DB_ERRORS.inc(operation="get_billboard_reports")
+            return []
+
+    # ============= BULK ACCESS =============
+    @metrics.timed("db")
+    @_in_thread
+    def get_reports_after(self, after_id: Optional[str] = None, limit: int = 1000, columns: str = "*") -> List[Dict]:
+        """Keyset pagination over violation reports ordered by id (for backfills)"""
+        try:
+            return self._query(
+                f"SELECT {columns} FROM violation_reports WHERE id > ? ORDER BY id LIMIT ?",
+                (after_id or "", limit),
+            )
+        except Exception as e:
+            print(f"Error streaming reports: {e}")
+            metrics.DB_ERRORS.inc(operation="get_reports_after")
+            return []
+
+    # ============= SEARCH =============
+    @metrics.timed("db")
+    @_in_thread
+    def search_reports(self, terms: List[str], mode: str = "words", status: Optional[str] = None,
+                             severity: Optional[str] = None, bbox: Optional[Tuple[float, float, float, float]] = None,
+                             after: Optional[Tuple[str, str]] = None, limit: int = 20) -> List[Dict]:
+        """Reports whose extracted text matches, newest first (FTS5 word / trigram index)"""
+        try:
+            if not terms:
+                return []
+            conditions, params, order_index = [], [], ""
+            short = mode == "substring" and len(terms[0]) < 3  # Trigram index needs 3+ characters
+            if self._has_fts and not short:
+                index = "violation_reports_trgm" if mode == "substring" else "violation_reports_fts"
+                matches = f"SELECT rowid FROM {index} WHERE {index} MATCH ?"
+                with self._lock:
+                    common = self.conn.execute(
+                        f"SELECT COUNT(*) FROM ({matches} LIMIT {SEARCH_WALK_THRESHOLD})", (fts5_query(terms),)
+                    ).fetchone()[0] >= SEARCH_WALK_THRESHOLD
+                if common:
+                    # Newest reports match often enough that the first page is found after a short walk
+                    order_index = "INDEXED BY idx_violation_reports_created_id"
+                conditions.append(f"v.rowid IN ({matches})")
+                params.append(fts5_query(terms))
+            else:
+                for term in terms:
+                    conditions.append("v.extracted_text LIKE ? ESCAPE '\\'")
+                    params.append(like_pattern(term))
+            if status:
+                conditions.append("v.status = ?")
+                params.append(status)
+            if severity:
+                conditions.append("v.severity_level = ?")
+                params.append(severity)
+            if bbox:
+                min_lat, min_lon, max_lat, max_lon = bbox
+                if self._has_rtree:
+                    conditions.append(
+                        "v.rowid IN (SELECT id FROM violation_reports_geo "
+                        "WHERE min_lat >= ? AND max_lat <= ? AND min_lon >= ? AND max_lon <= ?)"
+                    )
+                    params.extend((min_lat, max_lat, min_lon, max_lon))
+                else:
+                    conditions.append("v.latitude BETWEEN ? AND ? AND v.longitude BETWEEN ? AND ?")
+                    params.extend((min_lat, max_lat, min_lon, max_lon))
+            if after:
+                conditions.append("(v.created_at, v.id) < (?, ?)")
+                params.extend(after)
+            columns = ", ".join(f"v.{column}" for column in SEARCH_COLUMNS)
+            return self._query(
+                f"SELECT {columns} FROM violation_reports v {order_index} WHERE {' AND '.join(conditions)} "
+                "ORDER BY v.created_at DESC, v.id DESC LIMIT ?",
+                [*params, limit],
+            )
+        except Exception as e:
+            print(f"Error searching reports: {e}")
+            metrics.DB_ERRORS.inc(operation="search_reports")
+            return []
+
+    # ============= AGGREGATE INCREMENTS (caller holds the lock and a transaction) =============
+    def _increment_tiles(self, cells: List[Tuple[int, int, int]], delta: Dict):
+        params = [
+            (level, x, y, delta.get("report_count", 0), delta.get("violation_count", 0),
+             delta.get("severity_sum", 0), delta.get("max_severity", 0), delta.get("critical", 0),
+             delta.get("high", 0), delta.get("medium", 0), delta.get("low", 0))
+            for level, x, y in cells
+        ]
+        self.conn.executemany(
+            f"""
+            INSERT INTO {TILE_AGGREGATES_TABLE}
+                (level, x, y, report_count, violation_count, severity_sum, max_severity,
+                 critical, high, medium, low, version)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, 1)
+            ON CONFLICT (level, x, y) DO UPDATE SET
+                report_count = report_count + excluded.report_count,
+                violation_count = violation_count + excluded.violation_count,
+                severity_sum = severity_sum + excluded.severity_sum,
+                max_severity = MAX(max_severity, excluded.max_severity),
+                critical = critical + excluded.critical,
+                high = high + excluded.high,
+                medium = medium + excluded.medium,
+                low = low + excluded.low,
+                version = version + 1
+            """,
+            params,
+        )
+
+    def _increment_rollups(self, rows: List[Tuple]):
+        self.conn.executemany(
+            f"""
+            INSERT INTO {ROLLUPS_TABLE}
+                (granularity, bucket, dimension, value, report_count, violation_count, severity_sum)
+            VALUES (?, ?, ?, ?, ?, ?, ?)
+            ON CONFLICT (granularity, dimension, bucket, value) DO UPDATE SET
+                report_count = report_count + excluded.report_count,
+                violation_count = violation_count + excluded.violation_count,
+                severity_sum = severity_sum + excluded.severity_sum
+            """,
+            rows,
+        )
+
+    @metrics.timed("db")
+    @_in_thread
+    def apply_report_rescore(self, updates: List[Tuple[str, Dict]], rollup_rows: List[Tuple],
+                                   tile_increments: List[Tuple[List[Tuple[int, int, int]], Dict]]) -> bool:
+        """Write re-scored outcomes together with their rollup and tile increments in one transaction"""
+        try:
+            columns = self._table_columns("violation_reports")
+            now = datetime.utcnow().isoformat()
+            with self._lock:
+                self.conn.execute("BEGIN")
+                try:
+                    for report_id, outcome in updates:
+                        values = self._encode({k: v for k, v in {**outcome, "updated_at": now}.items() if k in columns})
+                        assignments = ", ".join(f"{name} = ?" for name in values)
+                        self.conn.execute(f"UPDATE violation_reports SET {assignments} WHERE id = ?", [*values.values(), report_id])
+                    self._increment_rollups(rollup_rows)
+                    for cells, delta in tile_increments:
+                        self._increment_tiles(cells, delta)
+                    self.conn.execute("COMMIT")
+                except Exception:
+                    self.conn.execute("ROLLBACK")
+                    raise
+            return True
+        except Exception as e:
+            print(f"Error applying re-scored reports: {e}")
+            metrics.DB_ERRORS.inc(operation="apply_report_rescore")
+            return False
+
+    # ============= TILE AGGREGATES =============
+    @metrics.timed("db")
+    @_in_thread
+    def increment_tile_aggregates(self, cells: List[Tuple[int, int, int]], delta: Dict):
+        """Add a report's contribution to every level's cell in one transaction"""
+        try:
+            with self._lock:
+                self.conn.execute("BEGIN")
+                try:
+                    self._increment_tiles(cells, delta)
+                    self.conn.execute("COMMIT")
+                except Exception:
+                    self.conn.execute("ROLLBACK")
+                    raise
+        except Exception as e:
+            print(f"Error updating tile aggregates: {e}")
+            metrics.DB_ERRORS.inc(operation="increment_tile_aggregates")
+
+    @metrics.timed("db")
+    @_in_thread
+    def get_tile_aggregates(self, level: int, x_min: int, x_max: int, y_min: int, y_max: int) -> List[Dict]:
+        """Get aggregate cells of one level inside an x/y range"""
+        try:
+            return self._query(
+                f"SELECT * FROM {TILE_AGGREGATES_TABLE} WHERE level = ? AND x BETWEEN ? AND ? AND y BETWEEN ? AND ?",
+                (level, x_min, x_max, y_min, y_max),
+            )
+        except Exception as e:
+            print(f"Error fetching tile aggregates: {e}")
+            metrics.DB_ERRORS.inc(operation="get_tile_aggregates")
+            return []
+
+    @metrics.timed("db")
+    @_in_thread
+    def clear_tile_aggregates(self):
+        """Delete all tile aggregates (before a full backfill)"""
+        try:
+            with self._lock:
+                self.conn.execute(f"DELETE FROM {TILE_AGGREGATES_TABLE}")
+        except Exception as e:
+            print(f"Error clearing tile aggregates: {e}")
+            metrics.DB_ERRORS.inc(operation="clear_tile_aggregates")
+
+    # ============= TREND ROLLUPS =============
+    @metrics.timed("db")
+    @_in_thread
+    def increment_report_rollups(self, rows: List[Tuple]):
+        """Add (granularity, bucket, dimension, value, reports, violations, severity_sum) increments in one transaction"""
+        try:
+            with self._lock:
+                self.conn.execute("BEGIN")
+                try:
+                    self._increment_rollups(rows)
+                    self.conn.execute("COMMIT")
+                except Exception:
+                    self.conn.execute("ROLLBACK")
+                    raise
+        except Exception as e:
+            print(f"Error updating rollups: {e}")
+            metrics.DB_ERRORS.inc(operation="increment_report_rollups")
+
+    @metrics.timed("db")
+    @_in_thread
+    def get_report_rollups(self, granularity: str, dimension: str, first_bucket: str, last_bucket: str,
+                                 value: Optional[str] = None) -> List[Dict]:
+        """Rollup rows of one dimension with buckets in [first_bucket, last_bucket]"""
+        try:
+            sql = (
+                f"SELECT bucket, value, report_count, violation_count, severity_sum FROM {ROLLUPS_TABLE} "
+                "WHERE granularity = ? AND dimension = ? AND bucket BETWEEN ? AND ?"
+            )
+            params = [granularity, dimension, first_bucket, last_bucket]
+            if value is not None:
+                sql += " AND value = ?"
+                params.append(value)
+            with self._lock:
+                rows = self.conn.execute(sql, params).fetchall()
+            return [dict(row) for row in rows]  # No JSON columns to decode
+        except Exception as e:
+            print(f"Error fetching rollups: {e}")
+            metrics.DB_ERRORS.inc(operation="get_report_rollups")
+            return []
+
+    @metrics.timed("db")
+    @_in_thread
+    def clear_report_rollups(self):
+        """Delete all rollups (before a full backfill)"""
+        try:
+            with self._lock:
+                self.conn.execute(f"DELETE FROM {ROLLUPS_TABLE}")
+        except Exception as e:
+            print(f"Error clearing rollups: {e}")
+            metrics.DB_ERRORS.inc(operation="clear_report_rollups")
+
+    # ============= STATISTICS & DASHBOARD =============
+    @metrics.timed("db")
+    @_in_thread
+    def get_statistics(self) -> Dict:
+        """Get comprehensive dashboard statistics (aggregated in SQL)"""
+        try:
+            week_ago = (datetime.utcnow() - timedelta(days=7)).isoformat()
+            with self._lock:
+                row = self.conn.execute(
+                    """
+                    SELECT COUNT(*) AS total,
+                           SUM(status = 'pending') AS pending,
+                           SUM(status = 'flagged_by_citizens') AS flagged,
+                           SUM(status = 'resolved') AS resolved,
+                           SUM(created_at > ?) AS this_week,
+                           AVG(CASE severity_level WHEN 'Critical' THEN 9 WHEN 'High' THEN 6
+                                   WHEN 'Medium' THEN 4 WHEN 'Low' THEN 2 ELSE 0 END) AS avg_severity
+                    FROM violation_reports
+                    """,
+                    (week_ago,),
+                ).fetchone()
+                citizen_count = self.conn.execute(f"SELECT COUNT(*) FROM {CITIZEN_REPORTS_TABLE}").fetchone()[0]
+                location_count = self.conn.execute(f"SELECT COUNT(*) FROM {GEOLOCATION_TABLE}").fetchone()[0]
+
+            return {
+                "total_reports": row["total"] or 0,
+                "pending": row["pending"] or 0,
+                "flagged_by_citizens": row["flagged"] or 0,
+                "resolved": row["resolved"] or 0,
+                "this_week": row["this_week"] or 0,
+                "citizen_reports_count": citizen_count,
+                "tracked_locations": location_count,
+                "avg_severity": round(row["avg_severity"] or 0.0, 2)
+            }
+        except Exception as e:
+            print(f"Error fetching statistics: {e}")
+            metrics.DB_ERRORS.inc(operation="get_statistics")
+            return {
+                "total_reports": 0, "pending": 0, "flagged_by_citizens": 0,
+                "resolved": 0, "this_week": 0, "citizen_reports_count": 0,
+                "tracked_locations": 0, "avg_severity": 0
+            }
@@ -1,15 +1,123 @@
-from fastapi import FastAPI, File, UploadFile, HTTPException, Query
+import startup
+from fastapi import FastAPI, File, UploadFile, HTTPException, Query, Request
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, Response, FileResponse
 from pydantic import BaseModel
-from typing import Optional, List
+from typing import Optional, List, Union
+from contextlib import asynccontextmanager
+from concurrent.futures import ThreadPoolExecutor
+import asyncio
 import uuid
-from datetime import datetime
-from config import API_TITLE, API_VERSION, API_DESCRIPTION, FRONTEND_URL
+from datetime import datetime, timedelta
+from config import (
+    API_TITLE, API_VERSION, API_DESCRIPTION, FRONTEND_URL, STARTUP_PROFILE, STARTUP_WARMUP,
+    DETECTOR_THREADS, TILE_MAX_ZOOM, TILE_CACHE_SECONDS, COMPRESSION_ENABLED, SCHEDULER_API_KEYS
+)
 from db import db
-from detector import detector
+from result_cache import result_cache
+from clustering import clusterer
+from geo_tiles import tile_service
+from rollups import rollup_service, parse_timestamp
+from scheduler import AnalysisScheduler, SchedulerRejected, parse_assignments
+from text_regions import encode_regions
+from serialization import FastJSONResponse, list_response
+from search import SEARCH_COLUMNS, parse_query, encode_cursor, decode_cursor, snippet
+from compression import CompressionMiddleware
+import metrics
+import profiling
 import os
 
+startup.mark("imports")
+
+# ============ Lazy Components =============
+# cv2, numpy and pytesseract are only imported when the detector is first needed,
+# so health checks are served without paying for them.
+_detector = None
+
+def get_detector():
+    """Return the shared ViolationDetector, importing the CV stack on first use"""
+    global _detector
+    if _detector is None:
+        with startup.phase("detector_import"):
+            from detector import detector
+        _detector = detector
+    return _detector
+
+def warm_up_detector():
+    """Import the CV stack and run one OCR so the first real request is not a cold start"""
+    detector = get_detector()
+    with startup.phase("warmup_ocr"):
+        detector.warm_up()
+
+# Analyses run on a bounded thread pool so the event loop keeps serving while OCR runs
+_detection_pool = None
+_detection_threads = DETECTOR_THREADS
+
+def get_detection_pool(max_workers: Optional[int] = None) -> ThreadPoolExecutor:
+    global _detection_pool, _detection_threads
+    if _detection_pool is None:
+        _detection_threads = max_workers or DETECTOR_THREADS
+        _detection_pool = ThreadPoolExecutor(max_workers=_detection_threads, thread_name_prefix="detector")
+    return _detection_pool
+
+def analyze_with_cache(image_data: bytes) -> dict:
+    """Analyze an image, reusing a cached result for identical bytes under the same rule set"""
+    detector = get_detector()
+    with profiling.profile_analysis():
+        if result_cache is None:
+            return detector.analyze_image(image_data)
+        key = result_cache.key(image_data, detector.rules_version)
+        cached = result_cache.get(key)
+        if cached is not None:
+            return {**cached, "detection_timestamp": datetime.utcnow().isoformat()}
+        result = detector.analyze_image(image_data)
+        if result.get("analysis_complete"):
+            result_cache.put(key, result)
+        return result
+
+# All analyses go through the scheduler, which feeds the pool by priority class and source
+_scheduler = None
+
+def get_scheduler() -> AnalysisScheduler:
+    global _scheduler
+    if _scheduler is None:
+        pool = get_detection_pool()
+        _scheduler = AnalysisScheduler(pool, capacity=_detection_threads)
+    return _scheduler
+
+async def run_analysis(image_data: bytes, priority: Optional[str] = None, source: str = "anonymous") -> dict:
+    """Schedule analyze_with_cache on the detection pool, keeping the request's trace context"""
+    scheduler = get_scheduler()
+    return await scheduler.submit(
+        analyze_with_cache, image_data,
+        priority=scheduler.classify(priority, source),
+        source=source,
+    )
+
+# Only configured keys name a source; anything else a client sends could be rotated at will
+_api_key_sources = {key: name for name, key in parse_assignments(SCHEDULER_API_KEYS).items() if key}
+
+def request_source(request: Request) -> str:
+    """Fair-share identity of a caller: the name of a configured API key, otherwise the client address"""
+    source = _api_key_sources.get(request.headers.get("x-api-key") or "")
+    if source:
+        return source
+    return request.client.host if request.client else "anonymous"
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    startup.mark("lifespan_start")
+    if STARTUP_WARMUP:
+        await asyncio.to_thread(warm_up_detector)
+    startup.mark("ready")
+    yield
+    # Drain: let in-flight analyses finish, then flush and close storage
+    if _detection_pool is not None:
+        await asyncio.to_thread(_detection_pool.shutdown, True)
+    if result_cache is not None:
+        result_cache.close()
+    await db.close()
+
 # ============ Pydantic Models =============
 class CitizenReportCreate(BaseModel):
     billboard_id: str
@@ -31,15 +139,133 @@ class GeolocationData(BaseModel):
 class ReportStatusUpdate(BaseModel):
     status: str  # pending, approved, resolved, flagged_by_citizens, rejected
 
+# Response models document the large list/analysis endpoints in the OpenAPI schema.
+# Those endpoints encode their payload directly (serialization.py) instead of validating it;
+# tests/test_serialization.py checks the encoded payloads against these models.
+class TextRegion(BaseModel):
+    x: int
+    y: int
+    width: int
+    height: int
+    area: int
+
+class CompactTextRegions(BaseModel):
+    format: str  # "xywh-u16-b64"
+    count: int
+    boxes: str
+
+class ViolationReportOut(BaseModel):
+    id: Optional[str] = None
+    image_url: Optional[str] = None
+    extracted_text: Optional[str] = None
+    is_compliant: Optional[bool] = None
+    status: Optional[str] = None
+    violations_found: Optional[List[str]] = []  # NULL for reports stored without an analysis result
+    violation_count: int = 0
+    ocr_confidence: Optional[float] = None
+    severity_level: Optional[str] = None
+    severity_score: Optional[float] = None
+    text_regions: Optional[Union[List[TextRegion], CompactTextRegions]] = None
+    latitude: Optional[float] = None
+    longitude: Optional[float] = None
+    city: Optional[str] = None
+    zone: Optional[str] = None
+    billboard_entity_id: Optional[str] = None
+    created_at: Optional[str] = None
+
+    class Config:
+        extra = "allow"
+
+class ReportListResponse(BaseModel):
+    success: bool
+    count: int
+    message: str
+    data: List[ViolationReportOut]
+
+class CitizenReportOut(BaseModel):
+    id: Optional[str] = None
+    billboard_id: Optional[str] = None
+    latitude: Optional[float] = None
+    longitude: Optional[float] = None
+    description: Optional[str] = None
+    reporter_name: Optional[str] = None
+    status: Optional[str] = None
+    validated_by_count: int = 0
+    submitted_at: Optional[str] = None
+
+    class Config:
+        extra = "allow"
+
+class CitizenReportListResponse(BaseModel):
+    success: bool
+    count: int
+    message: str
+    reports: List[CitizenReportOut]
+
+class NearbyBillboardsResponse(BaseModel):
+    success: bool
+    query_location: dict
+    radius_km: float
+    count: int
+    message: str
+    billboards: List[dict]
+
+class AnalysisOut(BaseModel):
+    is_compliant: Optional[bool] = None
+    status: Optional[str] = None
+    violations_found: Optional[List[str]] = []  # NULL for reports stored without an analysis result
+    violation_count: int = 0
+    ocr_confidence: Optional[float] = None
+    severity_level: Optional[str] = None
+    severity_score: Optional[float] = None
+    text_regions: Optional[Union[List[TextRegion], CompactTextRegions]] = None
+    extracted_text: Optional[str] = None
+
+class AnalyzeResponse(BaseModel):
+    success: bool
+    report_id: Optional[str] = None
+    billboard_id: Optional[str] = None
+    image_url: Optional[str] = None
+    analysis: AnalysisOut
+    message: str
+
+class SearchHit(BaseModel):
+    id: str
+    image_url: Optional[str] = None
+    snippet: str
+    status: Optional[str] = None
+    severity_level: Optional[str] = None
+    severity_score: Optional[float] = None
+    violations_found: Optional[List[str]] = []  # NULL for reports stored without an analysis result
+    latitude: Optional[float] = None
+    longitude: Optional[float] = None
+    city: Optional[str] = None
+    zone: Optional[str] = None
+    billboard_entity_id: Optional[str] = None
+    created_at: Optional[str] = None
+
+class SearchResponse(BaseModel):
+    success: bool
+    query: str
+    mode: str
+    count: int
+    next_cursor: Optional[str] = None
+    results: List[SearchHit]
+
 # ============ FastAPI Setup =============
 app = FastAPI(
     title=API_TITLE,
     version=API_VERSION,
     description=API_DESCRIPTION,
     docs_url="/api/docs",
-    openapi_url="/api/openapi.json"
+    openapi_url="/api/openapi.json",
+    lifespan=lifespan
 )
 
+# Compress JSON responses (brotli or gzip) for clients that accept it
+if COMPRESSION_ENABLED:
+    app.add_middleware(CompressionMiddleware)
+
 # Enable CORS
 app.add_middleware(
     CORSMiddleware,
@@ -49,15 +275,39 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+@app.middleware("http")
+async def trace_requests(request: Request, call_next):
+    """Open a (sampled) trace per request so detector and DB stages are attributed to it"""
+    name = f"{request.method} {request.url.path}"
+    if not profiling.should_profile(request.url.path, request.headers):
+        with metrics.trace(name):
+            with metrics.span("api", "request"):
+                return await call_next(request)
+
+    # Profiled requests are always traced, so their stage timings are stored with the profile
+    with metrics.trace(name, force=True) as trace, profiling.ProfileSession(name) as session:
+        with metrics.span("api", "request"):
+            response = await call_next(request)
+    await asyncio.to_thread(profiling.profile_store.save, session, trace, response.status_code)
+    if profiling.is_admin(request.headers.get("x-admin-token")):  # Sampled public requests don't learn profile ids
+        response.headers["X-Profile-Id"] = session.id
+    return response
+
 # ============ HEALTH & INFO =============
 @app.get("/api/health")
 async def health_check():
     """Health check endpoint"""
-    return {
+    if "first_healthy_response" not in startup.phases:
+        startup.mark("first_healthy_response")
+        startup.log_report()
+    response = {
         "status": "healthy",
         "service": "Smart Billboard Compliance System",
         "version": API_VERSION
     }
+    if STARTUP_PROFILE:
+        response["startup"] = startup.report()
+    return response
 
 @app.get("/api/info")
 async def api_info():
@@ -76,18 +326,33 @@ async def api_info():
         ]
     }
 
+@app.get("/metrics")
+async def prometheus_metrics():
+    """Prometheus scrape endpoint (text exposition format)"""
+    return Response(content=metrics.registry.render(), media_type=metrics.PROMETHEUS_CONTENT_TYPE)
+
+@app.get("/api/scheduler/stats")
+async def scheduler_stats():
+    """Analysis queue depth, concurrency and recent wait times per priority class (this worker)"""
+    return {"success": True, "data": get_scheduler().stats()}
+
 # ============ IMAGE ANALYSIS =============
-@app.post("/api/analyze")
-async def analyze_image(file: UploadFile = File(...), latitude: Optional[float] = None, longitude: Optional[float] = None):
+@app.post("/api/analyze", response_model=None, responses={200: {"model": AnalyzeResponse}})
+async def analyze_image(request: Request, file: UploadFile = File(...), latitude: Optional[float] = None, longitude: Optional[float] = None,
+                        city: Optional[str] = None, zone: Optional[str] = None):
     """
     Analyze billboard image for violations using advanced computer vision
     
+    Bulk uploaders should send `X-Priority: bulk` (or `citizen`); callers with a
+    configured `X-API-Key` are fair-shared by key, everyone else by address.
+    
     Features:
     - Text extraction via OCR with confidence scoring
     - Violation keyword detection
     - Severity level assessment
     - Text region localization
     - Geolocation tracking (optional)
+    - City / zoning zone tagging for trend statistics (optional)
     """
     if not file.content_type.startswith("image/"):
         raise HTTPException(status_code=400, detail="File must be an image")
@@ -97,13 +362,24 @@ async def analyze_image(file: UploadFile = File(...), latitude: Optional[float]
         image_data = await file.read()
         if len(image_data) == 0:
             raise HTTPException(status_code=400, detail="Empty file")
+        profiling.annotate_image(image_data)
         
         # Advanced computer vision analysis
-        analysis_result = detector.analyze_image(image_data)
+        metrics.QUEUE_DEPTH.inc(queue="analyze")
+        try:
+            analysis_result = await run_analysis(image_data, request.headers.get("x-priority"), request_source(request))
+        except SchedulerRejected as e:
+            if e.reason == "queue_full":
+                raise HTTPException(status_code=429, detail="Analysis queue is full, retry later")
+            raise HTTPException(status_code=503, detail="Analysis queue deadline exceeded", headers={"Retry-After": "30"})
+        finally:
+            metrics.QUEUE_DEPTH.dec(queue="analyze")
         
         if not analysis_result.get("analysis_complete"):
             raise HTTPException(status_code=500, detail="Image analysis failed")
         
+        text_regions = encode_regions(analysis_result.get("text_regions", []))
+        
         # Upload image to storage
         filename = f"billboards/{uuid.uuid4()}_{file.filename}"
         await db.upload_image(image_data, filename)
@@ -122,12 +398,17 @@ async def analyze_image(file: UploadFile = File(...), latitude: Optional[float]
             "ocr_confidence": analysis_result.get("ocr_confidence", 0.0),
             "severity_level": analysis_result.get("severity_level", "none"),
             "severity_score": analysis_result.get("severity_score", 0),
-            "text_regions": analysis_result.get("text_regions", []),
+            "text_regions": text_regions,
+            "ocr_tokens": analysis_result.get("ocr_tokens"),
             "detection_timestamp": analysis_result.get("detection_timestamp")
         }
+        if city:
+            report_data["city"] = city
+        if zone:
+            report_data["zone"] = zone
         
         # Add geolocation if provided
-        if latitude and longitude:
+        if latitude is not None and longitude is not None:
             report_data["latitude"] = latitude
             report_data["longitude"] = longitude
             
@@ -136,12 +417,25 @@ async def analyze_image(file: UploadFile = File(...), latitude: Optional[float]
             zoning_check = await db.check_zoning_compliance(location, report_data["violations_found"])
             report_data["zoning_compliance"] = zoning_check
         
+            # Resolve the physical billboard this photo belongs to
+            report_data["billboard_entity_id"] = await clusterer.assign(report_data)
+        
         # Store report
-        stored_report = await db.create_violation_report(report_data)
+        stored_report = None
+        try:
+            stored_report = await db.create_violation_report(report_data)
+        finally:
+            if not stored_report and report_data.get("billboard_entity_id"):
+                # The sighting was counted on the billboard but the report does not exist
+                await clusterer.release(report_data["billboard_entity_id"], report_data)
+        if stored_report:
+            await tile_service.add_report(stored_report)
+            await rollup_service.add_report(stored_report)
         
-        return {
+        return FastJSONResponse({
             "success": True,
             "report_id": stored_report.get("id") if stored_report else None,
+            "billboard_id": report_data.get("billboard_entity_id") if stored_report else None,
             "image_url": image_url,
             "analysis": {
                 "is_compliant": analysis_result.get("is_compliant"),
@@ -151,28 +445,30 @@ async def analyze_image(file: UploadFile = File(...), latitude: Optional[float]
                 "ocr_confidence": analysis_result.get("ocr_confidence"),
                 "severity_level": analysis_result.get("severity_level"),
                 "severity_score": analysis_result.get("severity_score"),
-                "text_regions": analysis_result.get("text_regions"),
+                "text_regions": text_regions,
                 "extracted_text": analysis_result.get("extracted_text")[:500] + "..." if len(analysis_result.get("extracted_text", "")) > 500 else analysis_result.get("extracted_text")
             },
             "message": f"{'Violation detected!' if not analysis_result.get('is_compliant') else 'No violations found.'}"
-        }
+        })
     
+    except HTTPException:
+        raise
     except Exception as e:
         print(f"Error analyzing image: {e}")
         raise HTTPException(status_code=500, detail=f"Analysis error: {str(e)}")
 
 # ============ REPORTS MANAGEMENT =============
-@app.get("/api/reports")
+@app.get("/api/reports", response_model=None, responses={200: {"model": ReportListResponse}})
 async def get_reports(limit: int = Query(50, le=100), offset: int = Query(0)):
     """Get all violation reports with pagination"""
     try:
         reports = await db.get_violation_reports(limit, offset)
-        return {
-            "success": True,
-            "data": reports,
-            "count": len(reports),
-            "message": f"Retrieved {len(reports)} reports"
-        }
+        return list_response(
+            "data", reports,
+            success=True,
+            count=len(reports),
+            message=f"Retrieved {len(reports)} reports",
+        )
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -199,9 +495,13 @@ async def update_report_status(report_id: str, status_update: ReportStatusUpdate
         if status_update.status not in valid_statuses:
             raise HTTPException(status_code=400, detail=f"Invalid status. Must be one of: {valid_statuses}")
         
-        updated = await db.update_report_status(report_id, status_update.status)
-        if not updated:
+        # The previous status comes from the same transaction as the write, so two concurrent
+        # changes move the rollups pending -> approved -> resolved instead of both from pending
+        changed = await db.update_report_status(report_id, status_update.status)
+        if not changed:
             raise HTTPException(status_code=404, detail="Report not found")
+        previous_status, updated = changed
+        await rollup_service.update_report({**updated, "status": previous_status}, updated)
         
         return {
             "success": True,
@@ -209,6 +509,97 @@ async def update_report_status(report_id: str, status_update: ReportStatusUpdate
             "new_status": status_update.status,
             "message": "Report status updated"
         }
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+# ============ SEARCH =============
+def parse_bbox(bbox: Optional[str]) -> Optional[tuple]:
+    """"min_lat,min_lon,max_lat,max_lon" -> tuple of floats"""
+    if not bbox:
+        return None
+    try:
+        min_lat, min_lon, max_lat, max_lon = (float(part) for part in bbox.split(","))
+    except ValueError:
+        raise HTTPException(status_code=400, detail="bbox must be min_lat,min_lon,max_lat,max_lon")
+    if min_lat > max_lat or min_lon > max_lon:
+        raise HTTPException(status_code=400, detail="bbox minimums must not exceed maximums")
+    return min_lat, min_lon, max_lat, max_lon
+
+@app.get("/api/search", response_model=None, responses={200: {"model": SearchResponse}})
+async def search_reports(
+    q: str = Query(..., min_length=1, max_length=200, description="Words, a phone number, a brand..."),
+    mode: str = Query("words", description="words (all terms as words) or substring (anywhere in the OCR text)"),
+    status: Optional[str] = None,
+    severity: Optional[str] = Query(None, description="Critical, High, Medium, Low or none"),
+    bbox: Optional[str] = Query(None, description="min_lat,min_lon,max_lat,max_lon"),
+    cursor: Optional[str] = Query(None, description="next_cursor of the previous page"),
+    limit: int = Query(20, ge=1, le=100)
+):
+    """
+    Search the OCR text of violation reports, newest first
+    Filter by status, severity and bounding box; page with `cursor`
+    """
+    try:
+        terms = parse_query(q, mode)
+        after = decode_cursor(cursor)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    box = parse_bbox(bbox)
+    try:
+        rows = await db.search_reports(terms, mode, status, severity, box, after, limit + 1)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+    page = rows[:limit]
+    results = []
+    for row in page:
+        hit = {column: row.get(column) for column in SEARCH_COLUMNS if column != "extracted_text"}
+        hit["snippet"] = snippet(row.get("extracted_text"), terms)
+        results.append(hit)
+    return FastJSONResponse({
+        "success": True,
+        "query": q,
+        "mode": mode,
+        "count": len(results),
+        "next_cursor": encode_cursor(page[-1]) if len(rows) > limit else None,
+        "results": results,
+    })
+
+# ============ BILLBOARD ENTITIES =============
+@app.get("/api/billboards")
+async def get_billboards(limit: int = Query(50, le=100), offset: int = Query(0)):
+    """
+    Get physical billboards (clustered from violation reports by location and text)
+    Most recently sighted first
+    """
+    try:
+        billboards = await db.get_billboards(limit, offset)
+        return {
+            "success": True,
+            "data": billboards,
+            "count": len(billboards),
+            "message": f"Retrieved {len(billboards)} billboards"
+        }
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.get("/api/billboards/{billboard_id}")
+async def get_billboard_history(billboard_id: str, limit: int = Query(50, le=100), offset: int = Query(0)):
+    """Get a physical billboard with its history of violation reports (newest first)"""
+    billboard = await db.get_billboard(billboard_id)
+    if not billboard:
+        raise HTTPException(status_code=404, detail="Billboard not found")
+    try:
+        history = await db.get_billboard_reports(billboard_id, limit, offset)
+        return {
+            "success": True,
+            "data": billboard,
+            "history": history,
+            "count": len(history),
+            "message": f"Retrieved {len(history)} reports for billboard"
+        }
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -243,7 +634,7 @@ async def save_billboard_location(location: GeolocationData, report_id: Optional
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
-@app.get("/api/geolocation/nearby")
+@app.get("/api/geolocation/nearby", response_model=None, responses={200: {"model": NearbyBillboardsResponse}})
 async def get_nearby_billboards(
     latitude: float = Query(...),
     longitude: float = Query(...),
@@ -255,18 +646,50 @@ async def get_nearby_billboards(
     """
     try:
         billboards = await db.get_nearby_billboards(latitude, longitude, radius_km)
-        return {
-            "success": True,
-            "query_location": {"latitude": latitude, "longitude": longitude},
-            "radius_km": radius_km,
-            "count": len(billboards),
-            "billboards": billboards,
-            "message": f"Found {len(billboards)} billboards within {radius_km}km"
-        }
+        return list_response(
+            "billboards", billboards,
+            success=True,
+            query_location={"latitude": latitude, "longitude": longitude},
+            radius_km=radius_km,
+            count=len(billboards),
+            message=f"Found {len(billboards)} billboards within {radius_km}km",
+        )
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.get("/api/tiles/{z}/{x}/{y}")
+async def get_violation_tile(z: int, x: int, y: int, request: Request):
+    """
+    Aggregated violation counts and severity for one map tile (Web Mercator z/x/y)
+    Served from pre-aggregated bins, with ETag revalidation for map clients
+    """
+    if not 0 <= z <= TILE_MAX_ZOOM:
+        raise HTTPException(status_code=400, detail=f"Zoom must be between 0 and {TILE_MAX_ZOOM}")
+    if not (0 <= x < (1 << z) and 0 <= y < (1 << z)):
+        raise HTTPException(status_code=400, detail="Tile coordinates out of range for zoom level")
+    try:
+        cache_headers = {"Cache-Control": f"public, max-age={TILE_CACHE_SECONDS}"}
+        if_none_match = request.headers.get("if-none-match")
+        if if_none_match:
+            etag = await tile_service.current_etag(z, x, y)
+            if etag in [tag.strip() for tag in if_none_match.split(",")]:
+                return Response(status_code=304, headers={"ETag": etag, **cache_headers})
+        etag, payload = await tile_service.get_tile(z, x, y)
+        return JSONResponse(content={"success": True, "tile": payload}, headers={"ETag": etag, **cache_headers})
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 # ============ CITIZEN ENGAGEMENT =============
+async def linked_violation_reports(billboard_id: Optional[str]) -> List[dict]:
+    """Violation reports a citizen report's billboard_id refers to (a single report or a billboard entity's reports)"""
+    if not billboard_id:
+        return []
+    reports = await db.get_billboard_reports(billboard_id, limit=1000)
+    if not reports:
+        report = await db.get_report_by_id(billboard_id)
+        reports = [report] if report else []
+    return reports
+
 @app.post("/api/citizen-reports")
 async def submit_citizen_report(citizen_report: CitizenReportCreate):
     """
@@ -288,7 +711,11 @@ async def submit_citizen_report(citizen_report: CitizenReportCreate):
             "status": "submitted"
         }
         
+        # Enough citizen reports flag the linked violation reports; rollups follow their status change
+        linked = await linked_violation_reports(citizen_report.billboard_id)
         submitted_report = await db.submit_citizen_report(report_data)
+        if linked:
+            await rollup_service.update_reports(linked, await linked_violation_reports(citizen_report.billboard_id))
         
         return {
             "success": True,
@@ -300,7 +727,7 @@ async def submit_citizen_report(citizen_report: CitizenReportCreate):
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
-@app.get("/api/citizen-reports")
+@app.get("/api/citizen-reports", response_model=None, responses={200: {"model": CitizenReportListResponse}})
 async def get_citizen_reports(billboard_id: Optional[str] = None, limit: int = Query(50, le=100)):
     """
     Get citizen violation reports (optionally filtered by billboard)
@@ -308,12 +735,12 @@ async def get_citizen_reports(billboard_id: Optional[str] = None, limit: int = Q
     """
     try:
         reports = await db.get_citizen_reports(billboard_id, limit)
-        return {
-            "success": True,
-            "count": len(reports),
-            "reports": reports,
-            "message": f"Retrieved {len(reports)} citizen reports"
-        }
+        return list_response(
+            "reports", reports,
+            success=True,
+            count=len(reports),
+            message=f"Retrieved {len(reports)} citizen reports",
+        )
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -394,6 +821,86 @@ async def get_statistics():
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+@app.get("/api/statistics/timeseries")
+async def get_statistics_timeseries(
+    granularity: str = Query("day", description="hour or day"),
+    group_by: str = Query("all", description="all, city, zone, severity, keyword or status"),
+    value: Optional[str] = Query(None, description="Only this value of the group_by dimension"),
+    start: Optional[datetime] = Query(None, description="Range start (UTC); default 30 days / 48 hours ago"),
+    end: Optional[datetime] = Query(None, description="Range end, exclusive (UTC); default now")
+):
+    """
+    Violation trends from the hourly/daily rollups
+    One zero-filled array per series value, aligned with `buckets`
+    """
+    end = parse_timestamp(end) if end else datetime.utcnow()
+    start = parse_timestamp(start) if start else end - (timedelta(hours=48) if granularity == "hour" else timedelta(days=30))
+    if start >= end:
+        raise HTTPException(status_code=400, detail="start must be before end")
+    try:
+        result = await rollup_service.timeseries(granularity, group_by, start, end, value)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+    return FastJSONResponse({
+        "success": True,
+        "granularity": granularity,
+        "group_by": group_by,
+        "start": start.isoformat(),
+        "end": end.isoformat(),
+        **result,
+        "message": f"Retrieved {len(result['series'])} series over {len(result['buckets'])} buckets"
+    })
+
+# ============ PROFILING (ADMIN) =============
+def require_admin(request: Request):
+    """404 while admin endpoints are disabled (no ADMIN_TOKEN), 401 without a valid X-Admin-Token"""
+    if not profiling.ADMIN_TOKEN:
+        raise HTTPException(status_code=404, detail="Not found")
+    if not profiling.is_admin(request.headers.get("x-admin-token")):
+        raise HTTPException(status_code=401, detail="Invalid admin token")
+
+@app.get("/api/admin/profiles")
+async def list_profiles(request: Request, limit: int = Query(50, le=200)):
+    """Stored analyze profiles, newest first"""
+    require_admin(request)
+    profiles = await asyncio.to_thread(profiling.profile_store.list, limit)
+    return {"success": True, "sample_rate": profiling.get_sample_rate(), "data": profiles, "count": len(profiles)}
+
+@app.get("/api/admin/profiles/{profile_id}")
+async def get_profile(request: Request, profile_id: str):
+    """Metadata of one profile: image hash, per-stage timings and top functions"""
+    require_admin(request)
+    profile = await asyncio.to_thread(profiling.profile_store.get, profile_id)
+    if not profile:
+        raise HTTPException(status_code=404, detail="Profile not found")
+    return {"success": True, "data": profile}
+
+@app.get("/api/admin/profiles/{profile_id}/download")
+async def download_profile(request: Request, profile_id: str,
+                           format: str = Query("folded", description="folded (collapsed stacks) or pstats (cProfile dump)")):
+    """
+    Profile file for offline analysis
+    - folded: flamegraph.pl / speedscope / inferno input
+    - pstats: python -m pstats, snakeviz
+    """
+    require_admin(request)
+    if format not in ("folded", "pstats"):
+        raise HTTPException(status_code=400, detail="format must be folded or pstats")
+    path = profiling.profile_store.path(profile_id, format)
+    if not path:
+        raise HTTPException(status_code=404, detail="Profile not found")
+    return FileResponse(path, media_type="text/plain" if format == "folded" else "application/octet-stream",
+                        filename=f"{profile_id}.{'folded' if format == 'folded' else 'prof'}")
+
+@app.put("/api/admin/profiling")
+async def set_profiling(request: Request, sample_rate: float = Query(..., ge=0.0, le=1.0)):
+    """Change the fraction of /api/analyze requests profiled (this worker, until restart)"""
+    require_admin(request)
+    profiling.set_sample_rate(sample_rate)
+    return {"success": True, "sample_rate": profiling.get_sample_rate()}
+
 # ============ ERROR HANDLING =============
 @app.exception_handler(HTTPException)
 async def http_exception_handler(request, exc):
@@ -0,0 +1,334 @@
+import bisect
+import functools
+import inspect
+import json
+import logging
+import random
+import threading
+import time
+from contextvars import ContextVar
+from typing import Dict, List, Optional, Sequence, Tuple
+from config import METRICS_ENABLED, METRICS_SAMPLE_RATE, METRICS_LOG_TRACES
+
+logger = logging.getLogger("billboard.metrics")
+
+# Default latency buckets (seconds) - covers sub-millisecond keyword matching up to multi-second OCR
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+def _format_labels(labelnames: Sequence[str], values: Tuple, extra: Optional[Tuple[str, str]] = None) -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(labelnames, values)]
+    if extra:
+        pairs.append(f'{extra[0]}="{extra[1]}"')
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+# ============= METRIC TYPES =============
+class _Metric:
+    metric_type = "untyped"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+        self._values: Dict[Tuple, object] = {}
+
+    def _key(self, labels: Dict) -> Tuple:
+        return tuple(str(labels.get(name, "")) for name in self.labelnames)
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.metric_type}"]
+        with self._lock:
+            items = list(self._values.items())
+        for key, value in items:
+            lines.extend(self._render_sample(key, value))
+        return lines
+
+    def _render_sample(self, key: Tuple, value) -> List[str]:
+        return [f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}"]
+
+
+class Counter(_Metric):
+    """Monotonically increasing counter"""
+    metric_type = "counter"
+
+    def inc(self, amount: float = 1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels) -> float:
+        return self._values.get(self._key(labels), 0)
+
+
+class Gauge(_Metric):
+    """Value that can go up and down (queue depth, in-flight work)"""
+    metric_type = "gauge"
+
+    def set(self, value: float, **labels):
+        with self._lock:
+            self._values[self._key(labels)] = value
+
+    def inc(self, amount: float = 1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def dec(self, amount: float = 1, **labels):
+        self.inc(-amount, **labels)
+
+    def value(self, **labels) -> float:
+        return self._values.get(self._key(labels), 0)
+
+
+class Histogram(_Metric):
+    """Cumulative bucketed distribution with sum and count"""
+    metric_type = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (), buckets: Sequence[float] = DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value: float, **labels):
+        key = self._key(labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                # [per-bucket counts..., +Inf count, sum]
+                state = self._values[key] = [0] * (len(self.buckets) + 1) + [0.0]
+            state[index] += 1
+            state[-1] += value
+
+    def _render_sample(self, key: Tuple, state) -> List[str]:
+        lines = []
+        cumulative = 0
+        for bound, count in zip(self.buckets + (float("inf"),), state[:-1]):
+            cumulative += count
+            labels = _format_labels(self.labelnames, key, ("le", _format_value(bound)))
+            lines.append(f"{self.name}_bucket{labels} {cumulative}")
+        labels = _format_labels(self.labelnames, key)
+        lines.append(f"{self.name}_sum{labels} {_format_value(state[-1])}")
+        lines.append(f"{self.name}_count{labels} {cumulative}")
+        return lines
+
+
+class MetricsRegistry:
+    """Holds all process metrics and renders them in Prometheus text format"""
+
+    def __init__(self):
+        self._metrics: Dict[str, _Metric] = {}
+
+    def _register(self, metric: _Metric) -> _Metric:
+        return self._metrics.setdefault(metric.name, metric)
+
+    def counter(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Counter:
+        return self._register(Counter(name, documentation, labelnames))
+
+    def gauge(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Gauge:
+        return self._register(Gauge(name, documentation, labelnames))
+
+    def histogram(self, name: str, documentation: str, labelnames: Sequence[str] = (), buckets: Sequence[float] = DEFAULT_BUCKETS) -> Histogram:
+        return self._register(Histogram(name, documentation, labelnames, buckets))
+
+    def render(self) -> str:
+        lines = []
+        for metric in self._metrics.values():
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+registry = MetricsRegistry()
+PROMETHEUS_CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# ============= APPLICATION METRICS =============
+STAGE_SECONDS = registry.histogram(
+    "billboard_stage_duration_seconds",
+    "Duration of sampled pipeline stages",
+    ["component", "stage"],
+)
+IMAGES_PROCESSED = registry.counter(
+    "billboard_images_processed_total",
+    "Images run through the violation detector",
+    ["result"],
+)
+OCR_CONFIDENCE = registry.histogram(
+    "billboard_ocr_confidence",
+    "Average OCR confidence per analyzed image",
+    buckets=(0.1, 0.2, 0.3, 0.4, 0.5, 0.6, 0.7, 0.8, 0.9, 1.0),
+)
+CACHE_REQUESTS = registry.counter(
+    "billboard_cache_requests_total",
+    "Cache lookups by cache name and outcome (hit, miss)",
+    ["cache", "result"],
+)
+QUEUE_DEPTH = registry.gauge(
+    "billboard_queue_depth",
+    "Work items waiting or running per queue",
+    ["queue"],
+)
+DB_ERRORS = registry.counter(
+    "billboard_db_errors_total",
+    "Storage operations that failed",
+    ["operation"],
+)
+SCHEDULER_WAIT_SECONDS = registry.histogram(
+    "billboard_scheduler_wait_seconds",
+    "Time analysis jobs spent queued before starting, per priority class",
+    ["priority"],
+)
+SCHEDULER_JOBS = registry.gauge(
+    "billboard_scheduler_jobs",
+    "Analysis jobs per priority class and state (queued, running)",
+    ["priority", "state"],
+)
+SCHEDULER_REJECTED = registry.counter(
+    "billboard_scheduler_rejected_total",
+    "Analysis jobs not run, per priority class and reason (deadline, queue_full)",
+    ["priority", "reason"],
+)
+
+# ============= TRACING & SAMPLING =============
+_sample_rate = METRICS_SAMPLE_RATE
+# None = no trace active, False = active but not sampled, Trace = sampled
+_current_trace: ContextVar = ContextVar("billboard_trace", default=None)
+
+
+class Trace:
+    """Per-request collection of stage timings for a sampled request"""
+
+    def __init__(self, name: str):
+        self.name = name
+        self.started = time.perf_counter()
+        self.stages: List[Tuple[str, str, float]] = []
+
+    def stage_timings(self) -> Dict[str, float]:
+        """Total seconds per component.stage"""
+        totals: Dict[str, float] = {}
+        for component, stage, seconds in self.stages:
+            key = f"{component}.{stage}"
+            totals[key] = totals.get(key, 0.0) + seconds
+        return totals
+
+    def to_dict(self) -> Dict:
+        return {
+            "trace": self.name,
+            "duration_ms": round((time.perf_counter() - self.started) * 1000, 3),
+            "stages_ms": {k: round(v * 1000, 3) for k, v in self.stage_timings().items()},
+        }
+
+
+class _NoopContext:
+    __slots__ = ()
+
+    def __enter__(self):
+        return None
+
+    def __exit__(self, *exc):
+        return False
+
+
+_NOOP = _NoopContext()
+
+
+class _TraceContext:
+    __slots__ = ("trace", "_token")
+
+    def __init__(self, trace):
+        self.trace = trace
+        self._token = None
+
+    def __enter__(self):
+        self._token = _current_trace.set(self.trace)
+        return self.trace or None
+
+    def __exit__(self, *exc):
+        _current_trace.reset(self._token)
+        if self.trace and METRICS_LOG_TRACES:
+            logger.info(json.dumps(self.trace.to_dict()))
+        return False
+
+
+class _Span:
+    __slots__ = ("trace", "component", "stage", "_start")
+
+    def __init__(self, trace: Trace, component: str, stage: str):
+        self.trace = trace
+        self.component = component
+        self.stage = stage
+
+    def __enter__(self):
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        elapsed = time.perf_counter() - self._start
+        self.trace.stages.append((self.component, self.stage, elapsed))
+        STAGE_SECONDS.observe(elapsed, component=self.component, stage=self.stage)
+        return False
+
+
+def set_sample_rate(rate: float):
+    """Change the fraction of traces that record stage timings (0 disables)"""
+    global _sample_rate
+    _sample_rate = max(0.0, min(1.0, rate))
+
+
+def get_sample_rate() -> float:
+    return _sample_rate
+
+
+def trace(name: str, force: bool = False):
+    """Start a trace at a request/job entry point; nested calls join the active trace"""
+    if _current_trace.get() is not None:
+        return _NOOP
+    if force:
+        return _TraceContext(Trace(name))
+    if not METRICS_ENABLED or _sample_rate <= 0.0:
+        return _TraceContext(False)
+    sampled = _sample_rate >= 1.0 or random.random() < _sample_rate
+    return _TraceContext(Trace(name) if sampled else False)
+
+
+def current_trace() -> Optional[Trace]:
+    return _current_trace.get() or None
+
+
+def span(component: str, stage: str):
+    """Time a stage of the active trace; a shared no-op when the trace is not sampled"""
+    active = _current_trace.get()
+    if not active:
+        return _NOOP
+    return _Span(active, component, stage)
+
+
+def timed(component: str, stage: Optional[str] = None):
+    """Decorator: run the function inside a trace and record it as a stage"""
+    def decorator(fn):
+        stage_name = stage or fn.__name__
+        trace_name = f"{component}.{stage_name}"
+
+        if inspect.iscoroutinefunction(fn):
+            @functools.wraps(fn)
+            async def async_wrapper(*args, **kwargs):
+                with trace(trace_name), span(component, stage_name):
+                    return await fn(*args, **kwargs)
+            return async_wrapper
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            with trace(trace_name), span(component, stage_name):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorator
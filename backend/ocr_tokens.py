@@ -0,0 +1,46 @@
+"""
+Compact storage of per-report OCR tokens.
+
+Every word Tesseract returned is kept (not only those above the confidence
+threshold) with its confidence and box, so reports can be re-scored under new
+rules without re-running OCR. Stored form:
+
+    {"format": "ocr-v1", "words": "w1 w2 ...", "conf": <base64 uint8>, "boxes": <base64 uint16 x,y,w,h>}
+"""
+import base64
+from typing import Dict, List, Optional, Tuple
+from text_regions import pack_u16, unpack_u16
+
+TOKENS_FORMAT = "ocr-v1"
+Token = Tuple[str, int, int, int, int, int]  # word, confidence (0-100), x, y, width, height
+
+
+def pack_tokens(tokens: List[Token]) -> Dict:
+    words, confidences, boxes = [], bytearray(), []
+    for word, confidence, x, y, w, h in tokens:
+        word = "".join(word.split())  # Space separates words in the stored form
+        if not word:
+            continue
+        words.append(word)
+        confidences.append(min(max(int(confidence), 0), 100))
+        boxes.extend((x, y, w, h))
+    return {
+        "format": TOKENS_FORMAT,
+        "words": " ".join(words),
+        "conf": base64.b64encode(bytes(confidences)).decode("ascii"),
+        "boxes": pack_u16(boxes),
+    }
+
+
+def unpack_tokens(value: Optional[Dict]) -> List[Token]:
+    if not value:
+        return []
+    if value.get("format") != TOKENS_FORMAT:
+        raise ValueError(f"Unknown OCR token format: {value.get('format')}")
+    words = value["words"].split(" ") if value["words"] else []
+    confidences = base64.b64decode(value["conf"])
+    boxes = unpack_u16(value["boxes"])
+    return [
+        (word, confidences[i], boxes[4 * i], boxes[4 * i + 1], boxes[4 * i + 2], boxes[4 * i + 3])
+        for i, word in enumerate(words)
+    ]
@@ -0,0 +1,280 @@
+"""
+On-demand profiling of /api/analyze requests (admin only).
+
+A request is profiled when ADMIN_TOKEN is configured and either it carries
+`X-Profile: 1` with a valid `X-Admin-Token`, or it falls in the sampled fraction
+PROFILE_SAMPLE_RATE. A profiled request records:
+- cProfile of the analysis (worker thread) -> profile.prof (pstats / snakeviz)
+- stack samples of the analysis thread and of the event loop thread, where the
+  storage calls run -> stacks.folded (collapsed stacks for flamegraph.pl / speedscope).
+  Event loop samples can include other requests served concurrently.
+- per-stage timings of the request trace and the input image's sha256 -> meta.json
+
+Unprofiled requests only pay for a context variable lookup.
+"""
+import cProfile
+import hashlib
+import hmac
+import io
+import json
+import os
+import pstats
+import random
+import re
+import shutil
+import sys
+import threading
+import time
+import uuid
+from collections import Counter
+from contextvars import ContextVar
+from datetime import datetime
+from typing import Dict, List, Optional
+from config import ADMIN_TOKEN, PROFILE_SAMPLE_RATE, PROFILE_DIR, PROFILE_MAX_STORED, PROFILE_SAMPLE_INTERVAL_MS
+
+PROFILED_PATHS = ("/api/analyze",)
+PROFILE_FILES = {"folded": "stacks.folded", "pstats": "profile.prof", "meta": "meta.json"}
+_PROFILE_ID = re.compile(r"^\d{8}T\d{6}-[0-9a-f]{8}$")
+_IDLE_FUNCTIONS = {"select", "poll", "epoll", "_worker", "wait"}  # Leaf frames of a thread waiting for work
+
+_sample_rate = PROFILE_SAMPLE_RATE
+_current_session: ContextVar = ContextVar("billboard_profile", default=None)
+
+
+def is_admin(token: Optional[str]) -> bool:
+    return bool(ADMIN_TOKEN) and token is not None and hmac.compare_digest(token, ADMIN_TOKEN)
+
+
+def set_sample_rate(rate: float):
+    """Change the fraction of analyze requests profiled (this process only)"""
+    global _sample_rate
+    _sample_rate = max(0.0, min(1.0, rate))
+
+
+def get_sample_rate() -> float:
+    return _sample_rate
+
+
+def should_profile(path: str, headers) -> bool:
+    """Whether to profile a request (cheap when profiling is off)"""
+    if not ADMIN_TOKEN or path not in PROFILED_PATHS:
+        return False
+    if headers.get("x-profile") and is_admin(headers.get("x-admin-token")):
+        return True
+    return _sample_rate > 0.0 and random.random() < _sample_rate
+
+
+# ============= STACK SAMPLER =============
+def _collapse(frame) -> Optional[str]:
+    names = []
+    while frame is not None:
+        code = frame.f_code
+        names.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+        frame = frame.f_back
+    if not names or names[0].split(" ", 1)[0] in _IDLE_FUNCTIONS:
+        return None
+    return ";".join(reversed(names))
+
+
+class StackSampler:
+    """Samples the stacks of watched threads at a fixed interval into collapsed-stack counts"""
+
+    def __init__(self, interval: float = PROFILE_SAMPLE_INTERVAL_MS / 1000.0):
+        self.interval = interval
+        self.stacks: Counter = Counter()
+        self.samples = 0
+        self._watched: Dict[int, str] = {}
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="profile-sampler", daemon=True)
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+    def watch(self, thread_id: int, role: str):
+        self._watched[thread_id] = role
+
+    def unwatch(self, thread_id: int):
+        self._watched.pop(thread_id, None)
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frames = sys._current_frames()
+            self.samples += 1
+            for thread_id, role in list(self._watched.items()):
+                frame = frames.get(thread_id)
+                stack = _collapse(frame) if frame is not None else None
+                if stack:
+                    self.stacks[f"{role};{stack}"] += 1
+            del frames
+
+
+# ============= PROFILE SESSION =============
+class _NoopContext:
+    __slots__ = ()
+
+    def __enter__(self):
+        return None
+
+    def __exit__(self, *exc):
+        return False
+
+
+_NOOP = _NoopContext()
+
+
+class ProfileSession:
+    """Everything recorded for one profiled request"""
+
+    def __init__(self, name: str):
+        self.id = datetime.utcnow().strftime("%Y%m%dT%H%M%S") + "-" + uuid.uuid4().hex[:8]
+        self.name = name
+        self.created_at = datetime.utcnow().isoformat()
+        self.started = time.perf_counter()
+        self.sampler = StackSampler()
+        self.profiler: Optional[cProfile.Profile] = None
+        self.info: Dict = {}
+        self._token = None
+
+    def __enter__(self):
+        self._token = _current_session.set(self)
+        self.sampler.watch(threading.get_ident(), "event_loop")
+        self.sampler.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.sampler.stop()
+        _current_session.reset(self._token)
+        return False
+
+    def profile_analysis(self):
+        """Context manager for the analysis in the worker thread: cProfile + stack samples"""
+        return _AnalysisProfile(self)
+
+    def report(self, trace=None, status_code: Optional[int] = None) -> Dict:
+        meta = {
+            "id": self.id,
+            "request": self.name,
+            "created_at": self.created_at,
+            "status_code": status_code,
+            "duration_ms": round((time.perf_counter() - self.started) * 1000, 3),
+            "stages_ms": trace.to_dict()["stages_ms"] if trace else {},
+            "stack_samples": self.sampler.samples,
+            "sample_interval_ms": self.sampler.interval * 1000,
+            "cprofile": self.profiler is not None,
+            **self.info,
+        }
+        if self.profiler is not None:
+            stats = pstats.Stats(self.profiler, stream=io.StringIO()).sort_stats("cumulative")
+            meta["top_functions"] = [
+                {"function": f"{name} ({os.path.basename(filename)}:{line})", "calls": calls, "cumulative_ms": round(cumulative * 1000, 3)}
+                for (filename, line, name), (_, calls, _, cumulative, _) in
+                sorted(stats.stats.items(), key=lambda item: item[1][3], reverse=True)[:15]
+            ]
+        return meta
+
+
+class _AnalysisProfile:
+    __slots__ = ("session", "_enabled")
+
+    def __init__(self, session: ProfileSession):
+        self.session = session
+        self._enabled = False
+
+    def __enter__(self):
+        self.session.sampler.watch(threading.get_ident(), "analysis")
+        profiler = cProfile.Profile()
+        try:
+            profiler.enable()
+            self._enabled = True
+            self.session.profiler = profiler
+        except ValueError:
+            pass  # Another profiler is active in this interpreter; stack samples still apply
+        return self.session
+
+    def __exit__(self, *exc):
+        if self._enabled:
+            self.session.profiler.disable()
+        self.session.sampler.unwatch(threading.get_ident())
+        return False
+
+
+def current_session() -> Optional[ProfileSession]:
+    return _current_session.get()
+
+
+def profile_analysis():
+    """Profile the enclosed analysis when the current request is profiled; a shared no-op otherwise"""
+    session = _current_session.get()
+    return session.profile_analysis() if session is not None else _NOOP
+
+
+def annotate_image(image_data: bytes):
+    """Record the input image's hash and size on the current profile, if any"""
+    session = _current_session.get()
+    if session is not None:
+        session.info["image_sha256"] = hashlib.sha256(image_data).hexdigest()
+        session.info["image_bytes"] = len(image_data)
+
+
+# ============= PROFILE STORE =============
+class ProfileStore:
+    """Profiles on disk, one directory per profile, oldest deleted beyond max_profiles"""
+
+    def __init__(self, root: str = PROFILE_DIR, max_profiles: int = PROFILE_MAX_STORED):
+        self.root = os.path.abspath(root)
+        self.max_profiles = max_profiles
+
+    def save(self, session: ProfileSession, trace=None, status_code: Optional[int] = None) -> Dict:
+        meta = session.report(trace, status_code)
+        tmp = os.path.join(self.root, f".{session.id}.tmp")
+        os.makedirs(tmp, exist_ok=True)
+        with open(os.path.join(tmp, PROFILE_FILES["folded"]), "w") as f:
+            for stack, count in session.sampler.stacks.most_common():
+                f.write(f"{stack} {count}\n")
+        if session.profiler is not None:
+            session.profiler.dump_stats(os.path.join(tmp, PROFILE_FILES["pstats"]))
+        with open(os.path.join(tmp, PROFILE_FILES["meta"]), "w") as f:
+            json.dump(meta, f, indent=2)
+        os.replace(tmp, os.path.join(self.root, session.id))
+        self._prune()
+        return meta
+
+    def _ids(self) -> List[str]:
+        if not os.path.isdir(self.root):
+            return []
+        return sorted((name for name in os.listdir(self.root) if _PROFILE_ID.match(name)), reverse=True)
+
+    def _prune(self):
+        for profile_id in self._ids()[self.max_profiles:]:
+            shutil.rmtree(os.path.join(self.root, profile_id), ignore_errors=True)
+
+    def list(self, limit: int = 50) -> List[Dict]:
+        """Metadata of the newest profiles"""
+        profiles = []
+        for profile_id in self._ids()[:limit]:
+            meta = self.get(profile_id)
+            if meta:
+                meta.pop("top_functions", None)
+                profiles.append(meta)
+        return profiles
+
+    def get(self, profile_id: str) -> Optional[Dict]:
+        path = self.path(profile_id, "meta")
+        if not path:
+            return None
+        with open(path) as f:
+            return json.load(f)
+
+    def path(self, profile_id: str, kind: str) -> Optional[str]:
+        """File of a stored profile (None for unknown ids/kinds or a missing file)"""
+        if not _PROFILE_ID.match(profile_id) or kind not in PROFILE_FILES:
+            return None
+        path = os.path.join(self.root, profile_id, PROFILE_FILES[kind])
+        return path if os.path.exists(path) else None
+
+
+profile_store = ProfileStore()
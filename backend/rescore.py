@@ -0,0 +1,177 @@
+"""
+Re-score stored reports against the current keyword rules without re-running OCR.
+
+Usage:
+    python rescore.py --workers 4 --batch-size 1000
+    python rescore.py --resume              # continue after an interruption
+    python rescore.py --dry-run             # count changes without writing
+
+Reports are streamed in id order (keyset pagination). Each page is split into
+chunks scored in parallel worker processes, using each report's stored OCR tokens
+(or its stored text for reports saved before tokens were kept). Only reports whose
+outcome changes are written. A page's changed outcomes are written in one
+transaction together with the trend rollup and map tile increments that move those
+reports, so an interrupted run never leaves reports re-scored without their
+aggregates. Progress is checkpointed after every page, and a checkpoint is only
+resumed under the same rules version.
+"""
+import argparse
+import asyncio
+import json
+import os
+import time
+from datetime import datetime
+from multiprocessing import get_context
+from typing import Dict, List, Optional, Tuple
+from db import db
+
+REPORT_FIELDS = (
+    "id", "extracted_text", "ocr_confidence", "ocr_tokens", "is_compliant", "violations_found",
+    "violation_count", "violation_context", "severity_level", "severity_score",
+    "created_at", "status", "city", "zone",  # For moving the report's trend rollup contribution
+    "latitude", "longitude"  # ... and its map tile contribution
+)
+DEFAULT_CHECKPOINT = "rescore_checkpoint.json"
+
+_detector = None
+
+
+def _init_worker():
+    global _detector
+    from detector import ViolationDetector
+    _detector = ViolationDetector()
+
+
+def _normalize(outcome: Dict) -> Tuple:
+    """Comparable form of an outcome (storage may return numerics as strings/decimals)"""
+    from detector import OUTCOME_FIELDS
+    values = []
+    for field in OUTCOME_FIELDS:
+        value = outcome.get(field)
+        if field == "severity_score":
+            value = round(float(value or 0), 1)
+        elif field == "violation_count":
+            value = int(value or 0)
+        elif field == "is_compliant":
+            value = bool(value) if value is not None else True
+        elif field in ("violations_found", "violation_context"):
+            value = tuple(value or ())
+        values.append(value)
+    return tuple(values)
+
+
+def score_chunk(reports: List[Dict]) -> Tuple[List[Tuple[str, Dict]], int]:
+    """(changed report ids with their new outcome, reports scored from stored text only)"""
+    changes, from_text = [], 0
+    for report in reports:
+        if not report.get("ocr_tokens"):
+            from_text += 1
+        outcome = _detector.rescore(report)
+        if _normalize(outcome) != _normalize(report):
+            changes.append((report["id"], outcome))
+    return changes, from_text
+
+
+class Checkpoint:
+    """Rescore progress persisted atomically (write to temp file, then rename)"""
+
+    def __init__(self, path: str, rules_version: str):
+        self.path = path
+        self.state = {
+            "rules_version": rules_version, "after_id": None, "scanned": 0, "changed": 0,
+            "from_text": 0, "started_at": datetime.utcnow().isoformat(), "updated_at": None, "done": False,
+        }
+
+    def load(self) -> bool:
+        if not os.path.exists(self.path):
+            return False
+        with open(self.path) as f:
+            saved = json.load(f)
+        if saved.get("rules_version") != self.state["rules_version"]:
+            raise SystemExit(
+                f"Checkpoint {self.path} was written for rules {saved.get('rules_version')}, "
+                f"current rules are {self.state['rules_version']}; start over without --resume"
+            )
+        self.state.update(saved)
+        return True
+
+    def save(self):
+        self.state["updated_at"] = datetime.utcnow().isoformat()
+        tmp = self.path + ".tmp"
+        with open(tmp, "w") as f:
+            json.dump(self.state, f, indent=2)
+        os.replace(tmp, self.path)
+
+
+def _chunks(items: List, parts: int) -> List[List]:
+    size = max(1, -(-len(items) // parts))
+    return [items[i:i + size] for i in range(0, len(items), size)]
+
+
+async def rescore(workers: int, batch_size: int, checkpoint_path: str, resume: bool = False,
+                  dry_run: bool = False, storage=None) -> Dict:
+    from detector import ViolationDetector
+    from geo_tiles import update_deltas
+    from rollups import update_rows
+
+    storage = storage or db
+    checkpoint = Checkpoint(checkpoint_path, ViolationDetector().rules_version)
+    if resume and checkpoint.load():
+        if checkpoint.state["done"]:
+            print("Checkpoint says this rules version was already fully applied")
+            return checkpoint.state
+        print(f"Resuming after report {checkpoint.state['after_id']} ({checkpoint.state['scanned']} scanned)")
+    state = checkpoint.state
+    columns = ",".join(REPORT_FIELDS)
+    started = time.perf_counter()
+
+    with get_context("fork").Pool(workers, initializer=_init_worker) as pool:
+        page = await storage.get_reports_after(state["after_id"], batch_size, columns=columns)
+        while page:
+            # Fetch the next page while this one is being scored
+            next_page = asyncio.ensure_future(storage.get_reports_after(page[-1]["id"], batch_size, columns=columns))
+            results = await asyncio.to_thread(pool.map, score_chunk, _chunks(page, workers * 2), 1)
+            updates = [change for changes, _ in results for change in changes]
+            if updates and not dry_run:
+                rescored = [{"id": report_id, **outcome} for report_id, outcome in updates]
+                if not await storage.apply_report_rescore(updates, update_rows(page, rescored), update_deltas(page, rescored)):
+                    next_page.cancel()
+                    raise SystemExit(f"Writing the page after report {state['after_id']} failed; "
+                                     "nothing from it was applied, rerun with --resume")
+            state["changed"] += len(updates)
+            state["from_text"] += sum(from_text for _, from_text in results)
+            state["scanned"] += len(page)
+            state["after_id"] = page[-1]["id"]
+            if not dry_run:
+                checkpoint.save()
+            elapsed = time.perf_counter() - started
+            print(f"Scanned {state['scanned']} reports, {state['changed']} changed ({len(page) / max(elapsed, 1e-9):.0f}/s)")
+            started = time.perf_counter()
+            page = await next_page
+
+    state["done"] = True
+    if not dry_run:
+        checkpoint.save()
+    return state
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Re-score stored reports with the current keyword rules")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="Scoring processes")
+    parser.add_argument("--batch-size", type=int, default=1000, help="Reports fetched per page")
+    parser.add_argument("--checkpoint", default=DEFAULT_CHECKPOINT, help="Progress file")
+    parser.add_argument("--resume", action="store_true", help="Continue from the checkpoint")
+    parser.add_argument("--dry-run", action="store_true", help="Count changes without writing")
+    args = parser.parse_args(argv)
+
+    async def run():
+        state = await rescore(args.workers, args.batch_size, args.checkpoint, resume=args.resume, dry_run=args.dry_run)
+        await db.close()
+        return state
+
+    print(json.dumps(asyncio.run(run()), indent=2))
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
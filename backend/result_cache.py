@@ -0,0 +1,118 @@
+import hashlib
+import json
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Optional
+from config import (
+    RESULT_CACHE_ENABLED, RESULT_CACHE_PATH, RESULT_CACHE_MAX_ENTRIES,
+    RESULT_CACHE_TTL_SECONDS, RESULT_CACHE_LOCAL_ENTRIES
+)
+import metrics
+
+
+def default_cache_path() -> str:
+    """Prefer tmpfs (/dev/shm) so the cache file lives in shared memory across workers"""
+    directory = "/dev/shm" if os.path.isdir("/dev/shm") else tempfile.gettempdir()
+    return os.path.join(directory, "billboard_result_cache.db")
+
+
+class ResultCache:
+    """Analysis results keyed by image hash + rule set, shared by all workers on a host.
+
+    A small per-process LRU sits in front of a SQLite file on tmpfs; every worker
+    process opens its own connection lazily (after fork)."""
+
+    def __init__(self, path: Optional[str] = None, max_entries: int = RESULT_CACHE_MAX_ENTRIES,
+                 ttl_seconds: int = RESULT_CACHE_TTL_SECONDS, local_entries: int = RESULT_CACHE_LOCAL_ENTRIES):
+        self.path = path or RESULT_CACHE_PATH or default_cache_path()
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.local_entries = local_entries
+        self._local: "OrderedDict[str, Dict]" = OrderedDict()
+        self._conn: Optional[sqlite3.Connection] = None
+        self._pid: Optional[int] = None
+        self._lock = threading.Lock()
+        self._writes = 0
+
+    @staticmethod
+    def key(image_data: bytes, rules_version: str) -> str:
+        return hashlib.sha256(image_data).hexdigest() + ":" + rules_version
+
+    def _connection(self) -> sqlite3.Connection:
+        # Never reuse a connection inherited across fork()
+        if self._conn is None or self._pid != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=5, check_same_thread=False, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=OFF")  # Cache contents are disposable
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS results (key TEXT PRIMARY KEY, value TEXT NOT NULL, created REAL NOT NULL)"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_results_created ON results(created)")
+            self._conn, self._pid = conn, os.getpid()
+            self._local.clear()
+        return self._conn
+
+    def get(self, key: str) -> Optional[Dict]:
+        with self._lock:
+            if key in self._local:
+                self._local.move_to_end(key)
+                metrics.CACHE_REQUESTS.inc(cache="analysis_local", result="hit")
+                return self._local[key]
+            try:
+                row = self._connection().execute(
+                    "SELECT value FROM results WHERE key = ? AND created > ?",
+                    (key, time.time() - self.ttl_seconds),
+                ).fetchone()
+            except sqlite3.Error as e:
+                print(f"Error reading result cache: {e}")
+                row = None
+            if row is None:
+                metrics.CACHE_REQUESTS.inc(cache="analysis", result="miss")
+                return None
+            value = json.loads(row[0])
+            self._remember(key, value)
+            metrics.CACHE_REQUESTS.inc(cache="analysis", result="hit")
+            return value
+
+    def put(self, key: str, value: Dict):
+        with self._lock:
+            self._remember(key, value)
+            try:
+                conn = self._connection()
+                conn.execute(
+                    "INSERT OR REPLACE INTO results (key, value, created) VALUES (?, ?, ?)",
+                    (key, json.dumps(value), time.time()),
+                )
+                self._writes += 1
+                if self._writes % 256 == 0:
+                    self._evict(conn)
+            except sqlite3.Error as e:
+                print(f"Error writing result cache: {e}")
+
+    def _remember(self, key: str, value: Dict):
+        self._local[key] = value
+        self._local.move_to_end(key)
+        while len(self._local) > self.local_entries:
+            self._local.popitem(last=False)
+
+    def _evict(self, conn: sqlite3.Connection):
+        """Drop expired rows and the oldest rows beyond max_entries"""
+        conn.execute("DELETE FROM results WHERE created <= ?", (time.time() - self.ttl_seconds,))
+        conn.execute(
+            "DELETE FROM results WHERE key IN (SELECT key FROM results ORDER BY created DESC LIMIT -1 OFFSET ?)",
+            (self.max_entries,),
+        )
+
+    def close(self):
+        with self._lock:
+            if self._conn is not None and self._pid == os.getpid():
+                self._conn.close()
+            self._conn = None
+            self._local.clear()
+
+
+result_cache = ResultCache() if RESULT_CACHE_ENABLED else None
@@ -0,0 +1,239 @@
+"""
+Hourly and daily rollups of violation reports for trend queries.
+
+Every report adds one row per bucket granularity and dimension value it belongs to:
+all reports, its city, zone, severity level, status and each distinct keyword found.
+Rows hold additive counts only, so a status change or re-score is applied as the
+difference between the report's old and new contribution. A time series is then
+read from at most one row per bucket and series, however many reports it covers.
+
+Rebuild from stored reports (after deploying this feature):
+    python rollups.py backfill              # clears the rollups first
+    python rollups.py backfill --no-reset   # only into empty rollups
+
+The API maintains the rollups on every insert and status change, so pause report
+writes while a rebuild runs: changes landing during the run would be lost or counted twice.
+"""
+import argparse
+import asyncio
+import json
+from datetime import datetime, timedelta, timezone
+from typing import Dict, Iterable, List, Optional, Tuple
+from config import ROLLUP_MAX_BUCKETS
+from db import db
+
+GRANULARITIES = {"hour": timedelta(hours=1), "day": timedelta(days=1)}
+DIMENSIONS = ("all", "city", "zone", "severity", "keyword", "status")
+# Columns a report needs for its rollup contribution
+ROLLUP_FIELDS = ("id", "created_at", "status", "city", "zone", "severity_level", "severity_score", "is_compliant", "violations_found")
+
+RollupKey = Tuple[str, str, str, str]  # granularity, bucket start (ISO), dimension, value
+
+
+# ============= BUCKETING =============
+def parse_timestamp(value) -> datetime:
+    """Naive UTC datetime from a stored timestamp (ISO string or datetime, with or without offset)"""
+    if isinstance(value, str):
+        value = datetime.fromisoformat(value.replace("Z", "+00:00"))
+    if value.tzinfo is not None:
+        value = value.astimezone(timezone.utc).replace(tzinfo=None)
+    return value
+
+
+def bucket_start(moment: datetime, granularity: str) -> datetime:
+    if granularity == "day":
+        return moment.replace(hour=0, minute=0, second=0, microsecond=0)
+    return moment.replace(minute=0, second=0, microsecond=0)
+
+
+def bucket_range(start: datetime, end: datetime, granularity: str) -> List[str]:
+    """Bucket keys covering [start, end)"""
+    step = GRANULARITIES[granularity]
+    current, keys = bucket_start(start, granularity), []
+    while current < end:
+        keys.append(current.isoformat())
+        current += step
+    return keys
+
+
+# ============= CONTRIBUTIONS =============
+def report_values(report: Dict) -> List[Tuple[str, str]]:
+    """(dimension, value) pairs a report is counted under"""
+    values = [("all", "")]
+    for dimension, field in (("city", "city"), ("zone", "zone"), ("severity", "severity_level"), ("status", "status")):
+        if report.get(field):
+            values.append((dimension, str(report[field])))
+    for keyword in sorted(set(report.get("violations_found") or ())):
+        values.append(("keyword", keyword))
+    return values
+
+
+def report_contribution(report: Dict, sign: int = 1) -> Dict[RollupKey, List[float]]:
+    """Counter increments (report_count, violation_count, severity_sum) per rollup key"""
+    if not report.get("created_at"):
+        return {}
+    created = parse_timestamp(report["created_at"])
+    counters = [
+        sign,
+        sign * (0 if report.get("is_compliant", True) else 1),
+        sign * float(report.get("severity_score") or 0),
+    ]
+    contribution = {}
+    for granularity in GRANULARITIES:
+        bucket = bucket_start(created, granularity).isoformat()
+        for dimension, value in report_values(report):
+            contribution[(granularity, bucket, dimension, value)] = list(counters)
+    return contribution
+
+
+def merge_contributions(contributions: Iterable[Dict[RollupKey, List[float]]]) -> List[Tuple]:
+    """Net increments per key as (granularity, bucket, dimension, value, reports, violations, severity_sum) rows.
+
+    Keys are unique in the result (a single upsert may not touch a row twice) and
+    keys whose increments cancel out are dropped."""
+    totals: Dict[RollupKey, List[float]] = {}
+    for contribution in contributions:
+        for key, counters in contribution.items():
+            total = totals.get(key)
+            if total is None:
+                totals[key] = list(counters)
+            else:
+                for i, counter in enumerate(counters):
+                    total[i] += counter
+    return [
+        (*key, int(total[0]), int(total[1]), round(total[2], 4))
+        for key, total in totals.items()
+        if total[0] or total[1] or abs(total[2]) > 1e-9
+    ]
+
+
+def update_rows(before: List[Dict], after: List[Dict]) -> List[Tuple]:
+    """Net rollup increments that move reports from their old to their new values (matched by id)"""
+    previous = {report["id"]: report for report in before}
+    contributions = []
+    for report in after:
+        old = previous.get(report.get("id"))
+        if old:
+            contributions.extend((report_contribution(old, -1), report_contribution({**old, **report})))
+    return merge_contributions(contributions)
+
+
+# ============= ROLLUP SERVICE =============
+class RollupService:
+    """Maintains report rollups on insert/change and answers time-series queries"""
+
+    def __init__(self, storage=None):
+        self._storage = storage
+
+    @property
+    def storage(self):
+        return self._storage or db
+
+    async def _apply(self, contributions: Iterable[Dict[RollupKey, List[float]]]):
+        await self._write(merge_contributions(contributions))
+
+    async def _write(self, rows: List[Tuple]):
+        if rows:
+            await self.storage.increment_report_rollups(rows)
+
+    async def add_report(self, report: Dict):
+        """Count one newly stored report"""
+        await self._apply([report_contribution(report)])
+
+    async def update_report(self, before: Optional[Dict], after: Optional[Dict]):
+        """Move a report's contribution after a status change or re-score (only differing rows are written)"""
+        if not before or not after:
+            return
+        await self._apply([report_contribution(before, -1), report_contribution({**before, **after})])
+
+    async def update_reports(self, before: List[Dict], after: List[Dict]):
+        """update_report for many reports in one write, matched by id"""
+        await self._write(update_rows(before, after))
+
+    async def timeseries(self, granularity: str, group_by: str, start: datetime, end: datetime,
+                         value: Optional[str] = None) -> Dict:
+        """Per-bucket counts in [start, end) for each value of a dimension (zero-filled)"""
+        if granularity not in GRANULARITIES:
+            raise ValueError(f"granularity must be one of {list(GRANULARITIES)}")
+        if group_by not in DIMENSIONS:
+            raise ValueError(f"group_by must be one of {list(DIMENSIONS)}")
+        buckets = bucket_range(start, end, granularity)
+        if len(buckets) > ROLLUP_MAX_BUCKETS:
+            raise ValueError(f"Range covers {len(buckets)} {granularity} buckets (max {ROLLUP_MAX_BUCKETS})")
+        if not buckets:
+            return {"buckets": [], "series": {}}
+
+        index = {bucket: i for i, bucket in enumerate(buckets)}
+        rows = await self.storage.get_report_rollups(granularity, group_by, buckets[0], buckets[-1], value)
+        series: Dict[str, Dict[str, List]] = {}
+        for row in rows:
+            i = index.get(row["bucket"])
+            if i is None:  # Backends that render timestamps differently
+                i = index.get(parse_timestamp(row["bucket"]).isoformat())
+                if i is None:
+                    continue
+            entry = series.get(row["value"])
+            if entry is None:
+                entry = series[row["value"]] = {
+                    "reports": [0] * len(buckets), "violations": [0] * len(buckets), "severity_sum": [0.0] * len(buckets)
+                }
+            entry["reports"][i] += int(row["report_count"] or 0)
+            entry["violations"][i] += int(row["violation_count"] or 0)
+            entry["severity_sum"][i] += float(row["severity_sum"] or 0)
+        for entry in series.values():
+            sums = entry.pop("severity_sum")
+            entry["avg_severity"] = [round(s / n, 2) if n else 0.0 for s, n in zip(sums, entry["reports"])]
+            entry["total_reports"] = sum(entry["reports"])
+            entry["total_violations"] = sum(entry["violations"])
+        # Rows a status change or re-score emptied are still stored; they are not series
+        series = {key: entry for key, entry in series.items() if entry["total_reports"] or entry["total_violations"]}
+        return {"buckets": buckets, "series": series}
+
+    async def backfill(self, batch_size: int = 1000, reset: bool = True) -> int:
+        """Rebuild rollups from all stored reports (keyset pagination by id, one write per page); report writes must be paused.
+
+        Without reset, refuses to add to existing rollups, which would count those reports twice."""
+        if reset:
+            await self.storage.clear_report_rollups()
+        elif await self.storage.get_report_rollups("day", "all", datetime.min.isoformat(), datetime.max.isoformat()):
+            raise ValueError("Rollups are not empty; backfilling into them would count reports twice (use reset)")
+        processed, after_id = 0, None
+        columns = ",".join(ROLLUP_FIELDS)
+        while True:
+            batch = await self.storage.get_reports_after(after_id, batch_size, columns=columns)
+            if not batch:
+                break
+            await self._apply(report_contribution(report) for report in batch)
+            processed += len(batch)
+            after_id = batch[-1]["id"]
+            print(f"Backfilled {processed} reports into rollups")
+        return processed
+
+
+rollup_service = RollupService()
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Report rollup maintenance")
+    parser.add_argument("command", choices=["backfill"])
+    parser.add_argument("--reset", action=argparse.BooleanOptionalAction, default=True,
+                        help="Clear existing rollups first (default); --no-reset requires them to be empty")
+    parser.add_argument("--batch-size", type=int, default=1000)
+    args = parser.parse_args(argv)
+
+    async def run():
+        try:
+            return await rollup_service.backfill(args.batch_size, reset=args.reset)
+        finally:
+            await db.close()
+
+    try:
+        print(json.dumps({"reports": asyncio.run(run())}))
+    except ValueError as e:
+        print(f"Error: {e}")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
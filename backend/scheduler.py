@@ -0,0 +1,263 @@
+"""
+Priority-aware scheduling of image analyses onto the detection thread pool.
+
+Jobs carry a priority class (interactive > citizen > bulk) and a source (the name of
+a configured API key, otherwise the client address). Unpinned sources run as citizen
+uploads; only a configured API key can be pinned above that (e.g. to interactive).
+Classes are served in strict priority
+order, each limited to a share of the detection threads so bulk work can never
+occupy every thread. Within a class, sources share capacity by start-time fair
+queuing, so one crew uploading thousands of photos does not delay a second source
+by more than its fair share. Jobs still queued past their class deadline are
+dropped instead of being analyzed for a client that has given up. Expired and
+cancelled jobs stop counting as queued at once; their heap entries are discarded
+lazily.
+
+The scheduler only hands the pool as many jobs as it has threads; all queueing
+happens here. Each worker process schedules its own pool.
+"""
+import asyncio
+import contextvars
+import heapq
+import itertools
+import time
+from collections import deque
+from concurrent.futures import Executor
+from typing import Callable, Deque, Dict, Iterable, List, Optional
+from config import (
+    SCHEDULER_CLASSES, SCHEDULER_DEFAULT_CLASS, SCHEDULER_CONCURRENCY, SCHEDULER_DEADLINES,
+    SCHEDULER_MAX_QUEUED, SCHEDULER_API_KEYS, SCHEDULER_SOURCE_CLASSES, SCHEDULER_SOURCE_WEIGHTS
+)
+import metrics
+
+
+class SchedulerRejected(Exception):
+    """The job was not run; `reason` is "deadline" or "queue_full" """
+
+    def __init__(self, priority: str, reason: str):
+        super().__init__(f"{priority} analysis {reason.replace('_', ' ')}")
+        self.priority = priority
+        self.reason = reason
+
+
+def parse_assignments(value: str, cast: Callable = str) -> Dict:
+    """Parse "name=value,name=value" settings"""
+    result = {}
+    for item in value.split(","):
+        if "=" in item:
+            name, raw = item.split("=", 1)
+            result[name.strip()] = cast(raw.strip())
+    return result
+
+
+class _Job:
+    __slots__ = ("fn", "args", "context", "priority", "source", "enqueued", "deadline", "future", "timer", "queued")
+
+    def __init__(self, fn, args, priority: str, source: str, deadline: float, future: asyncio.Future):
+        self.fn = fn
+        self.args = args
+        self.context = contextvars.copy_context()  # Keep the request's trace in the pool thread
+        self.priority = priority
+        self.source = source
+        self.enqueued = time.monotonic()
+        self.deadline = deadline
+        self.future = future
+        self.timer: Optional[asyncio.TimerHandle] = None
+        self.queued = False  # Waiting to run (dead heap entries have this cleared)
+
+
+class _PriorityClass:
+    """Start-time fair queue across sources for one priority class"""
+
+    def __init__(self, name: str, limit: int, max_wait: float):
+        self.name = name
+        self.limit = limit
+        self.max_wait = max_wait
+        self.heap: List = []
+        self.live = 0  # Jobs in the heap still waiting to run
+        self.virtual_time = 0.0
+        self.last_finish: Dict[str, float] = {}
+        self.queued_by_source: Dict[str, int] = {}
+        self.running = 0
+        self.completed = 0
+        self.dropped = 0
+        self.recent_waits: Deque[float] = deque(maxlen=1000)
+
+    def push(self, job: _Job, seq: int, weight: float):
+        start = max(self.virtual_time, self.last_finish.get(job.source, 0.0))
+        self.last_finish[job.source] = start + 1.0 / weight
+        heapq.heappush(self.heap, (start, seq, job))
+        job.queued = True
+        self.live += 1
+        self.queued_by_source[job.source] = self.queued_by_source.get(job.source, 0) + 1
+
+    def pop(self) -> _Job:
+        start, _, job = heapq.heappop(self.heap)
+        self.virtual_time = start
+        if len(self.last_finish) > 2 * len(self.queued_by_source) + 64:
+            # A finish tag at or below the virtual time no longer affects a source's start tag
+            self.last_finish = {source: finish for source, finish in self.last_finish.items() if finish > self.virtual_time}
+        return job
+
+    def remove(self, job: _Job) -> bool:
+        """Stop counting a job as queued (started, expired or cancelled); False if it already was not"""
+        if not job.queued:
+            return False
+        job.queued = False
+        self.live -= 1
+        remaining = self.queued_by_source[job.source] - 1
+        if remaining:
+            self.queued_by_source[job.source] = remaining
+        else:
+            del self.queued_by_source[job.source]
+        if not self.live:
+            # Idle class: forget finish tags so returning sources start level, and drop dead entries
+            self.last_finish.clear()
+            self.heap.clear()
+        elif len(self.heap) > 2 * self.live + 64:
+            self.heap = [entry for entry in self.heap if entry[2].queued]
+            heapq.heapify(self.heap)
+        return True
+
+
+class AnalysisScheduler:
+    def __init__(self, executor: Executor, capacity: int,
+                 concurrency: Optional[Dict[str, float]] = None,
+                 deadlines: Optional[Dict[str, float]] = None,
+                 max_queued: int = SCHEDULER_MAX_QUEUED,
+                 source_classes: Optional[Dict[str, str]] = None,
+                 source_weights: Optional[Dict[str, float]] = None,
+                 key_sources: Optional[Iterable[str]] = None):
+        self.executor = executor
+        self.capacity = max(1, capacity)
+        self.max_queued = max_queued
+        concurrency = concurrency if concurrency is not None else parse_assignments(SCHEDULER_CONCURRENCY, float)
+        deadlines = deadlines if deadlines is not None else parse_assignments(SCHEDULER_DEADLINES, float)
+        self.source_classes = source_classes if source_classes is not None else parse_assignments(SCHEDULER_SOURCE_CLASSES)
+        self.source_weights = source_weights if source_weights is not None else parse_assignments(SCHEDULER_SOURCE_WEIGHTS, float)
+        self.key_sources = set(key_sources if key_sources is not None else parse_assignments(SCHEDULER_API_KEYS))
+        self.classes = {
+            name: _PriorityClass(
+                name,
+                limit=max(1, int(round(self.capacity * concurrency.get(name, 1.0)))),
+                max_wait=deadlines.get(name, 0.0),
+            )
+            for name in SCHEDULER_CLASSES
+        }
+        self.running = 0
+        self._seq = itertools.count()
+
+    def classify(self, requested: Optional[str], source: str) -> str:
+        """Resolve a job's class: clients may lower their priority, never raise it above their pinned class.
+
+        Only configured API keys can be pinned above the default class; client addresses can only be pinned lower."""
+        pinned = self.source_classes.get(source, SCHEDULER_DEFAULT_CLASS)
+        if source not in self.key_sources and SCHEDULER_CLASSES.index(pinned) < SCHEDULER_CLASSES.index(SCHEDULER_DEFAULT_CLASS):
+            pinned = SCHEDULER_DEFAULT_CLASS
+        if requested not in self.classes:
+            return pinned
+        return max(requested, pinned, key=SCHEDULER_CLASSES.index)
+
+    async def submit(self, fn: Callable, *args, priority: str = SCHEDULER_DEFAULT_CLASS,
+                     source: str = "anonymous", timeout: Optional[float] = None):
+        """Queue `fn(*args)` for the pool and wait for its result"""
+        queue = self.classes[priority]
+        if queue.live >= self.max_queued:
+            self._reject(queue, "queue_full")
+            raise SchedulerRejected(priority, "queue_full")
+        max_wait = timeout if timeout is not None else queue.max_wait
+        loop = asyncio.get_running_loop()
+        job = _Job(fn, args, priority, source, time.monotonic() + max_wait if max_wait else float("inf"), loop.create_future())
+        queue.push(job, next(self._seq), self.source_weights.get(source, 1.0))
+        metrics.SCHEDULER_JOBS.inc(priority=priority, state="queued")
+        job.future.add_done_callback(lambda _: self._remove(job))  # Caller went away while queued
+        if max_wait:
+            job.timer = loop.call_later(max_wait, self._expire, job)
+        self._dispatch()
+        return await job.future
+
+    def _dispatch(self):
+        while self.running < self.capacity:
+            job = self._next_job()
+            if job is None:
+                return
+            self._start(job)
+
+    def _next_job(self) -> Optional[_Job]:
+        now = time.monotonic()
+        for queue in self.classes.values():
+            while queue.heap and queue.running < queue.limit:
+                job = queue.pop()
+                if not job.queued or job.future.done():
+                    self._remove(job)
+                    continue  # Expired or cancelled while queued
+                if now > job.deadline:
+                    self._expire(job)
+                    continue
+                self._remove(job)
+                return job
+        return None
+
+    def _remove(self, job: _Job):
+        if self.classes[job.priority].remove(job):
+            metrics.SCHEDULER_JOBS.dec(priority=job.priority, state="queued")
+
+    def _expire(self, job: _Job):
+        """Fail a job still waiting at its deadline (its heap entry is skipped when popped)"""
+        if not job.future.done():
+            self._remove(job)
+            self._reject(self.classes[job.priority], "deadline")
+            job.future.set_exception(SchedulerRejected(job.priority, "deadline"))
+
+    def _start(self, job: _Job):
+        if job.timer is not None:
+            job.timer.cancel()
+        queue = self.classes[job.priority]
+        wait = time.monotonic() - job.enqueued
+        queue.recent_waits.append(wait)
+        metrics.SCHEDULER_WAIT_SECONDS.observe(wait, priority=job.priority)
+        metrics.SCHEDULER_JOBS.inc(priority=job.priority, state="running")
+        self.running += 1
+        queue.running += 1
+        loop = asyncio.get_running_loop()
+        task = loop.run_in_executor(self.executor, job.context.run, job.fn, *job.args)
+        task.add_done_callback(lambda done: self._finish(job, done))
+
+    def _finish(self, job: _Job, done: asyncio.Future):
+        queue = self.classes[job.priority]
+        self.running -= 1
+        queue.running -= 1
+        queue.completed += 1
+        metrics.SCHEDULER_JOBS.dec(priority=job.priority, state="running")
+        if not job.future.done():
+            if done.cancelled():
+                job.future.cancel()
+            elif done.exception() is not None:
+                job.future.set_exception(done.exception())
+            else:
+                job.future.set_result(done.result())
+        self._dispatch()
+
+    def _reject(self, queue: _PriorityClass, reason: str):
+        queue.dropped += 1
+        metrics.SCHEDULER_REJECTED.inc(priority=queue.name, reason=reason)
+
+    def stats(self) -> Dict:
+        classes = {}
+        for name, queue in self.classes.items():
+            waits = sorted(queue.recent_waits)
+
+            def pct(p):
+                return round(waits[min(len(waits) - 1, int(p / 100 * len(waits)))] * 1000, 2) if waits else 0.0
+
+            classes[name] = {
+                "queued": queue.live,
+                "running": queue.running,
+                "concurrency_limit": queue.limit,
+                "deadline_seconds": queue.max_wait,
+                "completed": queue.completed,
+                "dropped": queue.dropped,
+                "wait_ms": {"p50": pct(50), "p95": pct(95), "max": round(waits[-1] * 1000, 2) if waits else 0.0},
+                "active_sources": len(queue.queued_by_source),
+            }
+        return {"capacity": self.capacity, "running": self.running, "classes": classes}
@@ -0,0 +1,76 @@
+"""
+Full-text search over OCR output.
+
+Two match modes, both backed by an index in each storage backend:
+- "words": every whitespace-separated term must occur as a word; a term with
+  punctuation (a phone number such as 555-123-4567) must occur as that word sequence.
+  Postgres tsvector + GIN, SQLite FTS5.
+- "substring": the whole query must occur anywhere in the text, case-insensitively
+  (OCR often merges or splits words). Postgres pg_trgm GIN, SQLite FTS5 trigram.
+
+Results are ordered newest first and paged with an opaque (created_at, id) cursor.
+"""
+import base64
+import json
+import re
+from typing import Dict, List, Optional, Tuple
+
+SEARCH_MODES = ("words", "substring")
+# Columns returned for search hits (ocr_tokens and other bulky columns are left out)
+SEARCH_COLUMNS = (
+    "id", "image_url", "extracted_text", "status", "severity_level", "severity_score", "violations_found",
+    "latitude", "longitude", "city", "zone", "billboard_entity_id", "created_at"
+)
+SNIPPET_CHARS = 160
+
+_WORD = re.compile(r"\w")
+
+
+def parse_query(query: str, mode: str) -> List[str]:
+    """Search terms: the whole (whitespace-normalized) query for substring mode, else terms containing a word character"""
+    if mode not in SEARCH_MODES:
+        raise ValueError(f"mode must be one of {list(SEARCH_MODES)}")
+    if mode == "substring":
+        query = " ".join(query.split())
+        return [query] if query else []
+    return [term for term in query.split() if _WORD.search(term)]
+
+
+def encode_cursor(report: Dict) -> str:
+    raw = json.dumps([str(report["created_at"]), str(report["id"])], separators=(",", ":"))
+    return base64.urlsafe_b64encode(raw.encode()).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: Optional[str]) -> Optional[Tuple[str, str]]:
+    """(created_at, id) of the last hit on the previous page"""
+    if not cursor:
+        return None
+    try:
+        created_at, report_id = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+        return str(created_at), str(report_id)
+    except Exception:
+        raise ValueError("Invalid cursor")
+
+
+def snippet(text: Optional[str], terms: List[str], width: int = SNIPPET_CHARS) -> str:
+    """Window of the text around the first occurrence of a term"""
+    if not text:
+        return ""
+    lowered = text.lower()
+    positions = [position for position in (lowered.find(term.lower()) for term in terms) if position >= 0]
+    if not positions or len(text) <= width:
+        return text[:width] + ("..." if len(text) > width else "")
+    start = max(0, min(positions) - width // 4)
+    end = min(len(text), start + width)
+    return ("..." if start else "") + text[start:end] + ("..." if end < len(text) else "")
+
+
+def fts5_query(terms: List[str]) -> str:
+    """FTS5 MATCH expression: each term quoted as a phrase (implicit AND)"""
+    return " ".join('"' + term.replace('"', '""') + '"' for term in terms)
+
+
+def like_pattern(term: str) -> str:
+    """LIKE pattern matching `term` anywhere (escape character: backslash)"""
+    escaped = term.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+    return f"%{escaped}%"
@@ -0,0 +1,84 @@
+"""
+Fast JSON encoding for API responses.
+
+Uses orjson (pinned in requirements.txt), falling back to the stdlib encoder without it.
+Endpoints that return large payloads build a FastJSONResponse (or a streamed list
+response) directly, which skips FastAPI's jsonable_encoder pass over the content.
+"""
+import json
+from datetime import date, datetime
+from decimal import Decimal
+from typing import Any, Dict, Iterable, Iterator, List
+from uuid import UUID
+from fastapi.responses import JSONResponse, StreamingResponse
+from config import JSON_STREAM_MIN_ITEMS, JSON_STREAM_CHUNK_ITEMS
+
+try:
+    import orjson
+except ImportError:  # Pinned in requirements.txt; stdlib json without it
+    orjson = None
+
+
+def _default(value: Any):
+    """Types neither encoder handles natively (numpy scalars from the detector, Decimal, pydantic models)"""
+    if hasattr(value, "item") and callable(value.item):
+        return value.item()
+    if isinstance(value, Decimal):
+        return float(value)
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    if isinstance(value, UUID):
+        return str(value)
+    if isinstance(value, (set, frozenset, tuple)):
+        return list(value)
+    if hasattr(value, "model_dump"):
+        return value.model_dump()
+    if hasattr(value, "dict"):
+        return value.dict()
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+if orjson is not None:
+    def dumps(value: Any) -> bytes:
+        return orjson.dumps(value, default=_default, option=orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY)
+else:
+    _encoder = json.JSONEncoder(default=_default, ensure_ascii=False, separators=(",", ":"))
+
+    def dumps(value: Any) -> bytes:
+        return _encoder.encode(value).encode("utf-8")
+
+ENCODER = "orjson" if orjson is not None else "json"
+
+
+class FastJSONResponse(JSONResponse):
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
+
+
+def _stream_object(fields: Dict[str, Any], items_key: str, items: List[Any], chunk_items: int) -> Iterator[bytes]:
+    # {"field": ..., ..., "items_key": [item, item, ...]} in chunks of encoded items
+    head = dumps(fields)
+    yield head[:-1] + (b"," if fields else b"") + dumps(items_key) + b":["
+    for start in range(0, len(items), chunk_items):
+        chunk = items[start:start + chunk_items]
+        prefix = b"," if start else b""
+        yield prefix + b",".join(dumps(item) for item in chunk)
+    yield b"]}"
+
+
+def list_response(items_key: str, items: List[Any], stream_min_items: int = JSON_STREAM_MIN_ITEMS,
+                  chunk_items: int = JSON_STREAM_CHUNK_ITEMS, **fields) -> JSONResponse:
+    """`{**fields, items_key: items}` as JSON; large lists are streamed in chunks instead of encoded in one piece"""
+    if len(items) < stream_min_items:
+        return FastJSONResponse({**fields, items_key: items})
+    return StreamingResponse(_stream_object(fields, items_key, items, chunk_items), media_type="application/json")
+
+
+def iter_json_array(items: Iterable[Any]) -> Iterator[bytes]:
+    """Encode an iterable as a JSON array one element at a time"""
+    yield b"["
+    first = True
+    for item in items:
+        yield (b"" if first else b",") + dumps(item)
+        first = False
+    yield b"]"
@@ -0,0 +1,202 @@
+"""
+Multi-worker server entry point.
+
+Usage:
+    python server.py --workers 4 --port 8000 --preload
+
+The master process binds the listening socket once and forks N uvicorn workers,
+each pinned to its own CPU set with a detection pool sized to it.
+
+Signals (sent to the master):
+    SIGTERM / SIGINT  drain and stop all workers (in-flight analyses finish, storage is flushed)
+    SIGHUP            rolling restart: replace workers one at a time, never dropping capacity
+"""
+import argparse
+import multiprocessing
+import os
+import signal
+import socket
+import sys
+import time
+from typing import Dict, List, Optional, Tuple
+
+
+def available_cpus() -> List[int]:
+    if hasattr(os, "sched_getaffinity"):
+        return sorted(os.sched_getaffinity(0))
+    return list(range(os.cpu_count() or 1))
+
+
+def cpu_slots(workers: int, cpus_per_worker: int) -> List[List[int]]:
+    """Assign each worker a disjoint CPU set where possible (wrapping when oversubscribed)"""
+    cpus = available_cpus()
+    return [[cpus[(slot * cpus_per_worker + i) % len(cpus)] for i in range(cpus_per_worker)] for slot in range(workers)]
+
+
+def bind_socket(host: str, port: int, backlog: int = 2048) -> socket.socket:
+    family = socket.AF_INET6 if ":" in host else socket.AF_INET
+    sock = socket.socket(family, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((host, port))
+    sock.listen(backlog)
+    sock.set_inheritable(True)
+    return sock
+
+
+# ============= WORKER =============
+def _make_server_class():
+    import uvicorn
+
+    class WorkerServer(uvicorn.Server):
+        """uvicorn server that reports readiness to the master once it accepts connections"""
+
+        def __init__(self, config, ready):
+            super().__init__(config)
+            self._ready = ready
+
+        async def startup(self, sockets=None):
+            await super().startup(sockets=sockets)
+            if not self.should_exit:
+                self._ready.set()
+
+    return WorkerServer
+
+
+def _worker_main(slot: int, sock: socket.socket, cpus: List[int], ready, options: Dict):
+    signal.signal(signal.SIGHUP, signal.SIG_IGN)  # Rolling restarts are driven by the master
+    if cpus and hasattr(os, "sched_setaffinity"):
+        os.sched_setaffinity(0, cpus)
+
+    import uvicorn
+    import main
+
+    # One detection thread per pinned CPU; keep OpenCV's own pool inside the same CPU set
+    main.get_detection_pool(max(1, len(cpus)))
+    if "cv2" in sys.modules:
+        sys.modules["cv2"].setNumThreads(max(1, len(cpus)))
+
+    config = uvicorn.Config(
+        main.app,
+        log_level=options["log_level"],
+        timeout_graceful_shutdown=options["graceful_timeout"],
+        lifespan="on",
+    )
+    server = _make_server_class()(config, ready)
+    print(f"Worker {slot} (pid {os.getpid()}) serving on CPUs {cpus}")
+    server.run(sockets=[sock])
+
+
+# ============= MASTER =============
+class Master:
+    """Supervises workers: restarts crashes, drains on SIGTERM, rolls on SIGHUP"""
+
+    def __init__(self, args):
+        self.args = args
+        self.context = multiprocessing.get_context("fork")
+        self.sock = bind_socket(args.host, args.port)
+        self.slots = cpu_slots(args.workers, args.cpus_per_worker)
+        self.workers: Dict[int, Tuple[multiprocessing.Process, object]] = {}
+        self.options = {"log_level": args.log_level, "graceful_timeout": args.graceful_timeout}
+        self._stopping = False
+        self._restart_requested = False
+
+    def spawn(self, slot: int) -> Tuple[multiprocessing.Process, object]:
+        ready = self.context.Event()
+        process = self.context.Process(
+            target=_worker_main,
+            args=(slot, self.sock, self.slots[slot], ready, self.options),
+            name=f"billboard-worker-{slot}",
+        )
+        process.start()
+        return process, ready
+
+    def stop_worker(self, process: multiprocessing.Process):
+        if process.is_alive():
+            os.kill(process.pid, signal.SIGTERM)
+        process.join(self.args.graceful_timeout + 5)
+        if process.is_alive():
+            print(f"Worker pid {process.pid} did not drain in time; killing")
+            process.kill()
+            process.join()
+
+    def rolling_restart(self):
+        """Start a replacement for each worker and only retire the old one once the new one is ready"""
+        print("Rolling restart started")
+        for slot in sorted(self.workers):
+            old_process, _ = self.workers[slot]
+            process, ready = self.spawn(slot)
+            if ready.wait(self.args.ready_timeout):
+                self.workers[slot] = (process, ready)
+                self.stop_worker(old_process)
+            else:
+                print(f"Replacement worker for slot {slot} failed to become ready; keeping pid {old_process.pid}")
+                self.stop_worker(process)
+            if self._stopping:
+                break
+        print("Rolling restart finished")
+
+    def shutdown(self):
+        print("Draining workers")
+        for process, _ in self.workers.values():
+            if process.is_alive():
+                os.kill(process.pid, signal.SIGTERM)
+        deadline = time.monotonic() + self.args.graceful_timeout + 5
+        for process, _ in self.workers.values():
+            process.join(max(0.0, deadline - time.monotonic()))
+            if process.is_alive():
+                process.kill()
+                process.join()
+        self.sock.close()
+
+    def _on_stop(self, signum, frame):
+        self._stopping = True
+
+    def _on_hup(self, signum, frame):
+        self._restart_requested = True
+
+    def run(self) -> int:
+        if self.args.preload:
+            # Import the app and build the detector (CV stack + keyword rules) before forking,
+            # so every worker shares those pages copy-on-write instead of loading its own.
+            import main
+            main.get_detector()
+
+        signal.signal(signal.SIGTERM, self._on_stop)
+        signal.signal(signal.SIGINT, self._on_stop)
+        signal.signal(signal.SIGHUP, self._on_hup)
+
+        for slot in range(len(self.slots)):
+            self.workers[slot] = self.spawn(slot)
+        print(f"Master pid {os.getpid()} listening on {self.args.host}:{self.args.port} with {len(self.slots)} workers")
+
+        while not self._stopping:
+            if self._restart_requested:
+                self._restart_requested = False
+                self.rolling_restart()
+                continue
+            for slot, (process, _) in list(self.workers.items()):
+                if not process.is_alive() and not self._stopping:
+                    print(f"Worker {slot} (pid {process.pid}) exited with {process.exitcode}; restarting")
+                    self.workers[slot] = self.spawn(slot)
+            time.sleep(0.5)
+
+        self.shutdown()
+        return 0
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Run the billboard API with multiple workers")
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--workers", type=int, default=len(available_cpus()))
+    parser.add_argument("--cpus-per-worker", type=int, default=1)
+    parser.add_argument("--preload", action="store_true", help="Load the app and detector in the master before forking")
+    parser.add_argument("--graceful-timeout", type=int, default=30, help="Seconds a worker gets to drain on SIGTERM")
+    parser.add_argument("--ready-timeout", type=int, default=60, help="Seconds to wait for a replacement during rolling restart")
+    parser.add_argument("--log-level", default="info")
+    args = parser.parse_args(argv)
+    return Master(args).run()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,39 @@
+import json
+import time
+from contextlib import contextmanager
+from typing import Dict
+from config import STARTUP_PROFILE
+
+# Reference point for all startup phases (this module is imported first by main)
+_started = time.perf_counter()
+phases: Dict[str, float] = {}
+durations: Dict[str, float] = {}
+
+
+def elapsed_ms() -> float:
+    return round((time.perf_counter() - _started) * 1000, 3)
+
+
+def mark(name: str):
+    """Record that a startup milestone was reached (first occurrence wins)"""
+    phases.setdefault(name, elapsed_ms())
+
+
+@contextmanager
+def phase(name: str):
+    """Record how long a startup step took"""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        durations[name] = round((time.perf_counter() - start) * 1000, 3)
+        mark(f"{name}_done")
+
+
+def report() -> Dict:
+    return {"milestones_ms": dict(phases), "durations_ms": dict(durations)}
+
+
+def log_report():
+    if STARTUP_PROFILE:
+        print(f"Startup profile: {json.dumps(report())}")
@@ -0,0 +1,197 @@
+from abc import ABC, abstractmethod
+from typing import Dict, List, Optional, Tuple
+
+# Columns accepted on violation report inserts (kept in sync with SUPABASE_SCHEMA.sql)
+REPORT_COLUMNS = {
+    'id', 'image_url', 'image_filename', 'extracted_text', 'is_compliant',
+    'status', 'violations_found', 'violation_count', 'violation_context',
+    'ocr_confidence', 'severity_level', 'severity_score', 'text_regions',
+    'latitude', 'longitude', 'zoning_compliance', 'detection_timestamp',
+    'billboard_entity_id', 'ocr_tokens', 'city', 'zone', 'created_at', 'updated_at'
+}
+
+class StorageBackend(ABC):
+    """Storage interface shared by the Supabase and local (SQLite + filesystem) backends.
+
+    Every data method is abstract, so a backend missing one fails when it is constructed."""
+    
+    # ============= IMAGE STORAGE =============
+    @abstractmethod
+    async def upload_image(self, file_data: bytes, filename: str, bucket: str = "billboard-images"):
+        raise NotImplementedError
+    
+    @abstractmethod
+    async def get_image_url(self, filename: str, bucket: str = "billboard-images"):
+        raise NotImplementedError
+    
+    # ============= VIOLATION REPORTS =============
+    @abstractmethod
+    async def create_violation_report(self, report_data: dict):
+        raise NotImplementedError
+    
+    @abstractmethod
+    async def get_violation_reports(self, limit: int = 50, offset: int = 0):
+        raise NotImplementedError
+    
+    @abstractmethod
+    async def get_report_by_id(self, report_id: str):
+        raise NotImplementedError
+    
+    @abstractmethod
+    async def update_report_status(self, report_id: str, status: str) -> Optional[Tuple[Optional[str], Dict]]:
+        """Set a report's status; returns (previous status, stored row) read in the same transaction
+        as the write, so concurrent changes each see their own predecessor (None if no such report)"""
+        raise NotImplementedError
+    
+    @abstractmethod
+    async def update_violation_report(self, report_id: str, updates: Dict) -> Optional[Dict]:
+        raise NotImplementedError
+    
+    # ============= COMPLIANCE MONITORING =============
+    @abstractmethod
+    async def check_zoning_compliance(self, location: Dict, violation_keywords: List[str]) -> Dict:
+        raise NotImplementedError
+    
+    @abstractmethod
+    async def log_compliance_check(self, report_id: str, check_data: Dict):
+        raise NotImplementedError
+    
+    # ============= GEOLOCATION TRACKING =============
+    @abstractmethod
+    async def save_billboard_location(self, location_data: Dict):
+        raise NotImplementedError
+    
+    @abstractmethod
+    async def get_nearby_billboards(self, latitude: float, longitude: float, radius_km: float = 1.0) -> List[Dict]:
+        raise NotImplementedError
+    
+    # ============= CITIZEN ENGAGEMENT =============
+    @abstractmethod
+    async def submit_citizen_report(self, citizen_report: Dict):
+        raise NotImplementedError
+    
+    @abstractmethod
+    async def validate_citizen_report(self, citizen_report_id: str, validator_id: str) -> Dict:
+        raise NotImplementedError
+    
+    @abstractmethod
+    async def get_citizen_reports(self, billboard_id: Optional[str] = None, limit: int = 50) -> List[Dict]:
+        raise NotImplementedError
+    
+    # ============= BILLBOARD ENTITIES =============
+    @abstractmethod
+    async def get_billboards_in_cells(self, cell_keys: List[str]) -> List[Dict]:
+        raise NotImplementedError
+    
+    @abstractmethod
+    async def create_billboard(self, billboard_data: Dict) -> Optional[Dict]:
+        raise NotImplementedError
+    
+    @abstractmethod
+    async def update_billboard(self, billboard_id: str, updates: Dict) -> Optional[Dict]:
+        raise NotImplementedError
+    
+    @abstractmethod
+    async def record_billboard_sighting(self, billboard_id: str, sighting: Dict, delta: int = 1) -> Optional[Dict]:
+        """Atomically add (delta=1) or retract (delta=-1) one sighting: report_count and the running-mean
+        position are computed by the database; returns the stored row (None if missing or deleted at zero)"""
+        raise NotImplementedError
+    
+    @abstractmethod
+    async def get_billboards(self, limit: int = 50, offset: int = 0) -> List[Dict]:
+        raise NotImplementedError
+    
+    @abstractmethod
+    async def get_billboard(self, billboard_id: str) -> Optional[Dict]:
+        raise NotImplementedError
+    
+    @abstractmethod
+    async def get_billboard_reports(self, billboard_id: str, limit: int = 50, offset: int = 0) -> List[Dict]:
+        raise NotImplementedError
+    
+    # ============= BULK ACCESS =============
+    @abstractmethod
+    async def get_reports_after(self, after_id: Optional[str] = None, limit: int = 1000, columns: str = "*") -> List[Dict]:
+        """Keyset pagination over violation reports ordered by id (for backfills)"""
+        raise NotImplementedError
+    
+    @abstractmethod
+    async def apply_report_rescore(self, updates: List[Tuple[str, Dict]], rollup_rows: List[Tuple],
+                                   tile_increments: List[Tuple[List[Tuple[int, int, int]], Dict]]) -> bool:
+        """Write re-scored outcomes and their rollup/tile increments atomically (all or nothing)"""
+        raise NotImplementedError
+    
+    # ============= TILE AGGREGATES =============
+    @abstractmethod
+    async def increment_tile_aggregates(self, cells: List[Tuple[int, int, int]], delta: Dict):
+        raise NotImplementedError
+    
+    @abstractmethod
+    async def get_tile_aggregates(self, level: int, x_min: int, x_max: int, y_min: int, y_max: int) -> List[Dict]:
+        raise NotImplementedError
+    
+    @abstractmethod
+    async def clear_tile_aggregates(self):
+        raise NotImplementedError
+    
+    # ============= SEARCH =============
+    @abstractmethod
+    async def search_reports(self, terms: List[str], mode: str = "words", status: Optional[str] = None,
+                             severity: Optional[str] = None, bbox: Optional[Tuple[float, float, float, float]] = None,
+                             after: Optional[Tuple[str, str]] = None, limit: int = 20) -> List[Dict]:
+        raise NotImplementedError
+    
+    # ============= TREND ROLLUPS =============
+    @abstractmethod
+    async def increment_report_rollups(self, rows: List[Tuple]):
+        raise NotImplementedError
+    
+    @abstractmethod
+    async def get_report_rollups(self, granularity: str, dimension: str, first_bucket: str, last_bucket: str,
+                                 value: Optional[str] = None) -> List[Dict]:
+        raise NotImplementedError
+    
+    @abstractmethod
+    async def clear_report_rollups(self):
+        raise NotImplementedError
+    
+    # ============= STATISTICS & DASHBOARD =============
+    @abstractmethod
+    async def get_statistics(self) -> Dict:
+        raise NotImplementedError
+    
+    async def close(self):
+        """Release connections (called on application shutdown)"""
+        return None
+    
+    # ============= SHARED HELPERS =============
+    def _check_location_in_zone(self, lat: float, lon: float, zone: Dict) -> bool:
+        """Simple location check (expand with actual geo-bounds logic)"""
+        # Placeholder: check if location is within zone bounds
+        return True
+    
+    def _calculate_distance(self, lat1: float, lon1: float, lat2: float, lon2: float) -> float:
+        """Calculate distance between two coordinates in kilometers (Haversine formula)"""
+        from math import radians, cos, sin, asin, sqrt
+        
+        lon1, lat1, lon2, lat2 = map(radians, [lon1, lat1, lon2, lat2])
+        dlon = lon2 - lon1
+        dlat = lat2 - lat1
+        a = sin(dlat/2)**2 + cos(lat1) * cos(lat2) * sin(dlon/2)**2
+        c = 2 * asin(sqrt(a))
+        r = 6371  # Radius of earth in kilometers
+        return c * r
+    
+    def _calculate_avg_severity(self, reports: List[Dict]) -> float:
+        """Calculate average severity across reports"""
+        if not reports:
+            return 0.0
+        
+        severities = []
+        severity_map = {"Critical": 9, "High": 6, "Medium": 4, "Low": 2, "None": 0}
+        
+        for report in reports:
+            level = report.get("severity_level", "None")
+            severities.append(severity_map.get(level, 0))
+        
+        return round(sum(severities) / len(severities), 2) if severities else 0.0
@@ -0,0 +1,126 @@
+import json
+import os
+import random
+import cv2
+import numpy as np
+from typing import Dict, List, Optional, Sequence, Tuple
+from config import VIOLATION_KEYWORDS
+
+# Neutral advertising vocabulary used to fill billboard copy around (optional) violation keywords
+FILLER_WORDS = [
+    "summer", "sale", "fresh", "coffee", "city", "bank", "open", "today", "new", "store",
+    "best", "prices", "family", "travel", "visit", "call", "now", "free", "delivery", "club",
+    "music", "festival", "phone", "online", "shop", "weekend", "deals", "auto", "repair", "pizza",
+]
+RESOLUTIONS = [(640, 360), (1280, 720), (1920, 1080)]
+NOISE_LEVELS = [0.0, 8.0, 20.0]  # Gaussian sigma in 8-bit intensity units
+PERSPECTIVE_LEVELS = [0.0, 0.05, 0.12]  # Max corner displacement as a fraction of image size
+FONTS = [cv2.FONT_HERSHEY_SIMPLEX, cv2.FONT_HERSHEY_DUPLEX, cv2.FONT_HERSHEY_TRIPLEX]
+
+
+class SyntheticBillboardCorpus:
+    """Deterministic generator of rendered billboard images with keyword ground truth"""
+
+    def __init__(self, seed: int = 42, keywords: Optional[Sequence[str]] = None, keyword_ratio: float = 0.5):
+        self.seed = seed
+        self.keywords = [kw.strip().lower() for kw in (keywords or VIOLATION_KEYWORDS) if kw.strip()]
+        self.keyword_ratio = keyword_ratio
+
+    def _copy(self, rng: random.Random) -> Tuple[List[List[str]], List[str]]:
+        """Build 1-3 lines of billboard copy and the keywords planted in it"""
+        planted = []
+        if rng.random() < self.keyword_ratio:
+            planted = rng.sample(self.keywords, k=min(len(self.keywords), rng.choice([1, 1, 2])))
+        lines = []
+        for _ in range(rng.randint(1, 3)):
+            lines.append([rng.choice(FILLER_WORDS) for _ in range(rng.randint(2, 4))])
+        for keyword in planted:
+            line = rng.choice(lines)
+            line.insert(rng.randint(0, len(line)), keyword)
+        return lines, sorted(planted)
+
+    def _render(self, rng: random.Random, lines: List[List[str]], size: Tuple[int, int], noise: float, perspective: float) -> np.ndarray:
+        width, height = size
+        background = tuple(rng.randint(0, 90) for _ in range(3)) if rng.random() < 0.5 else tuple(rng.randint(170, 255) for _ in range(3))
+        foreground = tuple(255 - c for c in background)
+        img = np.full((height, width, 3), background, dtype=np.uint8)
+
+        font = rng.choice(FONTS)
+        longest = max(len(" ".join(line)) for line in lines)
+        # Fit the longest line to ~85% of the board width
+        scale = max(0.4, (width * 0.85) / (longest * 22))
+        thickness = max(1, int(scale * 2))
+        line_height = int(40 * scale)
+        top = (height - line_height * len(lines)) // 2 + line_height
+        for index, line in enumerate(lines):
+            text = " ".join(line).upper() if rng.random() < 0.5 else " ".join(line)
+            (text_w, _), _ = cv2.getTextSize(text, font, scale, thickness)
+            origin = (max(5, (width - text_w) // 2), top + index * line_height)
+            cv2.putText(img, text, origin, font, scale, foreground, thickness, cv2.LINE_AA)
+
+        if perspective > 0:
+            dx, dy = width * perspective, height * perspective
+            src = np.float32([[0, 0], [width, 0], [width, height], [0, height]])
+            dst = np.float32([[x + rng.uniform(-dx, dx), y + rng.uniform(-dy, dy)] for x, y in src])
+            matrix = cv2.getPerspectiveTransform(src, dst)
+            img = cv2.warpPerspective(img, matrix, (width, height), borderValue=background)
+
+        if noise > 0:
+            np_rng = np.random.default_rng(rng.randint(0, 2 ** 31))
+            noisy = img.astype(np.float32) + np_rng.normal(0, noise, img.shape)
+            img = np.clip(noisy, 0, 255).astype(np.uint8)
+        return img
+
+    def generate(self, count: int, resolutions: Sequence[Tuple[int, int]] = RESOLUTIONS,
+                 noise_levels: Sequence[float] = NOISE_LEVELS, perspective_levels: Sequence[float] = PERSPECTIVE_LEVELS,
+                 image_format: str = ".jpg") -> List[Dict]:
+        """Generate `count` samples; each has encoded image bytes and ground truth"""
+        rng = random.Random(self.seed)
+        samples = []
+        for index in range(count):
+            size = resolutions[index % len(resolutions)]
+            noise = rng.choice(noise_levels)
+            perspective = rng.choice(perspective_levels)
+            lines, planted = self._copy(rng)
+            img = self._render(rng, lines, size, noise, perspective)
+            ok, encoded = cv2.imencode(image_format, img)
+            if not ok:
+                raise ValueError(f"Could not encode synthetic image as {image_format}")
+            samples.append({
+                "id": f"synthetic-{self.seed}-{index:05d}",
+                "image_data": encoded.tobytes(),
+                "text": "\n".join(" ".join(line) for line in lines),
+                "keywords": planted,
+                "width": size[0],
+                "height": size[1],
+                "noise": noise,
+                "perspective": perspective,
+            })
+        return samples
+
+    def write(self, samples: List[Dict], out_dir: str, image_format: str = ".jpg") -> str:
+        """Write images plus a manifest.json with ground truth; returns the manifest path"""
+        os.makedirs(out_dir, exist_ok=True)
+        manifest = []
+        for sample in samples:
+            filename = f"{sample['id']}{image_format}"
+            with open(os.path.join(out_dir, filename), "wb") as f:
+                f.write(sample["image_data"])
+            entry = {k: v for k, v in sample.items() if k != "image_data"}
+            entry["filename"] = filename
+            manifest.append(entry)
+        manifest_path = os.path.join(out_dir, "manifest.json")
+        with open(manifest_path, "w") as f:
+            json.dump({"seed": self.seed, "samples": manifest}, f, indent=2)
+        return manifest_path
+
+
+def load_corpus(out_dir: str) -> List[Dict]:
+    """Load a corpus previously written with SyntheticBillboardCorpus.write"""
+    with open(os.path.join(out_dir, "manifest.json")) as f:
+        manifest = json.load(f)
+    samples = []
+    for entry in manifest["samples"]:
+        with open(os.path.join(out_dir, entry["filename"]), "rb") as f:
+            samples.append({**entry, "image_data": f.read()})
+    return samples
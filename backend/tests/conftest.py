@@ -0,0 +1,15 @@
+import os
+import sys
+import tempfile
+
+# Tests import the backend modules the way main.py does (flat, from the backend directory)
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# API tests run main against the in-memory backend, with nothing shared with a real deployment
+_scratch = tempfile.mkdtemp(prefix="billboard-tests-")
+os.environ.update({
+    "STORAGE_BACKEND": "memory",
+    "LOCAL_BLOB_DIR": os.path.join(_scratch, "blobs"),
+    "RESULT_CACHE_ENABLED": "false",
+    "STARTUP_WARMUP": "false",
+})
@@ -0,0 +1,142 @@
+import asyncio
+import math
+
+import pytest
+from clustering import (
+    METERS_PER_DEGREE, BillboardClusterer, MinHasher, cell_key, distance_meters, grid_cell, neighbor_keys,
+)
+from config import BILLBOARD_CELL_METERS
+from local_db import LocalDB
+
+TEXT = "Cold beer and cheap liquor open late"
+
+
+def report(latitude, longitude, text=TEXT, severity="High"):
+    return {"latitude": latitude, "longitude": longitude, "extracted_text": text, "severity_level": severity}
+
+
+def run(coroutine_fn):
+    return asyncio.run(coroutine_fn(LocalDB(":memory:")))
+
+
+def offset(latitude, longitude, north_m=0.0, east_m=0.0):
+    """Point moved by a few meters (flat-earth approximation)"""
+    return (latitude + north_m / METERS_PER_DEGREE,
+            longitude + east_m / (METERS_PER_DEGREE * math.cos(math.radians(latitude))))
+
+
+# ============= MINHASH =============
+def test_minhash_similarity_estimates_token_overlap():
+    hasher = MinHasher()
+    a = hasher.signature(hasher.tokens(TEXT))
+    assert hasher.similarity(a, hasher.signature(hasher.tokens(TEXT.upper()))) == 1.0
+    assert hasher.similarity(a, hasher.signature(hasher.tokens("Vote for Smith on Tuesday"))) < 0.2
+    assert hasher.signature(hasher.tokens("a b !")) is None  # No tokens of 3+ characters
+
+
+def test_minhash_is_stable_across_instances():
+    assert MinHasher().signature({"beer", "liquor"}) == MinHasher().signature({"beer", "liquor"})
+
+
+# ============= SPATIAL GRID =============
+def test_neighbor_keys_cover_the_3x3_block_around_a_point():
+    keys = neighbor_keys(40.7, -74.0)
+    row, col = grid_cell(40.7, -74.0)
+    assert len(keys) == len(set(keys)) == 9
+    assert cell_key((row, col)) in keys
+    dlat = BILLBOARD_CELL_METERS / METERS_PER_DEGREE
+    for r in (row - 1, row, row + 1):
+        # Each row has its own longitude width, so the point's column is found per row
+        _, c = grid_cell((r + 0.5) * dlat, -74.0)
+        assert {cell_key((r, c - 1)), cell_key((r, c)), cell_key((r, c + 1))} <= set(keys)
+
+
+def test_points_a_few_meters_apart_across_a_cell_border_are_neighbours():
+    row, _ = grid_cell(40.7, -74.0)
+    dlat = BILLBOARD_CELL_METERS / METERS_PER_DEGREE
+    border = (row + 1) * dlat  # Northern edge of the cell
+    south, north = (border - 2 / METERS_PER_DEGREE, -74.0), (border + 2 / METERS_PER_DEGREE, -74.0)
+    assert grid_cell(*south) != grid_cell(*north)
+    assert cell_key(grid_cell(*north)) in neighbor_keys(*south)
+    assert distance_meters(*south, *north) == pytest.approx(4.0, abs=0.1)
+
+
+# ============= ASSIGNMENT =============
+def test_photos_of_one_billboard_share_an_entity():
+    async def scenario(storage):
+        clusterer = BillboardClusterer(storage)
+        first = await clusterer.assign(report(40.7, -74.0))
+        second = await clusterer.assign(report(*offset(40.7, -74.0, north_m=10)))
+        return first, second, await storage.get_billboard(first)
+
+    first, second, billboard = run(scenario)
+    assert first == second
+    assert billboard["report_count"] == 2
+    assert billboard["latitude"] == pytest.approx(40.7 + 5 / METERS_PER_DEGREE)  # Running mean of the sightings
+
+
+def test_a_billboard_in_the_neighbouring_cell_is_matched():
+    async def scenario(storage):
+        row, _ = grid_cell(40.7, -74.0)
+        border = (row + 1) * BILLBOARD_CELL_METERS / METERS_PER_DEGREE
+        clusterer = BillboardClusterer(storage)
+        south = await clusterer.assign(report(border - 3 / METERS_PER_DEGREE, -74.0))
+        north = await clusterer.assign(report(border + 3 / METERS_PER_DEGREE, -74.0))
+        return south, north
+
+    south, north = run(scenario)
+    assert south == north
+
+
+def test_distant_or_different_billboards_get_their_own_entities():
+    async def scenario(storage):
+        clusterer = BillboardClusterer(storage)
+        base = await clusterer.assign(report(40.7, -74.0))
+        far = await clusterer.assign(report(*offset(40.7, -74.0, east_m=200)))
+        other_text = await clusterer.assign(report(40.7, -74.0, text="Vote for Smith on Tuesday"))
+        no_location = await clusterer.assign({"extracted_text": TEXT})
+        return base, far, other_text, no_location
+
+    base, far, other_text, no_location = run(scenario)
+    assert len({base, far, other_text}) == 3
+    assert no_location is None
+
+
+def test_clusterers_sharing_storage_see_each_others_billboards():
+    async def scenario(storage):
+        first = await BillboardClusterer(storage).assign(report(40.7, -74.0))
+        second = await BillboardClusterer(storage).assign(report(*offset(40.7, -74.0, east_m=5)))
+        return first, second, await storage.get_billboard(first)
+
+    first, second, billboard = run(scenario)
+    assert first == second and billboard["report_count"] == 2
+
+
+# ============= RELEASE =============
+def test_release_takes_back_a_sighting():
+    async def scenario(storage):
+        clusterer = BillboardClusterer(storage)
+        kept = report(40.7, -74.0)
+        failed = report(*offset(40.7, -74.0, north_m=20))
+        billboard_id = await clusterer.assign(kept)
+        assert await clusterer.assign(failed) == billboard_id
+        await clusterer.release(billboard_id, failed)
+        return await storage.get_billboard(billboard_id)
+
+    billboard = run(scenario)
+    assert billboard["report_count"] == 1
+    assert billboard["latitude"] == pytest.approx(40.7)
+
+
+def test_releasing_the_only_sighting_deletes_the_billboard():
+    async def scenario(storage):
+        clusterer = BillboardClusterer(storage)
+        first = await clusterer.assign(report(40.7, -74.0))
+        await clusterer.release(first, report(40.7, -74.0))
+        deleted = await storage.get_billboard(first)
+        again = await clusterer.assign(report(40.7, -74.0))  # Not matched to the deleted entity
+        return first, deleted, again, await storage.get_billboard(again)
+
+    first, deleted, again, billboard = run(scenario)
+    assert deleted is None
+    assert again != first and billboard["report_count"] == 1
@@ -0,0 +1,113 @@
+import gzip
+import json
+
+import pytest
+from starlette.applications import Starlette
+from starlette.responses import JSONResponse, Response, StreamingResponse
+from starlette.routing import Route
+from starlette.testclient import TestClient
+import compression
+from compression import CompressionMiddleware, _accepts
+
+LARGE = {"items": [{"id": i, "text": "alcohol tobacco gambling"} for i in range(200)]}
+
+
+def stream(request):
+    def chunks():
+        yield b'{"items":['
+        for i in range(200):
+            yield (b"," if i else b"") + json.dumps({"id": i}).encode()
+        yield b"]}"
+    return StreamingResponse(chunks(), media_type="application/json")
+
+
+APP = Starlette(routes=[
+    Route("/large", lambda request: JSONResponse(LARGE)),
+    Route("/small", lambda request: JSONResponse({"ok": True})),
+    Route("/image", lambda request: Response(b"\x89PNG" + b"\x00" * 4096, media_type="image/png")),
+    Route("/encoded", lambda request: Response(gzip.compress(b"x" * 4096), media_type="text/plain",
+                                               headers={"Content-Encoding": "gzip"})),
+    Route("/stream", stream),
+])
+
+
+@pytest.fixture
+def client():
+    return TestClient(CompressionMiddleware(APP, minimum_size=1024))
+
+
+def raw_get(client, path, accept):
+    """Response without the client's transparent decoding"""
+    with client.stream("GET", path, headers={"Accept-Encoding": accept}) as response:
+        return response, b"".join(response.iter_raw())
+
+
+@pytest.mark.parametrize("header, expected", [
+    ("gzip, deflate, br", True),
+    ("GZIP;q=0.5", True),
+    ("gzip;q=0", False),
+    ("deflate", False),
+    ("", False),
+])
+def test_accepts(header, expected):
+    assert _accepts(header, "gzip") is expected
+
+
+def test_gzip_is_used_when_brotli_is_not_accepted(client):
+    response, raw = raw_get(client, "/large", "gzip")
+    assert response.headers["content-encoding"] == "gzip"
+    assert int(response.headers["content-length"]) == len(raw)
+    assert "Accept-Encoding" in response.headers["vary"]
+    assert json.loads(gzip.decompress(raw)) == LARGE
+
+
+def test_brotli_is_preferred_when_installed_and_accepted(client):
+    brotli = pytest.importorskip("brotli")
+    response, raw = raw_get(client, "/large", "gzip, br")
+    assert response.headers["content-encoding"] == "br"
+    assert json.loads(brotli.decompress(raw)) == LARGE
+
+
+def test_gzip_fallback_when_brotli_is_missing(client, monkeypatch):
+    monkeypatch.setattr(compression, "brotli", None)
+    response, raw = raw_get(client, "/large", "br, gzip")
+    assert response.headers["content-encoding"] == "gzip"
+    assert json.loads(gzip.decompress(raw)) == LARGE
+
+
+def test_brotli_only_clients_get_identity_when_brotli_is_missing(client, monkeypatch):
+    monkeypatch.setattr(compression, "brotli", None)
+    response, raw = raw_get(client, "/large", "br")
+    assert "content-encoding" not in response.headers
+    assert json.loads(raw) == LARGE
+
+
+def test_small_bodies_pass_through(client):
+    response, raw = raw_get(client, "/small", "gzip, br")
+    assert "content-encoding" not in response.headers
+    assert json.loads(raw) == {"ok": True}
+
+
+def test_non_text_content_passes_through(client):
+    response, raw = raw_get(client, "/image", "gzip")
+    assert "content-encoding" not in response.headers
+    assert raw.startswith(b"\x89PNG")
+
+
+def test_already_encoded_responses_pass_through(client):
+    response, raw = raw_get(client, "/encoded", "gzip")
+    assert response.headers["content-encoding"] == "gzip"
+    assert gzip.decompress(raw) == b"x" * 4096  # Not compressed twice
+
+
+def test_no_accept_encoding_means_identity(client):
+    response, raw = raw_get(client, "/large", "identity")
+    assert "content-encoding" not in response.headers
+    assert json.loads(raw) == LARGE
+
+
+def test_streamed_responses_are_compressed_incrementally(client):
+    response, raw = raw_get(client, "/stream", "gzip")
+    assert response.headers["content-encoding"] == "gzip"
+    assert "content-length" not in response.headers
+    assert json.loads(gzip.decompress(raw)) == {"items": [{"id": i} for i in range(200)]}
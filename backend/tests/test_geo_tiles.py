@@ -0,0 +1,130 @@
+import asyncio
+
+import pytest
+from fastapi.testclient import TestClient
+import main
+from config import TILE_BIN_BITS, TILE_MAX_ZOOM
+from geo_tiles import TileService, lat_lon_to_tile, report_cells, report_delta, update_deltas
+from local_db import LocalDB
+
+
+def report(report_id, latitude=40.7, longitude=-74.0, severity_level="High", score=7, compliant=False):
+    return {"id": report_id, "latitude": latitude, "longitude": longitude, "severity_level": severity_level,
+            "severity_score": score, "is_compliant": compliant}
+
+
+# ============= TILE MATH =============
+def test_report_cells_nest_from_level_zero_down():
+    cells = report_cells(40.7, -74.0)
+    assert len(cells) == TILE_MAX_ZOOM + TILE_BIN_BITS + 1
+    assert cells[0] == (0, 0, 0)
+    for (level, x, y), (child_level, child_x, child_y) in zip(cells, cells[1:]):
+        assert child_level == level + 1 and (child_x >> 1, child_y >> 1) == (x, y)
+    assert cells[12] == (12, *lat_lon_to_tile(40.7, -74.0, 12))
+
+
+def test_report_delta():
+    assert report_delta(report("a")) == {"report_count": 1, "violation_count": 1, "severity_sum": 7.0,
+                                          "max_severity": 7.0, "high": 1}
+    assert report_delta(report("b", severity_level="None", score=0, compliant=True))["violation_count"] == 0
+
+
+def test_update_deltas_move_a_rescored_report():
+    before = [report("a"), {**report("b"), "latitude": None}]
+    after = [{"id": "a", "severity_level": "Low", "severity_score": 2, "is_compliant": False},
+             {"id": "b", "severity_level": "Low", "severity_score": 2}]
+    (cells, delta), = update_deltas(before, after)  # Unlocated reports have no tiles to move
+    assert cells == report_cells(40.7, -74.0)
+    assert delta == {"severity_sum": -5.0, "high": -1, "low": 1, "max_severity": 2.0}
+
+
+# ============= AGGREGATES =============
+def test_reports_increment_every_level_and_fill_the_tile():
+    async def scenario():
+        storage = LocalDB(":memory:")
+        tiles = TileService(storage)
+        await tiles.add_report(report("a"))
+        await tiles.add_report(report("b", severity_level="Low", score=2))
+        await tiles.add_report(report("c", latitude=-33.9, longitude=151.2))
+        await tiles.add_report({"id": "d", "severity_score": 9})  # No location: not on the map
+        z = 10
+        x, y = lat_lon_to_tile(40.7, -74.0, z)
+        return (await tiles.get_tile(0, 0, 0))[1], (await tiles.get_tile(z, x, y))[1]
+
+    world, tile = asyncio.run(scenario())
+    assert world["total"]["count"] == 3
+    assert tile["total"] == {"count": 2, "violations": 2, "avg_severity": 4.5, "max_severity": 7.0,
+                             "by_level": {"Critical": 0, "High": 1, "Medium": 0, "Low": 1}}
+    assert tile["bins_per_side"] == 1 << TILE_BIN_BITS
+    assert sum(b["count"] for b in tile["bins"]) == 2
+    assert all(0 <= b["bx"] < tile["bins_per_side"] and 0 <= b["by"] < tile["bins_per_side"] for b in tile["bins"])
+
+
+def test_etag_changes_only_when_the_tile_changes():
+    async def scenario():
+        storage = LocalDB(":memory:")
+        tiles = TileService(storage)
+        z = 8
+        x, y = lat_lon_to_tile(40.7, -74.0, z)
+        empty = await tiles.current_etag(z, x, y)
+        await tiles.add_report(report("a"))
+        first, payload = await tiles.get_tile(z, x, y)
+        again, cached = await tiles.get_tile(z, x, y)
+        await tiles.add_report(report("far", latitude=-33.9, longitude=151.2))  # Another tile
+        unchanged = await tiles.current_etag(z, x, y)
+        await tiles.add_report(report("b"))
+        changed = await tiles.current_etag(z, x, y)
+        return empty, first, again, payload, cached, unchanged, changed
+
+    empty, first, again, payload, cached, unchanged, changed = asyncio.run(scenario())
+    assert empty != first
+    assert again == first and cached is payload  # Served from the payload cache
+    assert unchanged == first
+    assert changed != first
+
+
+def test_backfill_refuses_to_double_count():
+    async def scenario():
+        storage = LocalDB(":memory:")
+        tiles = TileService(storage)
+        for report_id in ("a", "b"):
+            stored = await storage.create_violation_report(report(report_id))
+            await tiles.add_report(stored)
+        with pytest.raises(ValueError):
+            await tiles.backfill(reset=False)
+        await tiles.backfill()
+        return (await tiles.get_tile(0, 0, 0))[1]["total"]["count"]
+
+    assert asyncio.run(scenario()) == 2
+
+
+# ============= ENDPOINT =============
+@pytest.fixture(scope="module")
+def client():
+    with TestClient(main.app) as client:
+        yield client
+
+
+def test_tile_endpoint_revalidates_with_if_none_match(client):
+    latitude, longitude, z = -12.05, -77.04, 12
+    x, y = lat_lon_to_tile(latitude, longitude, z)
+    asyncio.run(main.tile_service.add_report(report("lima-1", latitude, longitude)))
+
+    response = client.get(f"/api/tiles/{z}/{x}/{y}")
+    assert response.status_code == 200
+    etag = response.headers["etag"]
+    assert response.json()["tile"]["total"]["count"] == 1
+    assert "max-age" in response.headers["cache-control"]
+
+    not_modified = client.get(f"/api/tiles/{z}/{x}/{y}", headers={"If-None-Match": f'"other", {etag}'})
+    assert not_modified.status_code == 304 and not_modified.headers["etag"] == etag and not not_modified.content
+
+    asyncio.run(main.tile_service.add_report(report("lima-2", latitude, longitude)))
+    modified = client.get(f"/api/tiles/{z}/{x}/{y}", headers={"If-None-Match": etag})
+    assert modified.status_code == 200 and modified.headers["etag"] != etag
+    assert modified.json()["tile"]["total"]["count"] == 2
+
+
+@pytest.mark.parametrize("path", [f"/api/tiles/{TILE_MAX_ZOOM + 1}/0/0", "/api/tiles/2/4/0", "/api/tiles/2/0/-1"])
+def test_tile_endpoint_rejects_invalid_coordinates(client, path):
+    assert client.get(path).status_code == 400
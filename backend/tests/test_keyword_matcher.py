@@ -0,0 +1,69 @@
+import pytest
+from keyword_matcher import KeywordMatcher, edit_distance, normalize_token
+
+KEYWORDS = ["nude", "adult", "gambling", "alcohol", "tobacco", "drugs", "weapons", "unauthorized", "prohibited"]
+
+
+@pytest.fixture(scope="module")
+def matcher():
+    return KeywordMatcher(KEYWORDS, max_distance=2, min_fuzzy_length=7, fuzzy=True, dictionary=())
+
+
+def keywords_in(matcher, text):
+    return [keyword for _, keyword in matcher.find(text.lower().split())]
+
+
+def test_normalize_token_maps_ocr_confusions():
+    assert normalize_token("DRUG5") == "drugs"
+    assert normalize_token("a1coh0l") == "alcohol"
+    assert normalize_token("$ale@") == "salea"
+
+
+def test_edit_distance_counts_transpositions_once():
+    assert edit_distance("alcohol", "alcohol", 1) == 0
+    assert edit_distance("alochol", "alcohol", 2) == 1
+    assert edit_distance("tobacco", "xx", 1) == 2  # Length gap alone exceeds the limit
+
+
+@pytest.mark.parametrize("text, expected", [
+    ("cheap drugs here", ["drugs"]),
+    ("DRUG5 sold", ["drugs"]),             # OCR confusion, exact after normalization
+    ("a1coh0l", ["alcohol"]),
+    ("alcohoI", ["alcohol"]),              # One edit on a 7-letter keyword
+    ("gamb1ing tonight", ["gambling"]),
+    ("gamb ling", ["gambling"]),           # Split by OCR, joined exactly
+    ("n ude", ["nude"]),
+    ("weapon", ["weapons"]),
+    ("unauthorised", ["unauthorized"]),
+    ("prohibted", ["prohibited"]),
+    ("tobaco", ["tobacco"]),
+])
+def test_matches_ocr_noise(matcher, text, expected):
+    assert keywords_in(matcher, text) == expected
+
+
+@pytest.mark.parametrize("text", [
+    "drums", "drags", "dregs",            # One edit from a short keyword
+    "dry rugs",                           # Join plus an edit
+    "prohibits", "prohibits.", "prohibit",
+    "rambling", "ambling",
+    "adapt", "dude",
+    "nudge",
+    "buy our coffee today",
+])
+def test_rejects_real_words(matcher, text):
+    assert keywords_in(matcher, text) == []
+
+
+def test_dictionary_words_only_match_exactly():
+    matcher = KeywordMatcher(KEYWORDS, max_distance=2, min_fuzzy_length=7, fuzzy=True, dictionary=["weapon"])
+    assert keywords_in(matcher, "weapon") == []
+    assert keywords_in(matcher, "weapons") == ["weapons"]
+    assert keywords_in(matcher, "weap0ns") == ["weapons"]
+
+
+def test_fuzzy_disabled_is_exact_substring():
+    matcher = KeywordMatcher(KEYWORDS, fuzzy=False, dictionary=())
+    assert keywords_in(matcher, "alcohoI") == []
+    assert keywords_in(matcher, "gamb ling") == []
+    assert keywords_in(matcher, "alcoholic") == ["alcohol"]
@@ -0,0 +1,46 @@
+import pytest
+from ocr_tokens import TOKENS_FORMAT, pack_tokens, unpack_tokens
+
+
+def test_round_trip():
+    tokens = [("NO", 91, 10, 20, 30, 40), ("SMOKING", 87, 50, 20, 120, 40)]
+    assert unpack_tokens(pack_tokens(tokens)) == tokens
+
+
+def test_round_trip_at_the_limits():
+    tokens = [("a", 0, 0, 0, 0, 0), ("b", 100, 65535, 65535, 65535, 65535)]
+    assert unpack_tokens(pack_tokens(tokens)) == tokens
+
+
+def test_values_out_of_range_are_clamped():
+    assert unpack_tokens(pack_tokens([("x", 150, -1, 70000, 5, 5)])) == [("x", 100, 0, 65535, 5, 5)]
+    assert unpack_tokens(pack_tokens([("x", -10, 1, 1, 1, 1)])) == [("x", 0, 1, 1, 1, 1)]
+
+
+def test_whitespace_inside_words_is_removed_and_blank_words_are_dropped():
+    tokens = [("sa le", 80, 1, 2, 3, 4), (" ", 10, 5, 6, 7, 8), ("", 10, 5, 6, 7, 8), ("now", 70, 9, 10, 11, 12)]
+    assert unpack_tokens(pack_tokens(tokens)) == [("sale", 80, 1, 2, 3, 4), ("now", 70, 9, 10, 11, 12)]
+
+
+def test_empty_input():
+    packed = pack_tokens([])
+    assert packed == {"format": TOKENS_FORMAT, "words": "", "conf": "", "boxes": ""}
+    assert unpack_tokens(packed) == []
+
+
+@pytest.mark.parametrize("value", [None, {}])
+def test_unpack_of_nothing_is_empty(value):
+    assert unpack_tokens(value) == []
+
+
+def test_unknown_format_is_rejected():
+    with pytest.raises(ValueError, match="Unknown OCR token format"):
+        unpack_tokens({"format": "ocr-v0", "words": "", "conf": "", "boxes": ""})
+
+
+@pytest.mark.parametrize("field", ["conf", "boxes"])
+def test_bad_base64_is_rejected(field):
+    packed = pack_tokens([("word", 50, 1, 2, 3, 4)])
+    packed[field] = "not base64!"
+    with pytest.raises(ValueError):  # binascii.Error is a ValueError
+        unpack_tokens(packed)
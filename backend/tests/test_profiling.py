@@ -0,0 +1,103 @@
+import pytest
+from fastapi.testclient import TestClient
+import main
+import profiling
+from profiling import ProfileStore
+
+TOKEN = "test-admin-token"
+ADMIN = {"X-Admin-Token": TOKEN}
+IMAGE = {"file": ("sign.jpg", b"\xff\xd8not-a-real-jpeg", "image/jpeg")}
+ADMIN_REQUESTS = [
+    ("GET", "/api/admin/profiles"),
+    ("GET", "/api/admin/profiles/20240101T000000-0123abcd"),
+    ("GET", "/api/admin/profiles/20240101T000000-0123abcd/download"),
+    ("PUT", "/api/admin/profiling?sample_rate=1"),
+]
+
+
+@pytest.fixture(scope="module")
+def client():
+    with TestClient(main.app) as client:
+        yield client
+
+
+@pytest.fixture
+def admin_enabled(monkeypatch, tmp_path):
+    """ADMIN_TOKEN configured, profiles stored under tmp_path, no sampling"""
+    async def analysis(image_data, priority=None, source="anonymous"):
+        return {"analysis_complete": True, "is_compliant": True, "status": "compliant", "extracted_text": "Fresh bread",
+                "violations_found": [], "violation_count": 0, "severity_level": "None", "severity_score": 0}
+
+    monkeypatch.setattr(profiling, "ADMIN_TOKEN", TOKEN)
+    monkeypatch.setattr(profiling, "profile_store", ProfileStore(str(tmp_path)))
+    monkeypatch.setattr(main, "run_analysis", analysis)
+    rate = profiling.get_sample_rate()
+    profiling.set_sample_rate(0.0)
+    yield profiling.profile_store
+    profiling.set_sample_rate(rate)
+
+
+# ============= ACCESS =============
+@pytest.mark.parametrize("method, path", ADMIN_REQUESTS)
+def test_admin_endpoints_are_hidden_without_an_admin_token(client, monkeypatch, method, path):
+    monkeypatch.setattr(profiling, "ADMIN_TOKEN", "")
+    assert client.request(method, path).status_code == 404
+    assert client.request(method, path, headers={"X-Admin-Token": ""}).status_code == 404
+
+
+@pytest.mark.parametrize("method, path", ADMIN_REQUESTS)
+@pytest.mark.parametrize("headers", [{}, {"X-Admin-Token": "wrong"}, {"X-Admin-Token": ""}])
+def test_admin_endpoints_refuse_invalid_tokens(client, admin_enabled, method, path, headers):
+    assert client.request(method, path, headers=headers).status_code == 401
+
+
+def test_is_admin(monkeypatch):
+    assert not profiling.is_admin(TOKEN)  # ADMIN_TOKEN is empty in the test environment
+    monkeypatch.setattr(profiling, "ADMIN_TOKEN", TOKEN)
+    assert profiling.is_admin(TOKEN)
+    assert not profiling.is_admin(None) and not profiling.is_admin(TOKEN + "x")
+
+
+def test_sample_rate_is_changed_by_admins_only(client, admin_enabled):
+    refused = client.put("/api/admin/profiling", params={"sample_rate": 0.5}, headers={"X-Admin-Token": "wrong"})
+    assert refused.status_code == 401 and profiling.get_sample_rate() == 0.0
+    response = client.put("/api/admin/profiling", params={"sample_rate": 0.5}, headers=ADMIN)
+    assert response.status_code == 200 and response.json()["sample_rate"] == 0.5
+
+
+# ============= PROFILED REQUESTS =============
+def test_non_admins_cannot_request_a_profile(client, admin_enabled):
+    response = client.post("/api/analyze", files=IMAGE, headers={"X-Profile": "1", "X-Admin-Token": "wrong"})
+    assert response.status_code == 200
+    assert "x-profile-id" not in response.headers
+    assert admin_enabled.list(10) == []
+
+
+def test_sampled_public_requests_do_not_learn_the_profile_id(client, admin_enabled):
+    profiling.set_sample_rate(1.0)
+    response = client.post("/api/analyze", files=IMAGE)
+    assert response.status_code == 200
+    assert "x-profile-id" not in response.headers
+    stored = client.get("/api/admin/profiles", headers=ADMIN).json()
+    assert stored["count"] == 1  # Profiled all the same, for admins to read
+
+
+def test_admins_get_the_profile_id_and_can_download_it(client, admin_enabled):
+    response = client.post("/api/analyze", files=IMAGE, headers={"X-Profile": "1", **ADMIN})
+    assert response.status_code == 200
+    profile_id = response.headers["x-profile-id"]
+
+    profile = client.get(f"/api/admin/profiles/{profile_id}", headers=ADMIN)
+    assert profile.status_code == 200 and profile.json()["data"]["id"] == profile_id
+    folded = client.get(f"/api/admin/profiles/{profile_id}/download", headers=ADMIN)
+    assert folded.status_code == 200
+    assert client.get(f"/api/admin/profiles/{profile_id}/download", params={"format": "svg"},
+                      headers=ADMIN).status_code == 400
+    assert client.get("/api/admin/profiles/20240101T000000-0123abcd", headers=ADMIN).status_code == 404
+
+
+def test_unprofiled_paths_are_never_profiled(client, admin_enabled):
+    profiling.set_sample_rate(1.0)
+    response = client.get("/api/health", headers={"X-Profile": "1", **ADMIN})
+    assert "x-profile-id" not in response.headers
+    assert admin_enabled.list(10) == []
@@ -0,0 +1,90 @@
+import asyncio
+from datetime import datetime
+
+import pytest
+from fastapi.testclient import TestClient
+import main
+from local_db import LocalDB
+from rollups import RollupService
+
+
+@pytest.fixture
+def client():
+    with TestClient(main.app) as client:
+        yield client
+
+
+def store_report(status="pending"):
+    async def run():
+        report = await main.db.create_violation_report(
+            {"latitude": 1.0, "longitude": 2.0, "severity_score": 3, "status": status, "is_compliant": False}
+        )
+        await main.rollup_service.add_report(report)
+        return report
+    return asyncio.run(run())
+
+
+def status_counts(report):
+    day = report["created_at"][:10]
+    rows = main.db._query(
+        "SELECT value, report_count FROM report_rollups WHERE granularity = 'day' AND dimension = 'status' AND bucket LIKE ?",
+        (day + "%",),
+    )
+    return {row["value"]: row["report_count"] for row in rows if row["report_count"]}
+
+
+def test_status_changes_move_the_rollups(client):
+    report = store_report()
+    before = status_counts(report)
+    for status in ("approved", "resolved", "resolved"):
+        assert client.patch(f"/api/reports/{report['id']}/status", json={"status": status}).status_code == 200
+    after = status_counts(report)
+    assert after.get("pending", 0) == before.get("pending", 0) - 1
+    assert after.get("resolved", 0) == before.get("resolved", 0) + 1
+    assert after.get("approved", 0) == before.get("approved", 0)
+
+
+def test_unknown_report_is_404(client):
+    assert client.patch("/api/reports/missing/status", json={"status": "approved"}).status_code == 404
+
+
+def test_invalid_status_is_400(client):
+    report = store_report()
+    assert client.patch(f"/api/reports/{report['id']}/status", json={"status": "lost"}).status_code == 400
+
+
+def test_update_report_status_returns_the_status_it_replaced():
+    async def run():
+        storage = LocalDB(":memory:")
+        report = await storage.create_violation_report({"status": "pending"})
+        first, second = await asyncio.gather(
+            storage.update_report_status(report["id"], "approved"),
+            storage.update_report_status(report["id"], "resolved"),
+        )
+        return first, second, await storage.update_report_status("missing", "approved")
+
+    first, second, missing = asyncio.run(run())
+    # Whatever order they ran in, each change saw its own predecessor
+    chain = sorted([first, second], key=lambda change: change[0] != "pending")
+    assert chain[0][0] == "pending" and chain[1][0] == chain[0][1]["status"]
+    assert missing is None
+
+
+def test_concurrent_status_changes_keep_the_rollups_consistent():
+    async def change(storage, service, report_id, status):
+        previous_status, updated = await storage.update_report_status(report_id, status)
+        await service.update_report({**updated, "status": previous_status}, updated)
+
+    async def run():
+        storage = LocalDB(":memory:")
+        service = RollupService(storage)
+        report = await storage.create_violation_report({"status": "pending", "created_at": datetime.utcnow().isoformat()})
+        await service.add_report(report)
+        await asyncio.gather(*(change(storage, service, report["id"], status)
+                               for status in ("approved", "resolved", "rejected", "approved")))
+        rows = storage._query("SELECT value, report_count FROM report_rollups WHERE granularity = 'day' AND dimension = 'status'")
+        final = (await storage.get_report_by_id(report["id"]))["status"]
+        return {row["value"]: row["report_count"] for row in rows if row["report_count"]}, final
+
+    counts, final = asyncio.run(run())
+    assert counts == {final: 1}
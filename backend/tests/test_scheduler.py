@@ -0,0 +1,197 @@
+import asyncio
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+from scheduler import AnalysisScheduler, SchedulerRejected
+
+
+@pytest.fixture
+def executor():
+    pool = ThreadPoolExecutor(max_workers=4)
+    yield pool
+    pool.shutdown(wait=True)
+
+
+def make_scheduler(executor, capacity=1, **kwargs):
+    options = {"source_classes": {}, "source_weights": {}, "key_sources": ()}
+    options.update(kwargs)
+    return AnalysisScheduler(executor, capacity=capacity, **options)
+
+
+async def occupy(scheduler, priority="citizen"):
+    """Hold a detection thread until the returned event is set"""
+    release = threading.Event()
+    task = asyncio.ensure_future(scheduler.submit(release.wait, priority=priority, source="blocker"))
+    await asyncio.sleep(0.01)
+    return release, task
+
+
+# ============= CLASSIFICATION =============
+def test_unpinned_sources_default_to_citizen(executor):
+    scheduler = make_scheduler(executor)
+    assert scheduler.classify(None, "10.0.0.1") == "citizen"
+    assert scheduler.classify("interactive", "10.0.0.1") == "citizen"  # Cannot raise itself
+    assert scheduler.classify("bulk", "10.0.0.1") == "bulk"  # May lower itself
+
+
+def test_only_configured_keys_can_be_pinned_up(executor):
+    scheduler = make_scheduler(
+        executor,
+        source_classes={"ops-console": "interactive", "10.0.0.1": "interactive", "10.0.0.2": "bulk"},
+        key_sources={"ops-console"},
+    )
+    assert scheduler.classify(None, "ops-console") == "interactive"
+    assert scheduler.classify(None, "10.0.0.1") == "citizen"
+    assert scheduler.classify("interactive", "10.0.0.2") == "bulk"
+
+
+# ============= FAIR QUEUING =============
+def test_sources_in_one_class_are_served_alternately(executor):
+    order = []
+
+    async def run():
+        scheduler = make_scheduler(executor)
+        release, blocker = await occupy(scheduler)
+        jobs = [scheduler.submit(order.append, "crew", source="crew") for _ in range(6)]
+        jobs += [scheduler.submit(order.append, "citizen", source="citizen") for _ in range(3)]
+        tasks = [asyncio.ensure_future(job) for job in jobs]
+        await asyncio.sleep(0.01)
+        release.set()
+        await asyncio.gather(blocker, *tasks)
+
+    asyncio.run(run())
+    # The crew queued six jobs first, but the second source does not wait behind all of them
+    assert order == ["crew", "citizen"] * 3 + ["crew"] * 3
+
+
+def test_weights_give_a_source_a_larger_share(executor):
+    order = []
+
+    async def run():
+        scheduler = make_scheduler(executor, source_weights={"partner": 2.0})
+        release, blocker = await occupy(scheduler)
+        tasks = [asyncio.ensure_future(scheduler.submit(order.append, source, source=source))
+                 for source in ["other"] * 4 + ["partner"] * 8]
+        await asyncio.sleep(0.01)
+        release.set()
+        await asyncio.gather(blocker, *tasks)
+
+    asyncio.run(run())
+    assert order[:6].count("partner") == 4
+
+
+# ============= CONCURRENCY LIMITS =============
+def test_a_class_never_runs_more_jobs_than_its_limit(executor):
+    lock = threading.Lock()
+    state = {"running": 0, "peak": 0}
+
+    def job():
+        with lock:
+            state["running"] += 1
+            state["peak"] = max(state["peak"], state["running"])
+        time.sleep(0.02)
+        with lock:
+            state["running"] -= 1
+
+    async def run():
+        scheduler = make_scheduler(executor, capacity=4, concurrency={"bulk": 0.5})
+        assert scheduler.classes["bulk"].limit == 2
+        await asyncio.gather(*(scheduler.submit(job, priority="bulk", source="crew") for _ in range(8)))
+        return scheduler
+
+    scheduler = asyncio.run(run())
+    assert state["peak"] == 2
+    assert scheduler.classes["bulk"].completed == 8
+
+
+def test_higher_classes_go_first(executor):
+    order = []
+
+    async def run():
+        scheduler = make_scheduler(executor)
+        release, blocker = await occupy(scheduler)
+        tasks = [asyncio.ensure_future(scheduler.submit(order.append, "bulk", priority="bulk", source="crew"))]
+        tasks.append(asyncio.ensure_future(scheduler.submit(order.append, "citizen", priority="citizen", source="a")))
+        await asyncio.sleep(0.01)
+        release.set()
+        await asyncio.gather(blocker, *tasks)
+
+    asyncio.run(run())
+    assert order == ["citizen", "bulk"]
+
+
+# ============= REJECTIONS =============
+def test_jobs_queued_past_their_deadline_are_rejected(executor):
+    async def run():
+        scheduler = make_scheduler(executor)
+        release, blocker = await occupy(scheduler)
+        try:
+            with pytest.raises(SchedulerRejected) as rejected:
+                await scheduler.submit(lambda: "ran", source="late", timeout=0.02)
+        finally:
+            release.set()
+            await blocker
+        return scheduler, rejected.value
+
+    scheduler, rejected = asyncio.run(run())
+    assert (rejected.priority, rejected.reason) == ("citizen", "deadline")
+    assert scheduler.classes["citizen"].live == 0
+    assert scheduler.classes["citizen"].dropped == 1
+
+
+def test_a_full_class_queue_rejects_submissions(executor):
+    async def run():
+        scheduler = make_scheduler(executor, max_queued=1)
+        release, blocker = await occupy(scheduler)
+        queued = asyncio.ensure_future(scheduler.submit(lambda: "ran", source="a"))
+        await asyncio.sleep(0)
+        try:
+            with pytest.raises(SchedulerRejected) as rejected:
+                await scheduler.submit(lambda: "ran", source="b")
+        finally:
+            release.set()
+        assert await queued == "ran"
+        await blocker
+        return rejected.value
+
+    rejected = asyncio.run(run())
+    assert rejected.reason == "queue_full"
+
+
+def test_expired_jobs_free_their_queue_slot(executor):
+    async def run():
+        scheduler = make_scheduler(executor, max_queued=1)
+        release, blocker = await occupy(scheduler)
+        with pytest.raises(SchedulerRejected):
+            await scheduler.submit(lambda: "ran", source="a", timeout=0.01)
+        queued = asyncio.ensure_future(scheduler.submit(lambda: "ran", source="a"))  # Not "queue_full"
+        await asyncio.sleep(0)
+        release.set()
+        return await queued, await blocker
+
+    assert asyncio.run(run())[0] == "ran"
+
+
+# ============= CANCELLATION =============
+def test_cancelling_a_queued_job_drops_it_from_live(executor):
+    ran = []
+
+    async def run():
+        scheduler = make_scheduler(executor)
+        release, blocker = await occupy(scheduler)
+        queued = asyncio.ensure_future(scheduler.submit(ran.append, "cancelled", source="a"))
+        await asyncio.sleep(0)
+        queue = scheduler.classes["citizen"]
+        assert queue.live == 1 and queue.queued_by_source == {"a": 1}
+        queued.cancel()
+        await asyncio.sleep(0)
+        assert queue.live == 0 and queue.queued_by_source == {}
+        release.set()
+        await blocker
+        return scheduler
+
+    scheduler = asyncio.run(run())
+    assert ran == []
+    assert scheduler.stats()["classes"]["citizen"]["queued"] == 0
@@ -0,0 +1,77 @@
+import asyncio
+
+import pytest
+from fastapi.testclient import TestClient
+import main
+from search import decode_cursor, encode_cursor
+
+
+@pytest.fixture(scope="module")
+def client():
+    with TestClient(main.app) as client:
+        yield client
+
+
+def store(report):
+    return asyncio.run(main.db.create_violation_report(report))
+
+
+# ============= CURSOR =============
+def test_cursor_round_trip():
+    report = {"created_at": "2024-05-01T12:00:00.123456", "id": "5b0c7a4e-2f0e-4d8a-9a8e-0c1d2e3f4a5b"}
+    cursor = encode_cursor(report)
+    assert "=" not in cursor and "/" not in cursor and "+" not in cursor  # Safe in a query string unescaped
+    assert decode_cursor(cursor) == (report["created_at"], report["id"])
+
+
+def test_decode_cursor_rejects_garbage():
+    assert decode_cursor(None) is None and decode_cursor("") is None
+    for cursor in ("not-a-cursor", encode_cursor({"created_at": "x", "id": "y"})[:-3] + "!!!"):
+        with pytest.raises(ValueError):
+            decode_cursor(cursor)
+
+
+def test_invalid_cursor_is_a_client_error(client):
+    response = client.get("/api/search", params={"q": "tobacco", "cursor": "not-a-cursor"})
+    assert response.status_code == 400
+
+
+# ============= PAGINATION =============
+def test_pages_cover_every_hit_once_newest_first(client):
+    # Several reports share a created_at so the id half of the cursor has to break the tie
+    ids = []
+    for i in range(23):
+        stored = store({"status": "pending", "extracted_text": f"Zanzibar rum special {i}",
+                        "created_at": f"2024-03-{1 + i // 3:02d}T00:00:00"})
+        ids.append(stored["id"])
+    store({"status": "pending", "extracted_text": "Unrelated bakery sign"})
+
+    seen, cursor, pages = [], None, 0
+    while True:
+        params = {"q": "zanzibar", "limit": 5, **({"cursor": cursor} if cursor else {})}
+        response = client.get("/api/search", params=params)
+        assert response.status_code == 200
+        payload = response.json()
+        assert payload["count"] == len(payload["results"]) <= 5
+        seen.extend(hit["id"] for hit in payload["results"])
+        pages += 1
+        cursor = payload["next_cursor"]
+        if cursor is None:
+            break
+
+    assert pages == 5
+    assert len(seen) == len(set(seen)) == 23  # No duplicates and no gaps
+    assert set(seen) == set(ids)
+    rows = asyncio.run(main.db.search_reports(["zanzibar"], limit=100))
+    assert seen == [row["id"] for row in rows]
+    keys = [(row["created_at"], row["id"]) for row in rows]
+    assert keys == sorted(keys, reverse=True)
+
+
+def test_a_full_last_page_has_no_cursor(client):
+    for i in range(4):
+        store({"status": "pending", "extracted_text": f"Quokka lager {i}"})
+    first = client.get("/api/search", params={"q": "quokka", "limit": 2}).json()
+    second = client.get("/api/search", params={"q": "quokka", "limit": 2, "cursor": first["next_cursor"]}).json()
+    assert second["count"] == 2 and second["next_cursor"] is None
+    assert not {hit["id"] for hit in first["results"]} & {hit["id"] for hit in second["results"]}
@@ -0,0 +1,159 @@
+import asyncio
+import importlib
+import json
+import sys
+from datetime import datetime
+from decimal import Decimal
+from uuid import uuid4
+
+import numpy as np
+import pytest
+from fastapi.responses import StreamingResponse
+from fastapi.testclient import TestClient
+import main
+import serialization
+from main import (
+    AnalyzeResponse, CitizenReportListResponse, NearbyBillboardsResponse, ReportListResponse, SearchResponse,
+)
+from config import JSON_STREAM_MIN_ITEMS
+from serialization import FastJSONResponse, _stream_object, dumps, iter_json_array, list_response
+from text_regions import pack_regions
+
+REGIONS = [{"x": 1, "y": 2, "width": 30, "height": 12, "area": 360}]
+
+
+@pytest.fixture(scope="module")
+def client():
+    with TestClient(main.app) as client:
+        yield client
+
+
+def store(report):
+    return asyncio.run(main.db.create_violation_report(report))
+
+
+def body(chunks):
+    return b"".join(chunks)
+
+
+# ============= ENCODING =============
+def test_dumps_handles_detector_and_database_types():
+    value = {
+        "score": np.float64(0.5), "count": np.int64(3), "price": Decimal("1.25"),
+        "at": datetime(2024, 1, 2, 3, 4, 5), "id": uuid4(), "tags": ("a", "b"),
+    }
+    decoded = json.loads(dumps(value))
+    assert decoded["score"] == 0.5 and decoded["count"] == 3 and decoded["price"] == 1.25
+    assert decoded["at"] == "2024-01-02T03:04:05" and decoded["tags"] == ["a", "b"]
+
+
+def test_dumps_rejects_unknown_types():
+    with pytest.raises(TypeError):
+        dumps({"value": object()})
+
+
+@pytest.mark.parametrize("fields", [{}, {"success": True, "count": 3, "message": "ok"}])
+@pytest.mark.parametrize("items", [[], [{"id": 1}], [{"id": i, "name": f"report {i}"} for i in range(53)]])
+@pytest.mark.parametrize("chunk_items", [1, 7, 25])
+def test_stream_object_is_valid_json(fields, items, chunk_items):
+    assert json.loads(body(_stream_object(fields, "data", items, chunk_items))) == {**fields, "data": items}
+
+
+def test_iter_json_array_is_valid_json():
+    assert json.loads(body(iter_json_array([]))) == []
+    assert json.loads(body(iter_json_array(iter([1, {"a": None}, "x"])))) == [1, {"a": None}, "x"]
+
+
+def test_list_response_streams_long_lists_only():
+    async def collect(response):
+        return b"".join([chunk async for chunk in response.body_iterator])
+
+    short = list_response("data", [1, 2], stream_min_items=3, success=True)
+    assert isinstance(short, FastJSONResponse)
+    assert json.loads(short.body) == {"success": True, "data": [1, 2]}
+    items = [{"id": i} for i in range(10)]
+    streamed = list_response("data", items, stream_min_items=3, chunk_items=4, success=True, count=10)
+    assert isinstance(streamed, StreamingResponse)
+    assert json.loads(asyncio.run(collect(streamed))) == {"success": True, "count": 10, "data": items}
+
+
+@pytest.fixture
+def stdlib_serialization(monkeypatch):
+    """serialization as imported where orjson is missing"""
+    monkeypatch.setitem(sys.modules, "orjson", None)
+    yield importlib.reload(serialization)
+    monkeypatch.undo()
+    importlib.reload(serialization)
+
+
+def test_stdlib_fallback_matches_orjson(stdlib_serialization):
+    value = {"score": np.float32(0.25), "count": np.int64(2), "ids": (1, 2), "text": "café", "at": datetime(2024, 1, 2)}
+    expected = {"score": 0.25, "count": 2, "ids": [1, 2], "text": "café", "at": "2024-01-02T00:00:00"}
+    assert stdlib_serialization.ENCODER == "json"
+    assert json.loads(stdlib_serialization.dumps(value)) == expected
+    assert json.loads(body(stdlib_serialization._stream_object({"ok": True}, "data", [value] * 3, 2))) == {
+        "ok": True, "data": [expected] * 3,
+    }
+
+
+# ============= RESPONSE MODELS =============
+def test_reports_payload_matches_its_model(client):
+    store({"status": "pending", "is_compliant": False, "violations_found": ["alcohol"], "violation_count": 1,
+           "ocr_confidence": 0.8, "severity_level": "High", "severity_score": 7, "text_regions": REGIONS,
+           "latitude": 40.7, "longitude": -74.0, "city": "Springfield"})
+    store({"status": "approved", "is_compliant": True, "text_regions": pack_regions(REGIONS)})
+    response = client.get("/api/reports", params={"limit": 10})
+    assert response.status_code == 200
+    payload = ReportListResponse.model_validate(response.json())
+    assert payload.count == len(payload.data) >= 2
+
+
+def test_streamed_reports_payload_matches_its_model(client):
+    for _ in range(JSON_STREAM_MIN_ITEMS):
+        store({"status": "pending", "is_compliant": True, "text_regions": REGIONS})
+    response = client.get("/api/reports", params={"limit": 100})
+    assert response.status_code == 200
+    payload = ReportListResponse.model_validate(response.json())
+    assert payload.count == len(payload.data) == 100
+
+
+def test_analyze_payload_matches_its_model(client, monkeypatch):
+    async def analysis(image_data, priority=None, source="anonymous"):
+        return {
+            "analysis_complete": True, "is_compliant": False, "status": "violation",
+            "extracted_text": "cheap alcohol " * 60, "violations_found": ["alcohol"], "violation_count": 1,
+            "ocr_confidence": 0.91, "severity_level": "High", "severity_score": 7.0, "text_regions": REGIONS,
+        }
+
+    monkeypatch.setattr(main, "run_analysis", analysis)
+    response = client.post("/api/analyze", files={"file": ("sign.jpg", b"\xff\xd8not-a-real-jpeg", "image/jpeg")})
+    assert response.status_code == 200
+    payload = AnalyzeResponse.model_validate(response.json())
+    assert payload.report_id and payload.analysis.violation_count == 1
+    assert payload.analysis.extracted_text.endswith("...")
+
+
+def test_search_payload_matches_its_model(client):
+    store({"status": "pending", "extracted_text": "Discount tobacco outlet", "severity_level": "Low"})
+    response = client.get("/api/search", params={"q": "tobacco"})
+    assert response.status_code == 200
+    payload = SearchResponse.model_validate(response.json())
+    assert payload.count == len(payload.results) >= 1
+
+
+def test_nearby_payload_matches_its_model(client):
+    asyncio.run(main.db.save_billboard_location({"latitude": 10.0, "longitude": 20.0, "city": "Springfield"}))
+    response = client.get("/api/geolocation/nearby", params={"latitude": 10.0, "longitude": 20.0, "radius_km": 1})
+    assert response.status_code == 200
+    payload = NearbyBillboardsResponse.model_validate(response.json())
+    assert payload.count == len(payload.billboards) >= 1
+
+
+def test_citizen_reports_payload_matches_its_model(client):
+    asyncio.run(main.db.submit_citizen_report(
+        {"billboard_id": str(uuid4()), "latitude": 1.0, "longitude": 2.0, "description": "Covers a school sign"}
+    ))
+    response = client.get("/api/citizen-reports")
+    assert response.status_code == 200
+    payload = CitizenReportListResponse.model_validate(response.json())
+    assert payload.count == len(payload.reports) >= 1
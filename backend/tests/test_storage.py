@@ -0,0 +1,36 @@
+import asyncio
+
+import pytest
+from db import SupabaseDB
+from local_db import LocalDB
+from storage import StorageBackend
+
+
+def test_an_incomplete_backend_fails_at_construction():
+    class Incomplete(StorageBackend):
+        async def upload_image(self, file_data, filename, bucket="billboard-images"):
+            return None
+
+    with pytest.raises(TypeError, match="abstract"):
+        Incomplete()
+
+
+@pytest.mark.parametrize("backend", [LocalDB, SupabaseDB])
+def test_backends_implement_the_whole_interface(backend):
+    assert not backend.__abstractmethods__
+
+
+def test_local_queries_do_not_block_the_event_loop():
+    async def run():
+        storage = LocalDB(":memory:")
+        await storage.get_violation_reports()  # Connect and create the schema
+        storage._lock.acquire()  # Stall the database as a long write would
+        try:
+            query = asyncio.ensure_future(storage.get_violation_reports())
+            await asyncio.sleep(0.05)  # The loop keeps running other coroutines meanwhile
+            assert not query.done()
+        finally:
+            storage._lock.release()
+        return await query
+
+    assert asyncio.run(run()) == []
@@ -0,0 +1,158 @@
+import random
+import time
+
+import pytest
+from text_regions import (
+    COMPACT_FORMAT, build_regions, encode_regions, merge_lines, pack_regions, pack_u16,
+    suppress_overlaps, unpack_regions, unpack_u16,
+)
+
+
+def region(x, y, width, height):
+    return {"x": x, "y": y, "width": width, "height": height, "area": width * height}
+
+
+# ============= COMPACT ENCODING =============
+def test_pack_u16_round_trips_the_full_range():
+    values = [0, 1, 255, 256, 65534, 65535]
+    assert list(unpack_u16(pack_u16(values))) == values
+
+
+def test_pack_u16_clamps_out_of_range_values():
+    assert list(unpack_u16(pack_u16([-5, 70000]))) == [0, 65535]
+
+
+def test_pack_u16_is_little_endian():
+    assert pack_u16([1]) == "AQA="
+
+
+def test_pack_regions_round_trips_at_the_limits():
+    regions = [region(0, 0, 0, 0), region(65535, 65535, 65535, 65535), region(12, 34, 56, 78)]
+    packed = pack_regions(regions)
+    assert packed["format"] == COMPACT_FORMAT and packed["count"] == 3
+    assert unpack_regions(packed) == regions
+
+
+def test_pack_regions_on_empty_input():
+    packed = pack_regions([])
+    assert packed == {"format": COMPACT_FORMAT, "count": 0, "boxes": ""}
+    assert unpack_regions(packed) == []
+
+
+@pytest.mark.parametrize("value", [None, [], {}])
+def test_unpack_regions_of_nothing_is_empty(value):
+    assert unpack_regions(value) == []
+
+
+def test_unpack_regions_passes_json_lists_through():
+    regions = [region(1, 2, 3, 4)]
+    assert unpack_regions(regions) is regions
+
+
+def test_unpack_regions_rejects_unknown_formats():
+    with pytest.raises(ValueError, match="Unknown text region format"):
+        unpack_regions({"format": "xywh-u32", "boxes": ""})
+
+
+@pytest.mark.parametrize("boxes", ["not base64!", "AQA"])
+def test_unpack_regions_rejects_bad_base64(boxes):
+    with pytest.raises(ValueError):  # binascii.Error is a ValueError
+        unpack_regions({"format": COMPACT_FORMAT, "boxes": boxes})
+
+
+def test_unpack_regions_rejects_a_truncated_value():
+    with pytest.raises(ValueError):  # Odd byte count is not a whole uint16
+        unpack_regions({"format": COMPACT_FORMAT, "boxes": "AQID"})
+
+
+def test_encode_regions_follows_the_encoding():
+    regions = [region(1, 2, 3, 4)]
+    assert encode_regions(regions, "json") is regions
+    assert unpack_regions(encode_regions(regions, "compact")) == regions
+
+
+# ============= MERGING =============
+def test_merge_lines_joins_adjacent_boxes_of_one_line():
+    boxes = [(0, 0, 10, 10), (12, 1, 22, 11), (24, 0, 34, 10)]
+    assert merge_lines(boxes) == [(0, 0, 34, 11)]
+
+
+def test_merge_lines_keeps_separate_lines_apart():
+    boxes = [(0, 0, 10, 10), (12, 0, 22, 10), (0, 30, 10, 40), (12, 30, 22, 40)]
+    assert sorted(merge_lines(boxes)) == [(0, 0, 22, 10), (0, 30, 22, 40)]
+
+
+def test_merge_lines_splits_on_a_wide_gap():
+    assert sorted(merge_lines([(0, 0, 10, 10), (50, 0, 60, 10)])) == [(0, 0, 10, 10), (50, 0, 60, 10)]
+
+
+def test_merge_lines_does_not_join_boxes_of_very_different_height():
+    # A logo next to a word shares its band but is not part of the line
+    assert sorted(merge_lines([(0, 0, 10, 10), (12, 0, 42, 30)])) == [(0, 0, 10, 10), (12, 0, 42, 30)]
+
+
+def test_merge_lines_on_empty_input():
+    assert merge_lines([]) == []
+
+
+def test_merge_lines_is_order_independent():
+    boxes = [(24, 0, 34, 10), (0, 30, 10, 40), (0, 0, 10, 10), (12, 1, 22, 11)]
+    assert sorted(merge_lines(boxes)) == sorted(merge_lines(list(reversed(boxes))))
+
+
+def noisy_boxes(count=8000, width=4000, height=3000, seed=1):
+    rng = random.Random(seed)
+    boxes = []
+    for _ in range(count):
+        w, h = rng.randint(5, 40), rng.randint(11, 25)
+        x, y = rng.randint(0, width - 50), rng.randint(0, height - 50)
+        boxes.append((x, y, x + w, y + h))
+    return boxes
+
+
+def test_merge_lines_with_a_frame_sized_box_stays_fast():
+    # A billboard frame used to widen every band to its height, so lines never retired (quadratic sweep)
+    boxes, frame = noisy_boxes(), (10, 10, 3000, 2500)
+    expected = set(merge_lines(boxes)) | {frame}
+    started = time.perf_counter()
+    lines = merge_lines(boxes + [frame])
+    assert time.perf_counter() - started < 2.0
+    assert set(lines) == expected  # The frame is too tall to join any line
+
+
+def test_build_regions_with_a_frame_sized_box_stays_fast():
+    started = time.perf_counter()
+    regions = build_regions(noisy_boxes() + [(10, 10, 3000, 2500)], scale=1.0, image_size=(4000, 3000))
+    assert time.perf_counter() - started < 2.0
+    assert 0 < len(regions) <= 200
+
+
+# ============= SUPPRESSION =============
+def test_suppress_overlaps_drops_a_box_overlapping_a_larger_one():
+    assert suppress_overlaps([(0, 0, 100, 20), (5, 0, 100, 20)]) == [(0, 0, 100, 20)]
+
+
+def test_suppress_overlaps_drops_a_box_mostly_inside_a_larger_one():
+    # IoU is small, but the small box lies entirely inside the large one
+    assert suppress_overlaps([(0, 0, 200, 200), (10, 10, 30, 30)]) == [(0, 0, 200, 200)]
+
+
+def test_suppress_overlaps_keeps_disjoint_and_slightly_overlapping_boxes():
+    boxes = [(0, 0, 100, 20), (90, 0, 190, 20), (500, 500, 520, 520)]
+    assert sorted(suppress_overlaps(boxes)) == sorted(boxes)
+
+
+def test_suppress_overlaps_compares_across_grid_cells():
+    # The boxes share no top-left grid cell but still overlap
+    assert suppress_overlaps([(0, 0, 300, 300), (250, 250, 290, 290)], cell=64) == [(0, 0, 300, 300)]
+
+
+def test_suppress_overlaps_on_empty_input():
+    assert suppress_overlaps([]) == []
+
+
+# ============= REGIONS =============
+def test_build_regions_maps_lines_back_to_original_coordinates_in_reading_order():
+    boxes = [(0, 40, 10, 50), (12, 40, 22, 50), (0, 0, 10, 10), (12, 0, 22, 10), (0, 0, 100, 100)]
+    regions = build_regions(boxes, scale=0.5, image_size=(100, 100))
+    assert regions == [region(0, 0, 44, 20), region(0, 80, 44, 20)]  # The page contour is dropped
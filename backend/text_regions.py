@@ -0,0 +1,164 @@
+"""
+Text region post-processing: contour boxes -> merged text lines -> compact encoding.
+
+Raw contour boxes (often thousands on noisy photos) are merged into text lines,
+de-duplicated with non-maximum suppression and mapped back to original-image
+coordinates. Lines can be stored/transported as a packed base64 array of
+uint16 (x, y, width, height) quadruples instead of a list of dicts.
+"""
+import base64
+import sys
+from array import array
+from typing import Dict, Iterable, List, Sequence, Tuple, Union
+from config import (
+    TEXT_REGION_ENCODING, TEXT_REGION_LINE_GAP, TEXT_REGION_MAX,
+    TEXT_REGION_NMS_IOU, TEXT_REGION_CONTAINMENT
+)
+
+COMPACT_FORMAT = "xywh-u16-b64"
+Box = Tuple[int, int, int, int]  # x1, y1, x2, y2
+
+
+# ============= MERGING =============
+def merge_lines(boxes: Sequence[Box], gap: float = TEXT_REGION_LINE_GAP) -> List[Box]:
+    """Merge character/word boxes into text lines.
+
+    A box joins a line when they overlap vertically by at least half the smaller
+    height, have comparable heights and the horizontal gap is at most `gap` times
+    the taller height. Boxes are swept left to right against open lines bucketed
+    by their top edge into bands of the median box height, so each box only looks
+    at the bands a compatible line could start in (its own top minus twice its
+    height, down to its bottom); lines that no later box can reach are retired.
+    Outlier boxes (frames, large headline letters) only cost their own lookups."""
+    if not boxes:
+        return []
+    ordered = sorted(boxes)
+    heights = sorted(y2 - y1 for _, y1, _, y2 in ordered)
+    band = max(1, heights[len(heights) // 2])
+    bands: Dict[int, List[List[int]]] = {}
+    finished: List[List[int]] = []
+    for x1, y1, x2, y2 in ordered:
+        height = y2 - y1
+        best, best_overlap = None, 0
+        for key in range((y1 - 2 * height) // band, y2 // band + 1):
+            lines = bands.get(key)
+            if not lines:
+                continue
+            still_open = []
+            for line in lines:
+                line_height = line[3] - line[1]
+                horizontal_gap = x1 - line[2]
+                if horizontal_gap > gap * 2 * line_height:
+                    # Every later box starts even further right, and one at most twice as tall as the line can join it
+                    finished.append(line)
+                    continue
+                still_open.append(line)
+                if horizontal_gap > gap * max(height, line_height):
+                    continue
+                if max(height, line_height) > 2 * min(height, line_height):
+                    continue  # A logo or frame next to text is not part of the line
+                overlap = min(y2, line[3]) - max(y1, line[1])
+                if overlap >= 0.5 * min(height, line_height) and overlap > best_overlap:
+                    best, best_overlap = line, overlap
+            bands[key] = still_open
+        if best is None:
+            bands.setdefault(y1 // band, []).append([x1, y1, x2, y2])
+            continue
+        old_key = best[1] // band
+        best[0], best[1] = min(best[0], x1), min(best[1], y1)
+        best[2], best[3] = max(best[2], x2), max(best[3], y2)
+        if best[1] // band != old_key:
+            bands[old_key].remove(best)
+            bands.setdefault(best[1] // band, []).append(best)
+    for lines in bands.values():
+        finished.extend(lines)
+    return [tuple(line) for line in finished]
+
+
+def suppress_overlaps(boxes: Sequence[Box], iou_threshold: float = TEXT_REGION_NMS_IOU,
+                      containment: float = TEXT_REGION_CONTAINMENT, cell: int = 64) -> List[Box]:
+    """Non-maximum suppression by area: drop boxes overlapping (IoU) or mostly inside a larger kept box.
+
+    Kept boxes are registered in a coarse grid so each box is only compared with its neighbours."""
+    kept: List[Box] = []
+    grid: Dict[Tuple[int, int], List[int]] = {}
+    for box in sorted(boxes, key=lambda b: (b[2] - b[0]) * (b[3] - b[1]), reverse=True):
+        area = (box[2] - box[0]) * (box[3] - box[1])
+        cells = [(cx, cy) for cx in range(box[0] // cell, (box[2] - 1) // cell + 1)
+                 for cy in range(box[1] // cell, (box[3] - 1) // cell + 1)]
+        candidates = {index for key in cells for index in grid.get(key, ())}
+        suppressed = False
+        for index in candidates:
+            other = kept[index]
+            iw = min(box[2], other[2]) - max(box[0], other[0])
+            ih = min(box[3], other[3]) - max(box[1], other[1])
+            if iw <= 0 or ih <= 0:
+                continue
+            intersection = iw * ih
+            other_area = (other[2] - other[0]) * (other[3] - other[1])
+            if intersection >= containment * area or intersection / (area + other_area - intersection) >= iou_threshold:
+                suppressed = True
+                break
+        if not suppressed:
+            for key in cells:
+                grid.setdefault(key, []).append(len(kept))
+            kept.append(box)
+    return kept
+
+
+def build_regions(boxes: Sequence[Box], scale: float, image_size: Tuple[int, int],
+                  max_regions: int = TEXT_REGION_MAX) -> List[Dict]:
+    """Lines from raw (x1, y1, x2, y2) boxes on a scaled image, in original-image coordinates, reading order"""
+    width, height = image_size
+    # The page/background contour is not a text region
+    boxes = [b for b in boxes if (b[2] - b[0]) * (b[3] - b[1]) < 0.9 * width * height]
+    lines = suppress_overlaps(merge_lines(boxes))[:max_regions]
+    regions = []
+    for x1, y1, x2, y2 in sorted(lines, key=lambda b: (b[1], b[0])):
+        x, y = int(x1 / scale), int(y1 / scale)
+        w, h = max(1, int(round((x2 - x1) / scale))), max(1, int(round((y2 - y1) / scale)))
+        regions.append({"x": x, "y": y, "width": w, "height": h, "area": w * h})
+    return regions
+
+
+# ============= COMPACT ENCODING =============
+def pack_u16(values: Iterable[int]) -> str:
+    """Base64 of little-endian uint16 values (clamped to 0..65535)"""
+    packed = array("H", (min(max(int(value), 0), 0xFFFF) for value in values))
+    if sys.byteorder != "little":
+        packed.byteswap()
+    return base64.b64encode(packed.tobytes()).decode("ascii")
+
+
+def unpack_u16(encoded: str) -> array:
+    values = array("H")
+    values.frombytes(base64.b64decode(encoded))
+    if sys.byteorder != "little":
+        values.byteswap()
+    return values
+
+
+def pack_regions(regions: List[Dict]) -> Dict:
+    """Encode regions as base64 of little-endian uint16 (x, y, width, height) quadruples"""
+    values = pack_u16(region[key] for region in regions for key in ("x", "y", "width", "height"))
+    return {"format": COMPACT_FORMAT, "count": len(regions), "boxes": values}
+
+
+def unpack_regions(value: Union[List[Dict], Dict, None]) -> List[Dict]:
+    """Decode stored/transported regions in either representation back to a list of dicts"""
+    if not value:
+        return []
+    if isinstance(value, list):
+        return value
+    if value.get("format") != COMPACT_FORMAT:
+        raise ValueError(f"Unknown text region format: {value.get('format')}")
+    values = unpack_u16(value["boxes"])
+    return [
+        {"x": values[i], "y": values[i + 1], "width": values[i + 2], "height": values[i + 3], "area": values[i + 2] * values[i + 3]}
+        for i in range(0, len(values), 4)
+    ]
+
+
+def encode_regions(regions: List[Dict], encoding: str = TEXT_REGION_ENCODING) -> Union[List[Dict], Dict]:
+    """Representation used in API responses and storage, per TEXT_REGION_ENCODING"""
+    return pack_regions(regions) if encoding == "compact" else regions